@@ -1,27 +1,30 @@
 import streamlit as st
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 
 # --- Path Setup ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_FOLDER = os.path.join(BASE_DIR, 'data')
-RAW_FOLDER = os.path.join(DATA_FOLDER, 'raw')
-CLEANED_FOLDER = os.path.join(DATA_FOLDER, 'cleaned')
-
-os.makedirs(RAW_FOLDER, exist_ok=True)
-os.makedirs(CLEANED_FOLDER, exist_ok=True)
-
 # --- Imports for data management ---
 from scripts.utils import data_manager as dm
+from scripts.utils import result_cache
+from scripts.utils import jobs
+
+RAW_FOLDER = dm.RAW_FOLDER
+CLEANED_FOLDER = dm.CLEANED_FOLDER
 
 # --- Imports for prediction ---
-from scripts.models.LSTM.lstm import predict_lstm
-from scripts.models.regression.linear_regression import predict_linear_regression
-from scripts.models.regression.multiple_regression import predict_multiple_regression
-from scripts.models.XGBoost.xgboost_model import predict_xgb
-from scripts.models.ensemble.combine import combine_predictions  
-from scripts.Exploratory_data_analysis import graph_plot
+# Model backends (TensorFlow, XGBoost, ...) are imported on first use via scripts.models.registry
+from scripts.models.ensemble.combine import combine_predictions
+
+
+# Charts are rendered to PNG once per (ticker, data version, window)
+@result_cache.cached("chart")
+def render_stock_chart(stock_symbol, window="Max"):
+    # matplotlib / scipy load only when a chart is first requested
+    from scripts.Exploratory_data_analysis import graph_plot
+    return graph_plot.render_stock_chart(stock_symbol, window=window)
+
+# Downloads, updates and predictions run as background jobs
+jobs.start_workers()
 
 # ---------------------------
 # --- Sidebar: Data Management ---
@@ -33,6 +36,9 @@ def update_stock_counts():
     counts = dm.count_stocks()
     st.sidebar.markdown(f"**Stocks in raw folder:** {counts['raw_stocks']}")
     st.sidebar.markdown(f"**Stocks in cleaned folder:** {counts['cleaned_stocks']}")
+    stale = dm.stale_stocks()
+    if stale:
+        st.sidebar.markdown(f"**Stocks needing an update:** {len(stale)}")
     # Optionally show first 5 tickers as preview
     raw_tickers = counts["raw_tickers"]
     cleaned_tickers = counts["cleaned_tickers"]
@@ -57,26 +63,22 @@ elif download_choice == "Random Range":
     max_range = st.sidebar.number_input("Max stocks", min_value=1, max_value=500, value=20)
 
 if st.sidebar.button("Download"):
-    with st.spinner("Downloading and cleaning..."):
-        if download_choice == "Random 100":
-            result = dm.fetch_stocks(choice="random_100", logger=st.write)
-        elif download_choice == "Single":
-            result = dm.fetch_stocks(choice="single", ticker=single_ticker, logger=st.write)
-        elif download_choice == "Custom":
-            result = dm.fetch_stocks(choice="custom", num=custom_num, logger=st.write)
-        elif download_choice == "Random Range":
-            result = dm.fetch_stocks(choice="range", min_num=min_range, max_num=max_range, logger=st.write)
-        st.success(result["message"])
-    update_stock_counts()  # <-- refresh counts after download
+    if download_choice == "Random 100":
+        job_id = jobs.submit("download", choice="random_100")
+    elif download_choice == "Single":
+        job_id = jobs.submit("download", choice="single", ticker=single_ticker)
+    elif download_choice == "Custom":
+        job_id = jobs.submit("download", choice="custom", num=int(custom_num))
+    elif download_choice == "Random Range":
+        job_id = jobs.submit("download", choice="range", min_num=int(min_range), max_num=int(max_range))
+    st.sidebar.info(f"Download queued (job {job_id}).")
 
 st.sidebar.markdown("---")
 
 # --- Update Stocks ---
 if st.sidebar.button("Update All Stocks"):
-    with st.spinner("Updating all stocks..."):
-        result = dm.update_stocks(logger=st.write)
-        st.success(result["message"])
-    update_stock_counts()  # <-- refresh counts after update
+    job_id = jobs.submit("update")
+    st.sidebar.info(f"Update queued (job {job_id}).")
 
 st.sidebar.markdown("---")
 
@@ -104,7 +106,7 @@ elif delete_mode == "Specific Tickers":
 st.header("📈 Stock Prediction & Analysis")
 
 # List available cleaned stocks
-available_stocks = [f.replace(".csv", "") for f in os.listdir(CLEANED_FOLDER) if f.endswith(".csv")]
+available_stocks = dm.count_stocks()["cleaned_tickers"]
 
 if not available_stocks:
     st.warning("No cleaned stock data found! Download & clean some stocks first.")
@@ -112,10 +114,11 @@ else:
     selected_stock = st.selectbox("Select a stock", available_stocks)
 
     # Plot stock graph
+    chart_window = st.radio("Chart window", ["3M", "6M", "1Y", "5Y", "Max"], index=4, horizontal=True)
     if st.button("Show Stock Graph"):
-        graph_result = graph_plot.plot_stock_graph(selected_stock)
+        graph_result = render_stock_chart(selected_stock, window=chart_window)
         if graph_result:
-            st.pyplot(graph_result["figure"])
+            st.image(graph_result["image"])
             st.write(f"**Latest SMA:** {graph_result['latest_SMA']}")
             st.write(f"**Latest EMA:** {graph_result['latest_EMA']}")
             st.write(f"**Latest Volatility:** {graph_result['latest_volatility']}")
@@ -126,29 +129,27 @@ else:
     st.subheader("Combined Prediction")
 
     if st.button("Predict All Models"):
-        with st.spinner("Running all models..."):
-            combined_results = {}
-            csv_path = os.path.join(CLEANED_FOLDER, f"{selected_stock}.csv")
-            
-            try:
-                combined_results["LSTM"] = predict_lstm(selected_stock)
-                combined_results["Linear Regression"] = predict_linear_regression(csv_path)
-                combined_results["Multiple Regression"] = predict_multiple_regression(selected_stock)
-                combined_results["XGBoost"] = predict_xgb(selected_stock)
-                
-                for model, result in combined_results.items():
-                    st.markdown(f"**{model} Prediction:**")
-                    if "error" in result:
-                        st.error(result["error"])
-                    else:
-                        st.success(f"Next week's predicted price: {result['prediction']}")
-                        if "next_7_days" in result:
-                            st.line_chart(result["next_7_days"])
-                        if "mae" in result:
-                            st.write(f"MAE: {result['mae']}, RMSE: {result['rmse']}")
-                    st.write("---")
-            except Exception as e:
-                st.error(f"Failed to run predictions: {e}")
+        # Models run in parallel in a background job; results are shared with the ensemble below
+        st.session_state["predict_job"] = jobs.submit("predict", stock_symbol=selected_stock)
+
+    predict_job = jobs.get(st.session_state["predict_job"]) if "predict_job" in st.session_state else None
+    if predict_job and predict_job["status"] == jobs.DONE:
+        st.caption(f"Results for {predict_job['params']['stock_symbol']} (job {predict_job['id']})")
+        for model, result in predict_job["result"].items():
+            st.markdown(f"**{model} Prediction:**")
+            if "error" in result:
+                st.error(result["error"])
+            else:
+                st.success(f"Next week's predicted price: {result['prediction']}")
+                if "next_7_days" in result:
+                    st.line_chart(result["next_7_days"])
+                if "mae" in result:
+                    st.write(f"MAE: {result['mae']}, RMSE: {result['rmse']}")
+                if "timings" in result:
+                    st.caption(" · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"].items()))
+            st.write("---")
+    elif predict_job and predict_job["status"] == jobs.FAILED:
+        st.error(f"Failed to run predictions: {predict_job['error']}")
 
 # --- Ensemble / Combined Output ---
 st.subheader("Ensemble / Combined Output")
@@ -172,3 +173,41 @@ if st.button("Predict Ensemble (All Models)"):
 
             except Exception as e:
                 st.error(f"Ensemble prediction failed: {e}")
+
+# ---------------------------
+# --- Background Jobs ---
+# ---------------------------
+@st.fragment(run_every=2)
+def show_jobs():
+    """Polls the job queue every 2 seconds; only this section reruns."""
+    st.subheader("Background Jobs")
+    recent = jobs.list_jobs(limit=10)
+    active = {job["id"] for job in recent if job["status"] in jobs.ACTIVE}
+    if st.session_state.get("active_jobs", set()) - active:
+        # A job finished: rerun the whole page so counts, pickers and results refresh
+        st.session_state["active_jobs"] = active
+        st.rerun()
+    st.session_state["active_jobs"] = active
+    if not recent:
+        st.caption("No jobs yet.")
+    for job in recent:
+        label = f"Job {job['id']} · {job['kind']} · {job['status']}"
+        with st.expander(label, expanded=job["status"] in jobs.ACTIVE):
+            progress = job["progress"]
+            if progress and progress["total"]:
+                eta = f", ETA {progress['eta']:.0f}s" if progress.get("eta") is not None else ""
+                st.progress(min(progress["done"] / progress["total"], 1.0),
+                            text=f"{progress['done']}/{progress['total']} done{eta}")
+                if progress.get("bytes"):
+                    st.caption(f"{progress['bytes'] / 1e6:.1f} MB received")
+            if job["status"] in jobs.ACTIVE and st.button("Cancel", key=f"cancel_{job['id']}"):
+                jobs.cancel(job["id"])
+            if job["error"]:
+                st.error(job["error"])
+            elif job["status"] == jobs.DONE and isinstance(job["result"], dict) and "message" in job["result"]:
+                st.success(job["result"]["message"])
+            if job["log"]:
+                st.code("\n".join(job["log"][-10:]))
+
+
+show_jobs()
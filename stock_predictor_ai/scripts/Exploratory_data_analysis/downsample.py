@@ -0,0 +1,45 @@
+# downsample.py
+"""
+Shape-preserving downsampling for charts.
+
+lttb() is Largest-Triangle-Three-Buckets: the series is split into equal
+buckets and from each one the point forming the largest triangle with the
+previous pick and the next bucket's mean is kept, so spikes survive where a
+plain stride would skip them. downsample_indices() combines the picks of
+several series with indices that must always be drawn (peaks / dips).
+"""
+import numpy as np
+
+
+def lttb(y, n_out, x=None):
+    """Sorted indices of the `n_out` points LTTB keeps from `y` (all if shorter)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    y = np.where(np.isnan(y), np.nanmean(y) if (~np.isnan(y)).any() else 0.0, y)
+
+    # First and last points are always kept; the rest go into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picks = np.empty(n_out, dtype=int)
+    picks[0], picks[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(area.argmax())
+        picks[b + 1] = prev
+    return picks
+
+
+def downsample_indices(series, n_out, keep=()):
+    """
+    Union of the LTTB picks of every array in `series` (each reduced to
+    `n_out` points) and the `keep` indices, sorted.
+    """
+    picks = [lttb(y, n_out) for y in series]
+    picks += [np.asarray(k, dtype=int) for k in keep]
+    return np.unique(np.concatenate(picks)) if picks else np.array([], dtype=int)
@@ -1,74 +1,274 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+# graph_plot.py
+"""
+Price charts: High, Low, SMA, EMA and peak / dip markers.
+
+plot_stock_graph() returns a live Matplotlib figure. render_stock_chart() and
+render_grid() return PNG images instead: long histories are downsampled with
+LTTB (peaks and dips always kept) before drawing, the figure is closed right
+after rendering, and the PNG is cached under data/cache/charts per
+(ticker, data version, window), so a repeat request is a file read.
+
+With `interval` ("5m", "1h", ...) the charts draw the intraday bars of the
+ticker, resampled on the fly from a finer stored interval when needed (see
+scripts.utils.intraday).
+
+    from scripts.Exploratory_data_analysis import graph_plot
+    chart = graph_plot.render_stock_chart("AAPL", window="1Y")    # chart["image"]: PNG bytes
+    grid = graph_plot.render_grid(["AAPL", "MSFT", "NVDA"])
+"""
+import io
 import os
+import json
+import hashlib
+import matplotlib.pyplot as plt
+import numpy as np
 import matplotlib.dates as mdates
 from scipy.signal import find_peaks
+from scripts.utils import storage, result_cache, intraday
+from scripts.features.cache import get_features
+from scripts.Exploratory_data_analysis.downsample import downsample_indices
 
-def plot_stock_graph(stock_symbol):
-    """
-    Plots High, Low, SMA, EMA, and volatility for a given stock symbol.
-    Returns the latest SMA, EMA, and volatility values + Matplotlib figure.
-    """
+CHART_CACHE_FOLDER = os.path.join(storage.DATA_DIR, 'cache', 'charts')
 
-    # Base paths
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-    cleaned_path = os.path.join(base_dir, 'data', 'cleaned')
-    file_path = os.path.join(cleaned_path, f'{stock_symbol}.csv')
-    
-    if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' not found.")
+# Chart windows in bars (trading days for daily data; None: the whole history)
+WINDOWS = {"3M": 63, "6M": 126, "1Y": 252, "5Y": 1260, "Max": None}
+
+# Points per line after downsampling (full resolution below this)
+MAX_POINTS = 1000
+GRID_MAX_POINTS = 300
+
+# Grid images kept on disk (oldest are removed first)
+GRID_CACHE_MAX = 16
+
+
+def _window_rows(window):
+    if window is None or isinstance(window, int):
+        return window
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window '{window}'. Choose from {list(WINDOWS)} or a number of rows.")
+    return WINDOWS[window]
+
+
+def _prepare(stock_symbol, window=None):
+    """Windowed frame with indicator columns and the peak / dip positions, or None."""
+    df = result_cache.load_frame(stock_symbol)
+    if df is None:
         return None
 
-    # Load data
-    df = pd.read_csv(file_path, parse_dates=['Date'])
-    close_col = f'Close_{stock_symbol}'
-    high_col = f'High_{stock_symbol}'
-    low_col = f'Low_{stock_symbol}'
+    # Indicators (shared, cached indicator arrays)
+    feats = get_features(stock_symbol)
+    df['SMA'] = feats['SMA_50']
+    df['EMA'] = feats['EMA_20']
+    df['Volatility'] = feats['STD_20']
 
-    # Calculate indicators
-    df['SMA'] = df[close_col].rolling(window=50).mean()
-    df['EMA'] = df[close_col].ewm(span=20, adjust=False).mean()
-    df['Volatility'] = df[close_col].rolling(window=20).std()
+    rows = _window_rows(window)
+    if rows is not None:
+        df = df.iloc[-rows:].reset_index(drop=True)
 
     # Find peaks and dips
-    peaks, _ = find_peaks(df[close_col], distance=5)
-    dips, _ = find_peaks(-df[close_col], distance=5)
+    close = df[f'Close_{stock_symbol}']
+    peaks, _ = find_peaks(close, distance=5)
+    dips, _ = find_peaks(-close, distance=5)
+    return df, peaks, dips
 
-    # Create plot
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(df['Date'], df[high_col], label='High', color='blue')
-    ax.plot(df['Date'], df[low_col], label='Low', color='orange')
-    ax.plot(df['Date'], df['SMA'], label='SMA (50)', color='purple')
-    ax.plot(df['Date'], df['EMA'], label='EMA (20)', color='brown')
-    ax.scatter(df['Date'][peaks], df[close_col][peaks], color='green', marker='^', label='Peaks')
-    ax.scatter(df['Date'][dips], df[close_col][dips], color='red', marker='v', label='Dips')
-
-    # Format date axis
-    if len(df) > 365 * 2:
+
+def _format_dates(ax, dates):
+    n_rows = len(dates)
+    if n_rows > 1 and np.median(np.diff(dates.values)) < np.timedelta64(1, 'D'):
+        # Intraday bars
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    elif n_rows > 365 * 2:
         ax.xaxis.set_major_locator(mdates.YearLocator())
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
         ax.xaxis.set_minor_locator(mdates.MonthLocator(bymonth=(1, 7)))
-    elif len(df) > 90:
+    elif n_rows > 90:
         ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
     else:
         ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
 
-    plt.gcf().autofmt_xdate()
-    ax.set_xlabel('Date')
-    ax.set_ylabel('Price')
-    ax.set_title(f'{stock_symbol} Price Analysis')
-    ax.legend()
-    plt.tight_layout()
 
-    # Return indicators + figure
-    result = {
+def _draw(ax, stock_symbol, prepared, max_points=None, compact=False):
+    df, peaks, dips = prepared
+    close_col = f'Close_{stock_symbol}'
+    high_col = f'High_{stock_symbol}'
+    low_col = f'Low_{stock_symbol}'
+
+    if max_points and len(df) > max_points:
+        # High and Low share half the budget each; peak / dip rows are always drawn
+        rows = downsample_indices([df[high_col].to_numpy(), df[low_col].to_numpy()],
+                                  max_points // 2, keep=(peaks, dips))
+        lines = df.iloc[rows]
+    else:
+        lines = df
+
+    ax.plot(lines['Date'], lines[high_col], label='High', color='blue')
+    ax.plot(lines['Date'], lines[low_col], label='Low', color='orange')
+    ax.plot(lines['Date'], lines['SMA'], label='SMA (50)', color='purple')
+    ax.plot(lines['Date'], lines['EMA'], label='EMA (20)', color='brown')
+    marker_size = 12 if compact else None
+    ax.scatter(df['Date'].iloc[peaks], df[close_col].iloc[peaks], color='green', marker='^', label='Peaks',
+               s=marker_size)
+    ax.scatter(df['Date'].iloc[dips], df[close_col].iloc[dips], color='red', marker='v', label='Dips',
+               s=marker_size)
+
+    _format_dates(ax, df['Date'])
+    if compact:
+        ax.set_title(stock_symbol, fontsize=10)
+        ax.tick_params(labelsize=7)
+    else:
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Price')
+        ax.set_title(f'{stock_symbol} Price Analysis')
+        ax.legend()
+
+
+def _latest(stock_symbol, df):
+    return {
         "stock": stock_symbol,
-        "latest_SMA": round(df["SMA"].iloc[-1], 2),
-        "latest_EMA": round(df["EMA"].iloc[-1], 2),
-        "latest_volatility": round(df["Volatility"].iloc[-1], 2),
-        "figure": fig
+        "latest_SMA": round(float(df["SMA"].iloc[-1]), 2),
+        "latest_EMA": round(float(df["EMA"].iloc[-1]), 2),
+        "latest_volatility": round(float(df["Volatility"].iloc[-1]), 2),
     }
 
-    return result
+
+def plot_stock_graph(stock_symbol, window=None, max_points=None, interval=None):
+    """
+    Plots High, Low, SMA, EMA, and volatility for a given stock symbol.
+    Returns the latest SMA, EMA, and volatility values + Matplotlib figure.
+    The caller owns the figure and should plt.close() it when done.
+    """
+    stock_symbol = intraday.series_key(stock_symbol, interval)
+    prepared = _prepare(stock_symbol, window)
+    if prepared is None:
+        print(f"Error: No stored data found for '{stock_symbol}'.")
+        return None
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    _draw(ax, stock_symbol, prepared, max_points)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    # Return indicators + figure
+    return {**_latest(stock_symbol, prepared[0]), "figure": fig}
+
+
+def _png(fig, dpi):
+    """PNG bytes of `fig`; the figure is closed either way."""
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=dpi)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _chart_path(stock_symbol, version, window, max_points, dpi):
+    return os.path.join(CHART_CACHE_FOLDER, stock_symbol, f"{_digest(version)}_{window}_{max_points}_{dpi}.png")
+
+
+def _prune(folder, keep):
+    """Remove files in `folder` whose names don't start with `keep`."""
+    for f in os.listdir(folder):
+        if not f.startswith(keep):
+            try:
+                os.remove(os.path.join(folder, f))
+            except OSError:
+                pass
+
+
+def render_stock_chart(stock_symbol, window="Max", max_points=MAX_POINTS, dpi=100, interval=None):
+    """
+    plot_stock_graph() as a PNG: {"stock", "latest_SMA", "latest_EMA",
+    "latest_volatility", "image" (PNG bytes), "path"}, or None if the ticker
+    isn't stored. Served from data/cache/charts while the data is unchanged.
+    """
+    stock_symbol = intraday.series_key(stock_symbol, interval)
+    version = storage.data_version(stock_symbol)
+    if version is None:
+        print(f"Error: No stored data found for '{stock_symbol}'.")
+        return None
+    path = _chart_path(stock_symbol, version, window, max_points, dpi)
+    meta_path = path[:-len(".png")] + ".json"
+    if os.path.exists(path) and os.path.exists(meta_path):
+        try:
+            with open(path, "rb") as f:
+                image = f.read()
+            with open(meta_path) as f:
+                return {**json.load(f), "image": image, "path": path}
+        except (OSError, ValueError):
+            pass  # unreadable entry: render again
+
+    result = plot_stock_graph(stock_symbol, window=_window_rows(window), max_points=max_points)
+    if result is None:
+        return None
+    image = _png(result.pop("figure"), dpi)
+
+    # Older versions of this ticker's charts are stale now
+    if os.path.isdir(os.path.dirname(path)):
+        _prune(os.path.dirname(path), keep=_digest(version))
+    _write_atomic(path, image)
+    _write_atomic(meta_path, json.dumps(result).encode())
+    return {**result, "image": image, "path": path}
+
+
+def render_grid(tickers, window="1Y", columns=4, max_points=GRID_MAX_POINTS, dpi=80, interval=None):
+    """
+    Small-multiples PNG of `tickers` in one figure: {"image", "path",
+    "tickers" (drawn), "missing"}. Cached on the versions of all of them.
+    """
+    if intraday.is_intraday(interval):
+        tickers = [intraday.series_key(t, interval) for t in tickers]
+        versions = {t: storage.data_version(t) for t in tickers}
+        versions = {t: v for t, v in versions.items() if v is not None}
+    else:
+        versions = storage.data_versions(list(tickers))
+    drawn = [t for t in tickers if t in versions]
+    missing = [t for t in tickers if t not in versions]
+    if not drawn:
+        return {"image": None, "path": None, "tickers": [], "missing": missing}
+
+    key = "|".join(f"{t}={versions[t]}" for t in drawn) + f"|{window}|{columns}|{max_points}|{dpi}"
+    path = os.path.join(CHART_CACHE_FOLDER, "grids", f"{_digest(key)}.png")
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return {"image": f.read(), "path": path, "tickers": drawn, "missing": missing}
+        except OSError:
+            pass
+
+    columns = max(1, min(columns, len(drawn)))
+    n_rows = -(-len(drawn) // columns)
+    fig, axes = plt.subplots(n_rows, columns, figsize=(3.2 * columns, 2.4 * n_rows), squeeze=False)
+    rows = _window_rows(window)
+    for ax, t in zip(axes.flat, drawn):
+        _draw(ax, t, _prepare(t, rows), max_points, compact=True)
+    for ax in axes.flat[len(drawn):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    image = _png(fig, dpi)
+
+    _write_atomic(path, image)
+    grids = sorted((os.path.join(os.path.dirname(path), f) for f in os.listdir(os.path.dirname(path))),
+                   key=os.path.getmtime)
+    for old in grids[:-GRID_CACHE_MAX]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return {"image": image, "path": path, "tickers": drawn, "missing": missing}
@@ -0,0 +1,38 @@
+# rls.py
+import numpy as np
+
+
+class RecursiveLeastSquares:
+    """
+    Expanding-window least squares updated one row at a time.
+
+    Starts from an ordinary least-squares fit on (X0, y0); each update() adds
+    one observation in O(k^2) with the Sherman-Morrison identity instead of
+    refitting on the whole history. An intercept column is added internally.
+    """
+
+    def __init__(self, X0, y0, ridge=1e-9):
+        X0 = self._with_intercept(np.atleast_2d(X0))
+        y0 = np.asarray(y0, dtype=float)
+        gram = X0.T @ X0
+        # Small ridge relative to the data scale keeps collinear designs invertible
+        gram += ridge * np.trace(gram) / len(gram) * np.eye(len(gram))
+        self.P = np.linalg.inv(gram)
+        self.beta = self.P @ (X0.T @ y0)
+        self.n = len(y0)
+
+    @staticmethod
+    def _with_intercept(X):
+        X = np.asarray(X, dtype=float)
+        return np.column_stack([np.ones(len(X)), X])
+
+    def update(self, x, y):
+        x = np.concatenate([[1.0], np.asarray(x, dtype=float)])
+        Px = self.P @ x
+        gain = Px / (1.0 + x @ Px)
+        self.beta = self.beta + gain * (y - x @ self.beta)
+        self.P = self.P - np.outer(gain, Px)
+        self.n += 1
+
+    def predict(self, X):
+        return self._with_intercept(np.atleast_2d(X)) @ self.beta
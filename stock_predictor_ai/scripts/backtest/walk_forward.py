@@ -0,0 +1,232 @@
+# walk_forward.py
+"""
+Walk-forward (rolling-origin) backtesting.
+
+At every origin t only data up to t is used to fit, and the model forecasts
+close[t + h] for each horizon h. Errors are collected over hundreds of
+origins and summarized as one error curve per (ticker, model, horizon).
+
+- Linear / multiple regression: one recursive least-squares model per
+  horizon, updated with one row per origin instead of refitting.
+- XGBoost: the feature matrix is built once from the feature cache; the model
+  is refit every `refit_every` origins and each block of origins between
+  refits is evaluated in parallel worker processes.
+- LSTM: trained once on the bars known at the first origin, then fine-tuned
+  on the bars added since (plus a replay of recent windows) every
+  `refit_every` origins, like a stored model on new data. Each block's
+  forecasts run as one batched recursive pass of the NumPy engine.
+
+    python -m scripts.backtest.walk_forward --tickers AAPL MSFT --origins 250
+"""
+import os
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scripts.utils import storage
+from scripts.features.cache import get_features
+from scripts.features.matrices import feature_matrix, horizon_targets
+from scripts.backtest.rls import RecursiveLeastSquares
+
+BACKTEST_FOLDER = os.path.join(storage.DATA_DIR, 'backtests')
+HORIZONS = tuple(range(1, 8))
+RLS_MODELS = ("Linear Regression", "Multiple Regression")
+XGB_PARAMS = {"n_estimators": 200, "learning_rate": 0.05, "max_depth": 5}
+LSTM_PARAMS = {"seq_length": 60, "units": 50, "epochs": 5, "batch_size": 32}
+DEFAULT_MODELS = ("Linear Regression", "Multiple Regression", "XGBoost", "LSTM")
+
+
+def _origins(first_valid, n, min_train, max_origins, step):
+    """Origins with at least `min_train` usable rows before them and one bar after."""
+    start = first_valid + min_train + max(HORIZONS)
+    origins = np.arange(start, n - 1, step)
+    if max_origins:
+        origins = origins[-max_origins:]
+    return origins
+
+
+def rls_errors(X, close, first_valid, origins, horizons=HORIZONS):
+    """
+    Forecast errors (len(origins), len(horizons)) for an expanding-window
+    linear model, updated recursively from origin to origin.
+    """
+    Y = horizon_targets(close, horizons)
+    errors = np.full((len(origins), len(horizons)), np.nan)
+    if len(origins) == 0:
+        return errors
+    for j, h in enumerate(horizons):
+        # Rows whose target is known at the first origin
+        end = origins[0] - h + 1
+        model = RecursiveLeastSquares(X[first_valid:end], Y[first_valid:end, j])
+        known = end
+        for i, t in enumerate(origins):
+            while known <= t - h:
+                model.update(X[known], Y[known, j])
+                known += 1
+            if t + h < len(close):
+                errors[i, j] = model.predict(X[t])[0] - close[t + h]
+    return errors
+
+
+def _xgb_block(ticker, block, first_valid, horizons, params, threads):
+    """Worker: fit once on rows known at block[0], forecast every origin in the block."""
+    from xgboost import XGBRegressor
+    feats = get_features(ticker)
+    X, _ = feature_matrix(feats, "XGBoost")
+    close = feats["Close"]
+    Y = horizon_targets(close, horizons)
+    end = block[0] - max(horizons) + 1
+    model = XGBRegressor(tree_method="hist", n_jobs=threads, random_state=42, **params)
+    model.fit(X[first_valid:end], Y[first_valid:end])
+    preds = model.predict(X[block]).reshape(len(block), len(horizons))
+    errors = np.full_like(preds, np.nan)
+    for j, h in enumerate(horizons):
+        ok = block + h < len(close)
+        errors[ok, j] = preds[ok, j] - close[block[ok] + h]
+    return errors
+
+
+def xgb_errors(ticker, first_valid, n, origins, refit_every=20, workers=None, horizons=HORIZONS, params=None):
+    params = params or XGB_PARAMS
+    if len(origins) == 0:
+        return np.full((0, len(horizons)), np.nan)
+    blocks = [origins[i:i + refit_every] for i in range(0, len(origins), refit_every)]
+    workers = workers or min(len(blocks), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers == 1:
+        return np.vstack([_xgb_block(ticker, b, first_valid, horizons, params, threads) for b in blocks])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = pool.map(_xgb_block, [ticker] * len(blocks), blocks, [first_valid] * len(blocks),
+                         [horizons] * len(blocks), [params] * len(blocks), [threads] * len(blocks))
+        return np.vstack(list(parts))
+
+
+def lstm_errors(close, origins, refit_every=20, horizons=HORIZONS, params=None):
+    """
+    Forecast errors (len(origins), len(horizons)) for the LSTM, fine-tuned on
+    the newly known bars every `refit_every` origins.
+    """
+    import tensorflow as tf
+    from scripts.models.LSTM.lstm import build_lstm, FINE_TUNE_EPOCHS, FINE_TUNE_REPLAY
+    from scripts.models.LSTM.datasets import WindowDataset
+    from scripts.models.LSTM.inference import LSTMEngine
+    params = {**LSTM_PARAMS, **(params or {})}
+    seq_length, batch_size = params["seq_length"], params["batch_size"]
+    errors = np.full((len(origins), len(horizons)), np.nan)
+    if len(origins) == 0:
+        return errors
+    close = np.asarray(close, dtype=float)
+    # Scaled on the range known at the first origin, kept for every fine-tune
+    low, high = close[:origins[0] + 1].min(), close[:origins[0] + 1].max()
+    scaled = ((close - low) / ((high - low) or 1.0)).astype(np.float32)
+    steps = max(horizons)
+    columns = np.asarray(horizons) - 1
+    tf.keras.utils.set_random_seed(42)
+    model, known = None, None
+    for i in range(0, len(origins), refit_every):
+        block = origins[i:i + refit_every]
+        # Windows whose target is known at the block's first origin
+        history = scaled[:block[0] + 1]
+        if model is None:
+            model = build_lstm(seq_length, params["units"])
+            model.fit(WindowDataset([history], seq_length, batch_size), epochs=params["epochs"], verbose=0)
+        else:
+            start = max(seq_length, known - FINE_TUNE_REPLAY)
+            model.fit(WindowDataset([history], seq_length, batch_size, starts=[start]),
+                      epochs=FINE_TUNE_EPOCHS, verbose=0)
+        known = len(history)
+        windows = np.stack([scaled[t - seq_length + 1:t + 1] for t in block])[:, :, None]
+        preds = LSTMEngine.from_keras(model).forecast(windows, steps=steps)[:, columns]
+        preds = preds * ((high - low) or 1.0) + low
+        for j, h in enumerate(horizons):
+            ok = block + h < len(close)
+            errors[i:i + len(block)][ok, j] = preds[ok, j] - close[block[ok] + h]
+    return errors
+
+
+def error_curves(ticker, model_name, errors, close, origins, horizons=HORIZONS):
+    """Per-horizon MAE / RMSE / MAPE rows for one model."""
+    rows = []
+    for j, h in enumerate(horizons):
+        e = errors[:, j]
+        ok = ~np.isnan(e)
+        actual = close[origins[ok] + h]
+        rows.append({
+            "ticker": ticker,
+            "model": model_name,
+            "horizon": h,
+            "origins": int(ok.sum()),
+            "mae": float(np.mean(np.abs(e[ok]))) if ok.any() else np.nan,
+            "rmse": float(np.sqrt(np.mean(e[ok] ** 2))) if ok.any() else np.nan,
+            "mape": float(np.mean(np.abs(e[ok] / actual)) * 100) if ok.any() else np.nan,
+        })
+    return rows
+
+
+def backtest_ticker(ticker, models=DEFAULT_MODELS,
+                    min_train=120, max_origins=250, step=1, refit_every=20, workers=None):
+    """Error curves (DataFrame) for `ticker` over the last `max_origins` origins."""
+    feats = get_features(ticker)
+    if feats is None:
+        raise FileNotFoundError(f"No stored data found for {ticker}")
+    close = feats["Close"]
+    rows = []
+    for model_name in models:
+        if model_name == "LSTM":
+            # Needs close prices only: `min_train` counts training windows
+            origins = _origins(LSTM_PARAMS["seq_length"], len(close), min_train, max_origins, step)
+            errors = lstm_errors(close, origins, refit_every)
+            rows.extend(error_curves(ticker, model_name, errors, close, origins))
+            continue
+        X, first_valid = feature_matrix(feats, model_name)
+        if first_valid < 0:
+            continue
+        origins = _origins(first_valid, len(close), min_train, max_origins, step)
+        if model_name in RLS_MODELS:
+            errors = rls_errors(X, close, first_valid, origins)
+        elif model_name == "XGBoost":
+            errors = xgb_errors(ticker, first_valid, len(close), origins, refit_every, workers)
+        else:
+            raise ValueError(f"No backtest for model '{model_name}'")
+        rows.extend(error_curves(ticker, model_name, errors, close, origins))
+    return pd.DataFrame(rows)
+
+
+def run_backtests(tickers=None, output=None, logger=None, **kwargs):
+    if logger is None:
+        logger = print
+    tickers = storage.list_stocks() if tickers is None else tickers
+    output = output or os.path.join(BACKTEST_FOLDER, "error_curves.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    frames = []
+    for t in tickers:
+        try:
+            frames.append(backtest_ticker(t, **kwargs))
+            logger(f"Backtested {t}")
+        except Exception as e:
+            logger(f"❌ Backtest failed for {t}: {e}")
+    curves = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    curves.to_csv(output, index=False)
+    return {"message": f"Backtested {len(frames)} tickers -> {output}", "curves": curves}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecasting models.")
+    parser.add_argument("--tickers", nargs="*", help="tickers (default: all stored)")
+    parser.add_argument("--models", nargs="*", default=list(DEFAULT_MODELS))
+    parser.add_argument("--origins", type=int, default=250, help="number of forecast origins per ticker")
+    parser.add_argument("--min-train", type=int, default=120, help="rows required before the first origin")
+    parser.add_argument("--refit-every", type=int, default=20, help="XGBoost refit / LSTM fine-tune interval (origins)")
+    parser.add_argument("--workers", type=int, help="parallel XGBoost blocks")
+    parser.add_argument("--output", help="CSV of error curves (default: data/backtests/error_curves.csv)")
+    args = parser.parse_args()
+    result = run_backtests(args.tickers, args.output, models=args.models, max_origins=args.origins,
+                           min_train=args.min_train, refit_every=args.refit_every, workers=args.workers)
+    print(result["message"])
+    if not result["curves"].empty:
+        print(result["curves"].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
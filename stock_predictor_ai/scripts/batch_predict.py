@@ -0,0 +1,238 @@
+# batch_predict.py
+"""
+Nightly batch forecasts for every stored ticker.
+
+    python -m scripts.batch_predict                          # all tickers, all models
+    python -m scripts.batch_predict --models LSTM XGBoost --workers 8
+    python -m scripts.batch_predict --output data/forecasts/nightly.parquet
+    python -m scripts.batch_predict --output data/forecasts/nightly.csv --resume
+
+Tickers are spread over a pool of worker processes, a bounded number at a
+time. Each finished ticker is appended to the output table and recorded in a
+checkpoint file next to it, so a crashed run restarts with --resume where it
+stopped. Parquet output is written from the CSV stream at the end, in chunks.
+A resumed run keeps the rows of every checkpointed ticker (read back from the
+Parquet file if the earlier run already finished) and drops rows appended for
+a ticker the checkpoint never recorded.
+The regression models are solved for every ticker up front in one batched
+least-squares pass (except tickers with a tuned config for them, which run
+per ticker like the other models); only the remaining models go through the pool. The
+workers read prices from one shared-memory panel (scripts.utils.panel)
+published by the parent, instead of each loading its own copy per ticker.
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from scripts.utils import storage, panel
+from scripts.models.ensemble.combine import MODELS, run_model, _init_worker
+from scripts.models.regression.batched import UNIVERSE_FUNCTIONS
+from scripts.tuning.configs import tuned_params
+
+FORECAST_FOLDER = os.path.join(storage.DATA_DIR, 'forecasts')
+COLUMNS = ["ticker", "model", "prediction", "mae", "rmse", "next_7_days",
+           "error", "model_seconds", "ticker_seconds", "data_version", "run_at"]
+
+
+def predict_ticker(ticker, models, precomputed=None):
+    """
+    Worker: run `models` for one ticker and return its output rows.
+    `precomputed` ({model: result}) holds results already solved in batch.
+    """
+    start = time.perf_counter()
+    data_version = storage.data_version(ticker)
+    precomputed = precomputed or {}
+    rows = []
+    for name in models:
+        t0 = time.perf_counter()
+        result = precomputed[name] if name in precomputed else run_model(name, ticker)
+        metrics = result.get("metrics", {})
+        prediction = result.get("prediction")
+        rows.append({
+            "ticker": ticker,
+            "model": name,
+            "prediction": float(prediction) if isinstance(prediction, (int, float)) else None,
+            "mae": result.get("mae", metrics.get("MAE")),
+            "rmse": result.get("rmse", metrics.get("RMSE")),
+            "next_7_days": json.dumps([float(v) for v in result["next_7_days"]]) if "next_7_days" in result else None,
+            "error": result.get("error"),
+            "model_seconds": round(time.perf_counter() - t0, 3),
+            "data_version": data_version,
+        })
+    total = round(time.perf_counter() - start, 3)
+    run_at = datetime.now().isoformat(timespec="seconds")
+    for row in rows:
+        row["ticker_seconds"] = total
+        row["run_at"] = run_at
+    return ticker, rows
+
+
+def _init_batch_worker(threads, descriptor):
+    _init_worker(threads)
+    panel.init_worker(descriptor)
+
+
+def _read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _append_rows(csv_path, rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df.to_csv(csv_path, mode="a", header=not os.path.exists(csv_path), index=False)
+
+
+def _parquet_to_csv(parquet_path, csv_path):
+    """Seed the streamed CSV with the rows of an earlier Parquet output, in batches."""
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(parquet_path).iter_batches():
+        _append_rows(csv_path, batch.to_pandas().to_dict("records"))
+
+
+def _keep_checkpointed(csv_path, done, chunksize=50_000):
+    """
+    Drop rows of tickers missing from the checkpoint: they were appended by a
+    run that stopped before recording the ticker, which is forecast again.
+    """
+    tmp_path = f"{csv_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, on_bad_lines="skip",
+                             dtype={"ticker": "string", "error": "string", "next_7_days": "string"}):
+        chunk = chunk[chunk["ticker"].isin(done)]
+        chunk.to_csv(tmp_path, mode="a", header=not os.path.exists(tmp_path), index=False)
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, csv_path)
+    else:
+        os.remove(csv_path)
+
+
+def _csv_to_parquet(csv_path, parquet_path, chunksize=50_000):
+    """Convert the streamed CSV to Parquet without loading it all at once."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    tmp_path = f"{parquet_path}.tmp"
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype={"error": "string", "next_7_days": "string"}):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, parquet_path)
+
+
+def run_batch(tickers=None, models=None, output=None, workers=None, resume=False, logger=None):
+    """Forecast `tickers` (default: all stored) and stream the rows to `output`."""
+    if logger is None:
+        logger = print
+    tickers = storage.list_stocks() if tickers is None else tickers
+    models = list(models or MODELS)
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    output = output or os.path.join(FORECAST_FOLDER, f"forecasts_{datetime.now():%Y%m%d}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    to_parquet = output.endswith(".parquet")
+    csv_path = output[:-len(".parquet")] + ".partial.csv" if to_parquet else output
+    checkpoint_path = f"{output}.checkpoint"
+
+    done = _read_checkpoint(checkpoint_path) if resume else set()
+    if not resume:
+        for path in (csv_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    else:
+        if to_parquet and os.path.exists(output) and not os.path.exists(csv_path):
+            # The earlier run finished and converted its rows: carry them over
+            _parquet_to_csv(output, csv_path)
+        if os.path.exists(csv_path):
+            _keep_checkpointed(csv_path, done)
+    todo = [t for t in tickers if t not in done]
+    logger(f"Forecasting {len(todo)} tickers ({len(done)} already done) with {workers} workers...")
+
+    # Regression models are solved for every ticker at once, up front
+    batched = {}
+    for name in [m for m in models if m in UNIVERSE_FUNCTIONS]:
+        # Tickers with a tuned config run per ticker, where registry.predict applies it
+        untuned = [t for t in todo if not tuned_params(name, t)]
+        try:
+            batched[name] = UNIVERSE_FUNCTIONS[name](untuned) if untuned else {}
+        except Exception as e:
+            logger(f"⚠️ Batched {name} failed, running it per ticker: {e}")
+
+    start = time.perf_counter()
+    finished = 0
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with open(checkpoint_path, "a") as checkpoint:
+        def record(t, rows):
+            nonlocal finished
+            _append_rows(csv_path, rows)
+            checkpoint.write(t + "\n")
+            checkpoint.flush()
+            finished += 1
+            logger(f"[{finished}/{len(todo)}] {t} done in {rows[0]['ticker_seconds']}s")
+
+        if all(name in batched for name in models):
+            # Nothing left to run per ticker: no need for a process pool
+            for t in todo:
+                record(*predict_ticker(t, models, {name: batched[name][t] for name in models if t in batched[name]}))
+        else:
+            with panel.publish(todo) as shared, \
+                    ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_batch_worker, initargs=(threads, shared.descriptor),
+                                        max_tasks_per_child=50) as pool:
+                pending = set()
+                queue = iter(todo)
+                while True:
+                    # Keep a bounded number of tickers in flight
+                    while len(pending) < 2 * workers:
+                        t = next(queue, None)
+                        if t is None:
+                            break
+                        precomputed = {name: results[t] for name, results in batched.items() if t in results}
+                        pending.add(pool.submit(predict_ticker, t, models, precomputed))
+                    if not pending:
+                        break
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        try:
+                            record(*future.result())
+                        except Exception as e:
+                            logger(f"❌ Worker failed: {e}")
+
+    if to_parquet and os.path.exists(csv_path):
+        _csv_to_parquet(csv_path, output)
+        os.remove(csv_path)
+
+    seconds = time.perf_counter() - start
+    return {
+        "message": f"Forecast {finished} tickers in {seconds:.1f}s -> {output}",
+        "output": output,
+        "finished": finished,
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch forecasts for every stored ticker.")
+    parser.add_argument("--tickers", nargs="*", help="tickers to forecast (default: all stored)")
+    parser.add_argument("--models", nargs="*", choices=list(MODELS), help="models to run (default: all)")
+    parser.add_argument("--output", help="output .csv or .parquet (default: data/forecasts/forecasts_<date>.csv)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: half the cores)")
+    parser.add_argument("--resume", action="store_true", help="skip tickers already in the checkpoint")
+    args = parser.parse_args()
+    result = run_batch(args.tickers, args.models, args.output, args.workers, args.resume)
+    print(result["message"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# import_time.py
+"""
+Cold-start import latency of the app and the CLI entry points.
+
+Every target is imported in a fresh interpreter (`python -X importtime`), so
+nothing is cached in-process; the median wall time over --repeat runs is
+reported along with the slowest modules it pulled in. For app.py only its
+import statements are run (the page itself needs a Streamlit session).
+
+    python -m scripts.benchmarks.import_time
+    python -m scripts.benchmarks.import_time --repeat 5 --output data/benchmarks/import_time.json
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '..', '..', '..'))
+
+TARGETS = {
+    "app": None,  # import statements of app.py
+    "data_manager": "scripts.utils.data_manager",
+    "jobs": "scripts.utils.jobs",
+    "batch_predict": "scripts.batch_predict",
+    "walk_forward": "scripts.backtest.walk_forward",
+    "migrate_storage": "scripts.utils.migrate_storage",
+}
+
+# Modules that must not be imported at startup by the lightweight targets
+HEAVY_MODULES = ("tensorflow", "xgboost", "ta", "scipy.signal", "matplotlib.pyplot")
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def app_imports(path=os.path.join(BASE_DIR, "app.py")):
+    """Source of the top-level import statements in app.py."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _code(target):
+    module = TARGETS[target]
+    return app_imports() if module is None else f"import {module}"
+
+
+def measure(target):
+    """(seconds, {module: cumulative microseconds}) for one cold import."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _code(target)],
+                          cwd=BASE_DIR, capture_output=True, text=True,
+                          env={**os.environ, "PYTHONPATH": BASE_DIR, "TF_CPP_MIN_LOG_LEVEL": "3"})
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{target} failed to import:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return seconds, modules
+
+
+def benchmark(targets=None, repeat=3, top=5):
+    """[{target, median_s, min_s, heavy, slowest}] for each target."""
+    results = []
+    for target in targets or TARGETS:
+        runs = [measure(target) for _ in range(repeat)]
+        times = [seconds for seconds, _ in runs]
+        modules = runs[-1][1]
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+        # Only top-level packages, so e.g. pandas isn't listed once per submodule
+        slowest = [(m, us) for m, us in slowest if "." not in m][:top]
+        results.append({
+            "target": target,
+            "median_s": round(statistics.median(times), 3),
+            "min_s": round(min(times), 3),
+            "heavy": [m for m in HEAVY_MODULES if m in modules],
+            "slowest": [{"module": m, "ms": round(us / 1000, 1)} for m, us in slowest],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app and CLIs.")
+    parser.add_argument("--targets", nargs="*", choices=list(TARGETS), help="default: all")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target")
+    parser.add_argument("--output", help="append results to this JSON file")
+    args = parser.parse_args()
+
+    results = benchmark(args.targets, args.repeat)
+    for r in results:
+        slowest = ", ".join(f"{s['module']} {s['ms']:.0f}ms" for s in r["slowest"])
+        heavy = f"  HEAVY: {', '.join(r['heavy'])}" if r["heavy"] else ""
+        print(f"{r['target']:<16} {r['median_s']:>6.2f}s (min {r['min_s']:.2f}s)  [{slowest}]{heavy}")
+
+    if args.output:
+        history = []
+        if os.path.exists(args.output):
+            with open(args.output) as f:
+                history = json.load(f)
+        history.append({"timestamp": datetime.now().isoformat(timespec="seconds"), "results": results})
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(history, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# pipeline.py
+"""
+End-to-end pipeline benchmark on synthetic data.
+
+Each scale (number of tickers) runs in a fresh interpreter with its own
+throwaway STOCK_DATA_DIR, so caches and stored models never leak between
+runs or into the real data folder. Stages:
+
+- download:   data_manager.fetch_stocks with the offline FakeProvider
+              (raw snapshot + clean + store for every ticker)
+- clean:      clean_data_auto_single on every raw CSV
+- indicators: compute_indicators on every stored close series
+- predict:<model>: each registered model on the first --model-sample tickers
+- combine:    combine_predictions on a ticker the models haven't seen
+- update:     data_manager.update_stocks after the provider moves 5 days on
+- delete:     data_manager.delete_stocks for every ticker
+
+Results can be appended to a JSON history (--output) and compared with a
+baseline run (--baseline); a stage that is more than --threshold slower than
+the baseline (and slower by at least --min-seconds) is a regression and the
+exit status is 1.
+
+    python -m scripts.benchmarks.pipeline --scales 1 100 --skip-models
+    python -m scripts.benchmarks.pipeline --save-baseline data/benchmarks/pipeline_baseline.json
+    python -m scripts.benchmarks.pipeline --baseline data/benchmarks/pipeline_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '..', '..', '..'))
+
+SCALES = (1, 100, 1000)
+UPDATE_DAYS = 5
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+@contextmanager
+def _stage(stages, name, count):
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    stages[name] = {
+        "seconds": round(seconds, 4),
+        "count": count,
+        "per_item_ms": round(1000 * seconds / max(count, 1), 3),
+    }
+
+
+def run_scale(n, years=5, model_sample=2, models=None, skip_models=False, group_size=20):
+    """
+    Time every stage for `n` synthetic tickers. Must run in a process whose
+    STOCK_DATA_DIR is a scratch folder (see benchmark()).
+    """
+    import pandas as pd
+    from scripts.benchmarks.synthetic import FakeProvider, synthetic_tickers
+    from scripts.utils import storage, universe
+    from scripts.utils import data_manager as dm
+    from scripts.data_collection_clean_delete_update.clean_data import clean_data_auto_single
+    from scripts.features.indicators import compute_indicators
+
+    tickers = synthetic_tickers(n)
+    universe_file = os.path.join(storage.DATA_DIR, "synthetic_universe.json")
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    with open(universe_file, "w") as f:
+        json.dump(tickers, f)
+    universe.get_sp500_tickers(local_file=universe_file, logger=_quiet)
+
+    # Stored history ends UPDATE_DAYS business days ago; the update fetches the rest
+    today = pd.Timestamp.today().normalize()
+    provider = FakeProvider(years=years, end=today - pd.offsets.BDay(UPDATE_DAYS))
+    stages = {}
+
+    with _stage(stages, "download", n):
+        result = dm.fetch_stocks(choice="custom", num=n, download_fn=provider, logger=_quiet, group_size=group_size)
+    if result["failed"]:
+        raise RuntimeError(f"Synthetic download failed: {result['failed']}")
+
+    with _stage(stages, "clean", n):
+        for t in tickers:
+            clean_data_auto_single(storage.raw_path(t), storage.CLEANED_FOLDER, save=False)
+
+    closes = [storage.load_arrays(t)["Close"] for t in tickers]
+    if closes:
+        compute_indicators(closes[0][:100])  # lazy imports (scipy.signal) aren't part of the cost
+    with _stage(stages, "indicators", n):
+        for close in closes:
+            compute_indicators(close)
+
+    if not skip_models:
+        from scripts.models import registry
+        from scripts.models.ensemble.combine import combine_predictions, shutdown_pool
+        sample = tickers[:model_sample]
+        for name in models or registry.names():
+            registry.get(name).load()  # import time isn't part of the model's cost
+            with _stage(stages, f"predict:{name}", len(sample)):
+                for t in sample:
+                    registry.predict(name, t)
+        # A ticker the models haven't run on, so nothing comes from the caches
+        combine_ticker = tickers[-1]
+        with _stage(stages, "combine", 1):
+            combine_predictions(combine_ticker)
+        stages["combine"]["warm"] = combine_ticker in sample
+        shutdown_pool()
+
+    provider.end = today
+    with _stage(stages, "update", n):
+        result = dm.update_stocks(download_fn=provider, logger=_quiet, group_size=group_size)
+    if result.get("status") != "success":
+        raise RuntimeError(f"Synthetic update failed: {result.get('message')}")
+
+    with _stage(stages, "delete", n):
+        dm.delete_stocks(tickers=tickers, logger=_quiet)
+
+    return {"tickers": n, "years": years, "rows": len(closes[0]) if closes else 0, "stages": stages}
+
+
+def _worker_args(args):
+    return ["--years", str(args.years), "--model-sample", str(args.model_sample), "--group-size",
+            str(args.group_size)] + (["--skip-models"] if args.skip_models else []) + \
+           (["--models", *args.models] if args.models else [])
+
+
+def benchmark(scales, extra_args=()):
+    """Run each scale in a fresh interpreter on a scratch data folder."""
+    results = []
+    for n in scales:
+        with tempfile.TemporaryDirectory(prefix="stock-bench-") as scratch:
+            result_file = os.path.join(scratch, "result.json")
+            env = {**os.environ, "PYTHONPATH": BASE_DIR, "TF_CPP_MIN_LOG_LEVEL": "3",
+                   "STOCK_DATA_DIR": os.path.join(scratch, "data"), "STOCK_UNIVERSE_FILE": ""}
+            proc = subprocess.run([sys.executable, "-m", "scripts.benchmarks.pipeline", "--worker", str(n),
+                                   "--result-file", result_file, *extra_args],
+                                  cwd=BASE_DIR, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"Benchmark at {n} tickers failed:\n{proc.stderr[-2000:]}")
+            with open(result_file) as f:
+                results.append(json.load(f))
+    return results
+
+
+def _latest_run(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data[-1]["results"] if isinstance(data, list) else data["results"]
+
+
+def compare(results, baseline, threshold=0.25, min_seconds=0.05):
+    """
+    [{tickers, stage, baseline_s, seconds, ratio, regression}] for every stage
+    present in both runs.
+    """
+    base = {(r["tickers"], stage): s["seconds"] for r in baseline for stage, s in r["stages"].items()}
+    rows = []
+    for r in results:
+        for stage, s in r["stages"].items():
+            if (r["tickers"], stage) not in base:
+                continue
+            before, now = base[(r["tickers"], stage)], s["seconds"]
+            ratio = now / before if before else float("inf")
+            rows.append({
+                "tickers": r["tickers"],
+                "stage": stage,
+                "baseline_s": before,
+                "seconds": now,
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1 + threshold and now - before >= min_seconds,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data and model pipeline on synthetic tickers.")
+    parser.add_argument("--scales", nargs="*", type=int, default=list(SCALES), help="ticker counts to run")
+    parser.add_argument("--years", type=int, default=5, help="years of daily history per ticker")
+    parser.add_argument("--model-sample", type=int, default=2, help="tickers each predict_* is timed on")
+    parser.add_argument("--models", nargs="*", help="registered models to time (default: all)")
+    parser.add_argument("--skip-models", action="store_true", help="only time the data stages")
+    parser.add_argument("--group-size", type=int, default=20, help="tickers per provider request")
+    parser.add_argument("--output", help="append results to this JSON file")
+    parser.add_argument("--save-baseline", help="write results to this JSON file as the new baseline")
+    parser.add_argument("--baseline", help="compare with the latest run in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        result = run_scale(args.worker, args.years, args.model_sample, args.models, args.skip_models,
+                           args.group_size)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return
+
+    results = benchmark(args.scales, _worker_args(args))
+    for r in results:
+        print(f"{r['tickers']} tickers x {r['rows']} rows")
+        for stage, s in r["stages"].items():
+            print(f"  {stage:<30} {s['seconds']:>9.3f}s  {s['per_item_ms']:>10.2f} ms/item")
+
+    run = {"timestamp": datetime.now().isoformat(timespec="seconds"), "results": results}
+    for path, append in ((args.output, True), (args.save_baseline, False)):
+        if not path:
+            continue
+        history = []
+        if append and os.path.exists(path):
+            with open(path) as f:
+                history = json.load(f)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(history + [run] if append else run, f, indent=2)
+
+    if args.baseline:
+        rows = compare(results, _latest_run(args.baseline), args.threshold, args.min_seconds)
+        regressions = [r for r in rows if r["regression"]]
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for r in rows:
+            flag = "  REGRESSION" if r["regression"] else ""
+            print(f"  {r['tickers']:>5} {r['stage']:<30} {r['baseline_s']:>9.3f}s -> {r['seconds']:>9.3f}s "
+                  f"(x{r['ratio']:.2f}){flag}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
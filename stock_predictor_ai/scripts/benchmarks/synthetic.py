@@ -0,0 +1,75 @@
+# synthetic.py
+"""
+Deterministic synthetic OHLCV data for benchmarks.
+
+make_ohlcv() builds a multi-year daily history in the raw yfinance layout
+((Price, Ticker) two-level columns, Date index), so it goes through
+clean_data_auto_single / clean_frame exactly like a real download. Prices are
+a geometric random walk seeded from the ticker name: the same ticker always
+gets the same series.
+
+FakeProvider is an offline `download_fn` for the download engine, serving
+these histories up to a movable `end` date so the update path has new bars
+to fetch.
+"""
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+FIELDS = ("Close", "High", "Low", "Open", "Volume")
+DEFAULT_END = "2025-12-31"
+
+
+def synthetic_tickers(n):
+    """`n` made-up symbols: SYN0000, SYN0001, ..."""
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def _seed(ticker):
+    return zlib.crc32(ticker.encode())
+
+
+def make_ohlcv(ticker, years=5, end=DEFAULT_END, start=None):
+    """
+    Raw-layout OHLCV frame for `ticker`: `years` of business days up to `end`,
+    optionally cut to the rows from `start` on.
+    """
+    end = pd.Timestamp(end).normalize()
+    dates = pd.bdate_range(end - pd.DateOffset(years=years), end, name="Date")
+    n = len(dates)
+    rng = np.random.default_rng(_seed(ticker))
+    drift, vol = rng.normal(0.0003, 0.0002), rng.uniform(0.01, 0.03)
+    close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, vol / 4, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, n)))
+    volume = rng.lognormal(14, 0.5, n).astype("int64")
+
+    columns = pd.MultiIndex.from_tuples([(f, ticker) for f in FIELDS], names=["Price", "Ticker"])
+    df = pd.DataFrame({c: v for c, v in zip(columns, (close, high, low, open_, volume))}, index=dates)
+    df.columns = columns
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    return df
+
+
+class FakeProvider:
+    """
+    Offline `download_fn(tickers, start=..., **kwargs)` returning synthetic
+    multi-symbol frames, with optional per-request `latency` (seconds).
+    """
+
+    def __init__(self, years=5, end=DEFAULT_END, latency=0.0, host="synthetic"):
+        self.years = years
+        self.end = pd.Timestamp(end)
+        self.latency = latency
+        self.host = host
+        self.requests = 0
+
+    def __call__(self, tickers, start=None, **kwargs):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        return pd.concat([make_ohlcv(t, self.years, self.end, start) for t in tickers], axis=1)
@@ -1,9 +1,44 @@
 import pandas as pd
 import os
 
-def clean_data_auto_single(file_path, cleaned_folder):
-    """Clean a single CSV file and save to cleaned folder."""
-    os.makedirs(cleaned_folder, exist_ok=True)
+# Stored as float32 (prices) / int64 (volume) instead of float64
+PRICE_FIELDS = ("Open", "High", "Low", "Close", "Adj Close")
+VOLUME_FIELDS = ("Volume",)
+
+
+def compact_dtypes(df):
+    """Downcast the Close_/High_/Low_/Open_ columns to float32 and Volume_ to int64, in place."""
+    for col in df.columns:
+        field = col.partition('_')[0]
+        if field in PRICE_FIELDS:
+            df[col] = df[col].astype('float32')
+        elif field in VOLUME_FIELDS:
+            df[col] = df[col].fillna(0).round().astype('int64')
+    return df
+
+
+def clean_frame(df):
+    """
+    Flatten a yfinance download (two-level (Price, Ticker) columns, Date index)
+    into the cleaned layout: Date, Close_<T>, High_<T>, ... sorted by Date.
+    Works on the downloaded frame in memory; no CSV round trip. Intraday
+    timestamps keep the exchange's wall-clock time, without the timezone.
+    """
+    df = df.reset_index()
+    first_col = df.columns[0]
+    df.columns = [
+        'Date' if col == first_col else f"{str(col[0]).strip()}_{str(col[1]).strip()}"
+        for col in df.columns
+    ]
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    if df['Date'].dt.tz is not None:
+        df['Date'] = df['Date'].dt.tz_localize(None)
+    df.dropna(subset=['Date'], inplace=True)
+    df.sort_values('Date', inplace=True)
+    return compact_dtypes(df)
+
+def clean_data_auto_single(file_path, cleaned_folder, save=True):
+    """Clean a single CSV file and save to cleaned folder. Returns the cleaned frame."""
     df_raw = pd.read_csv(file_path, header=[0,1], parse_dates=[0])
     first_col = df_raw.columns[0]
     df_raw.columns = [
@@ -13,5 +48,11 @@ def clean_data_auto_single(file_path, cleaned_folder):
     df_raw['Date'] = pd.to_datetime(df_raw['Date'], errors='coerce')
     df_raw.dropna(subset=['Date'], inplace=True)
     df_raw.sort_values('Date', inplace=True)
-    cleaned_file_path = os.path.join(cleaned_folder, os.path.basename(file_path))
-    df_raw.to_csv(cleaned_file_path, index=False)
+    compact_dtypes(df_raw)
+    if save:
+        os.makedirs(cleaned_folder, exist_ok=True)
+        cleaned_file_path = os.path.join(cleaned_folder, os.path.basename(file_path))
+        tmp_path = f"{cleaned_file_path}.{os.getpid()}.tmp"
+        df_raw.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, cleaned_file_path)
+    return df_raw
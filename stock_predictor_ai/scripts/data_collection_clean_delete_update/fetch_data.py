@@ -3,7 +3,7 @@ import os
 import pandas as pd
 import random
 import yfinance as yf
-import requests
+from scripts.utils.universe import get_sp500_tickers
 from .clean_data import clean_data_auto  # auto-clean function
 
 # === Paths ===
@@ -24,11 +24,8 @@ def fetch_stocks(choice="random_100", ticker=None, num=None, min_num=None, max_n
         if choice != "single":
             ticker = None
 
-        # Get S&P 500 tickers
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-        sp500 = pd.read_html(requests.get(url, headers=headers).text)[0]
-        all_tickers = [t.replace('.', '-') for t in sp500['Symbol'].tolist()]
+        # Get S&P 500 tickers (cached, with offline fallback)
+        all_tickers = get_sp500_tickers(logger=logger)
 
         existing = [os.path.splitext(f)[0] for f in os.listdir(RAW_FOLDER) if f.endswith('.csv')]
         remaining = [t for t in all_tickers if t not in existing]
@@ -1,47 +1,110 @@
 # stock_update.py
-import os
+"""
+Incremental updater: for every stored ticker, read its last Date from the
+catalog, download only the bars after it, drop overlaps and append the new
+rows in place. Tickers sharing the same last date go out in one
+multi-symbol request, so one run catches up the whole universe whatever
+the size of each ticker's gap.
+
+With an intraday `interval` the same happens for the tickers stored at that
+interval (scripts.utils.intraday): the download restarts at the day of the
+last bar, and only bars after it are appended to the newest partition.
+
+Cached features of an updated ticker are refreshed right away, streamed
+from their saved indicator state over the new bars only.
+"""
+from collections import defaultdict
 import pandas as pd
-import yfinance as yf
-from datetime import datetime
+from scripts.utils import storage, timing, intraday
+from scripts.utils.downloader import download_many
+from scripts.data_collection_clean_delete_update.clean_data import clean_frame
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-CLEANED_FOLDER = os.path.join(BASE_DIR, 'data', 'cleaned')
-os.makedirs(CLEANED_FOLDER, exist_ok=True)
 
+def new_rows(ticker, df_new, last_date, interval=None):
+    """
+    Cleaned rows of `df_new` strictly after `last_date`, one per Date. For
+    intraday bars, the bar at `last_date` is kept too if it changed since it
+    was stored (it may have been downloaded while still forming).
+    """
+    bars = intraday.is_intraday(interval)
+    df = clean_frame(df_new)
+    df = df[df['Date'] >= last_date] if bars else df[df['Date'] > last_date]
+    df = df.drop_duplicates(subset='Date', keep='last')
+    # Keep only the stored columns, in stored order
+    if bars:
+        stored = intraday.load_bar_arrays(ticker, interval, start=last_date)
+    else:
+        stored = storage.load_arrays(ticker)
+    columns = ['Date'] + [f"{field}_{ticker}" for field in stored if field != 'Date']
+    df = df.dropna(subset=columns[1:], how='all')[columns]
+    if bars and len(df) and df['Date'].iloc[0] == last_date:
+        first = df.iloc[0]
+        if all(first[f"{field}_{ticker}"] == stored[field][-1] for field in stored if field != 'Date'):
+            df = df.iloc[1:]  # the stored bar was already final
+    return df
 
-def update_stocks(logger=None):
-    """Update all cleaned stocks with today's data."""
+
+def update_stocks(tickers=None, logger=None, download_fn=None, max_workers=4, group_size=20, today=None,
+                  interval=intraday.DAILY):
+    """Append the missing `interval` bars for `tickers` (default: every ticker stored at that interval)."""
+    if logger is None:
+        logger = print
     try:
-        files = [f for f in os.listdir(CLEANED_FOLDER) if f.endswith(".csv")]
-        if logger:
-            logger(f"Updating {len(files)} cleaned stocks...")
-        for idx, file in enumerate(files, start=1):
-            ticker = file.replace(".csv", "")
-            path = os.path.join(CLEANED_FOLDER, file)
-            df = pd.read_csv(path, parse_dates=['Date'])
-            stock = yf.Ticker(ticker)
-            df_live = stock.history(period="1d", interval="1d")
-            if df_live.empty:
-                if logger:
-                    logger(f"[!] No data for {ticker}. Skipping.")
+        bars = intraday.is_intraday(interval)
+        if tickers is None:
+            tickers = intraday.list_tickers(interval) if bars else storage.list_stocks()
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        logger(f"Updating {len(tickers)} stored stocks...")
+
+        # Group by the first missing day so each group is one request
+        by_start = defaultdict(list)
+        up_to_date = 0
+        for t in tickers:
+            last = intraday.last_timestamp(t, interval) if bars else storage.last_date(t)
+            if last is None:
+                logger(f"[!] {t} is not stored. Skipping.")
                 continue
-            today = df_live.index[-1].date()
-            if not df[df["Date"].dt.date == today].empty:
-                if logger:
-                    logger(f"[⏩] {ticker}: Already has today's data.")
+            # The last intraday day may be a session still in progress
+            start = last.normalize() + pd.Timedelta(days=0 if bars else 1)
+            if len(pd.bdate_range(start, today)) == 0:
+                up_to_date += 1
                 continue
-            row = pd.DataFrame([{
-                "Date": pd.to_datetime(today),
-                f"Close_{ticker}": df_live["Close"].iloc[-1],
-                f"High_{ticker}": df_live["High"].iloc[-1],
-                f"Low_{ticker}": df_live["Low"].iloc[-1],
-                f"Open_{ticker}": df_live["Open"].iloc[-1],
-                f"Volume_{ticker}": int(df_live["Volume"].iloc[-1])
-            }])
-            df = pd.concat([df, row], ignore_index=True)
-            df.to_csv(path, index=False)
-            if logger:
-                logger(f"[+] Updated {ticker} ({idx}/{len(files)})")
-        return {"status": "success", "message": "All stocks updated successfully!"}
+            by_start[start].append((t, last))
+
+        appended = {}
+        failed = {}
+        for start, group in sorted(by_start.items()):
+            last_by_ticker = dict(group)
+
+            def process(t, df):
+                with timing.stage("clean"):
+                    rows = new_rows(t, df, last_by_ticker[t], interval)
+                with timing.stage("store"):
+                    if bars:
+                        intraday.append_bars(t, interval, rows)
+                    else:
+                        storage.append_stock(t, rows)
+                if len(rows):
+                    # Imported here: the indicators pull in scipy, which app startup shouldn't load
+                    from scripts.features.cache import refresh_features
+                    with timing.stage("features"):
+                        refresh_features(intraday.series_key(t, interval))
+                appended[t] = len(rows)
+                logger(f"[+] {t}: {len(rows)} new bar(s)" if len(rows) else f"[⏩] {t}: Already up to date.")
+
+            with timing.stage("download"):
+                stats = download_many(list(last_by_ticker), process, download_fn=download_fn,
+                                      max_workers=max_workers, group_size=group_size, logger=logger,
+                                      start=start.strftime("%Y-%m-%d"), interval=interval)
+            failed.update(stats["failed"])
+
+        total = sum(appended.values())
+        return {
+            "status": "success",
+            "message": f"Appended {total} new bar(s) across {len(appended)} stocks "
+                       f"({up_to_date} already up to date, {len(failed)} failed).",
+            "appended": appended,
+            "failed": failed,
+        }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -0,0 +1,171 @@
+# cache.py
+"""
+Per-ticker feature cache.
+
+get_features() computes the indicators for a ticker once per
+(ticker, data version, indicator params) and hands every model and the chart
+the same read-only arrays. Entries live in memory (LRU) and as .npz files
+under data/cache/features, so separate processes reuse them too.
+
+Each .npz also holds the streaming indicator state after its last bar
+(scripts.features.streaming). When bars were only appended since the
+previous entry, the new one extends it bar by bar from that state instead
+of recomputing the whole history; the values are identical either way.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from scripts.utils import storage
+from scripts.features.indicators import DEFAULT_PARAMS, compute_indicators, params_key
+from scripts.features.streaming import IndicatorState
+
+FEATURE_CACHE_FOLDER = os.path.join(storage.DATA_DIR, 'cache', 'features')
+MAX_MEMORY_ENTRIES = int(os.environ.get("STOCK_FEATURE_CACHE_SIZE", 64))
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(ticker, version, params):
+    return ticker, version, params_key(params)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _disk_path(key):
+    ticker, version, pkey = key
+    return os.path.join(FEATURE_CACHE_FOLDER, ticker, f"{_digest(version)}_{_digest(pkey)}.npz")
+
+
+# Prefix of the streaming state arrays inside an entry's .npz
+STATE_PREFIX = "state."
+
+
+def _freeze(features):
+    for values in features.values():
+        values.flags.writeable = False
+    return features
+
+
+def _remember(key, features):
+    with _lock:
+        _memory[key] = features
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def get_features(ticker, params=None):
+    """
+    {"Date", "Close", <indicator names>...} for `ticker`, or None if the
+    ticker isn't stored. Arrays are shared between callers: don't modify them.
+    """
+    params = DEFAULT_PARAMS if params is None else params
+    version = storage.data_version(ticker)
+    if version is None:
+        return None
+    key = _cache_key(ticker, version, params)
+
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key]
+
+    path = _disk_path(key)
+    if os.path.exists(path):
+        try:
+            with np.load(path) as stored:
+                features = _freeze({name: stored[name] for name in stored.files
+                                    if not name.startswith(STATE_PREFIX)})
+            _remember(key, features)
+            return features
+        except Exception:
+            pass  # unreadable entry: recompute below
+
+    arrays = storage.load_arrays(ticker)
+    close = np.array(arrays["Close"], dtype=float)
+    dates = np.array(arrays["Date"])
+    ticker_dir = os.path.dirname(path)
+    extended = _extend_previous(ticker_dir, os.path.basename(path), dates, close, params)
+    if extended is not None:
+        features, state = extended
+    else:
+        features = {"Date": dates, "Close": close}
+        features.update(compute_indicators(close, params))
+        state = IndicatorState.from_history(close, params)
+    features = _freeze(features)
+
+    # Entries for older versions of this ticker are stale now
+    if os.path.isdir(ticker_dir):
+        for f in os.listdir(ticker_dir):
+            if not f.startswith(_digest(version)):
+                try:
+                    os.remove(os.path.join(ticker_dir, f))
+                except OSError:
+                    pass
+    os.makedirs(ticker_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **features, **{STATE_PREFIX + name: v for name, v in state.to_arrays().items()})
+    os.replace(tmp_path, path)
+
+    _remember(key, features)
+    return features
+
+
+def _extend_previous(ticker_dir, filename, dates, close, params):
+    """
+    (features, state) for `close` from the newest older entry with the same
+    params, if the stored series only grew since it; otherwise None.
+    """
+    if not os.path.isdir(ticker_dir):
+        return None
+    suffix = filename.split("_", 1)[1]
+    previous = [os.path.join(ticker_dir, f) for f in os.listdir(ticker_dir)
+                if f.endswith(suffix) and f != filename]
+    if not previous:
+        return None
+    try:
+        with np.load(max(previous, key=os.path.getmtime)) as stored:
+            old = {name: stored[name] for name in stored.files}
+    except Exception:
+        return None
+    n_old = len(old["Close"])
+    if not (0 < n_old <= len(close) and np.array_equal(old["Date"], dates[:n_old])
+            and np.array_equal(old["Close"], close[:n_old])):
+        return None  # rewritten, not appended
+
+    saved = {name[len(STATE_PREFIX):]: v for name, v in old.items() if name.startswith(STATE_PREFIX)}
+    if not saved:
+        return None  # entry written before states were kept
+    state = IndicatorState.from_arrays(saved, params)
+    new = state.run(close[n_old:]) if n_old < len(close) else {}
+    features = {"Date": dates, "Close": close}
+    for name, values in old.items():
+        if name not in features and not name.startswith(STATE_PREFIX):
+            features[name] = np.concatenate([values, new[name]]) if new else values
+    return features, state
+
+
+def refresh_features(ticker, params=None):
+    """
+    After new bars were appended, bring `ticker`'s cached features up to date
+    (streamed from the previous entry). Tickers without cached features are
+    left alone until something asks for them.
+    """
+    if os.path.isdir(os.path.join(FEATURE_CACHE_FOLDER, ticker)):
+        get_features(ticker, params)
+
+
+def clear_features(ticker=None):
+    """Drop cached features for `ticker` (or everything)."""
+    with _lock:
+        for key in [k for k in _memory if ticker is None or k[0] == ticker]:
+            del _memory[key]
+
+
+# Free a ticker's entries as soon as its stored data is rewritten
+storage.on_change(clear_features)
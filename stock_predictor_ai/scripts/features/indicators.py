@@ -0,0 +1,150 @@
+# indicators.py
+"""
+Vectorized technical indicators over a NumPy price array.
+
+compute_indicators() returns every indicator in `params` in one pass over the
+close prices, with the same warm-up NaNs and values as the pandas / `ta`
+versions the models used before:
+
+    SMA_<n>             close.rolling(n).mean()
+    EMA_<n>             close.ewm(span=n, adjust=False).mean()
+    STD_<n>             close.rolling(n).std()                    (ddof=1)
+    RSI_<n>             ta RSIIndicator(window=n)                 (Wilder smoothing)
+    RSI_SMA_<n>         100 - 100 / (1 + rolling-mean gains / losses)
+    MACD_<f>_<s>        ta MACD(window_fast=f, window_slow=s).macd()
+    MACD_SIGNAL_<f>_<s>_<g>  ta MACD(...).macd_signal()
+    BB_UPPER_<n>_<k> / BB_LOWER_<n>_<k>   ta BollingerBands(window=n, window_dev=k)
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_PARAMS = {
+    "sma": (10, 14, 20, 50),
+    "ema": (12, 14, 20, 26),
+    "std": (10, 14, 20),
+    "rsi": (14,),
+    "rsi_sma": (14,),
+    "macd": ((12, 26, 9),),
+    "bollinger": ((20, 2),),
+}
+
+
+def params_key(params):
+    """Stable string for a params dict (used in cache keys)."""
+    return ";".join(f"{name}={tuple(params[name])}" for name in sorted(params))
+
+
+# ----------------------
+# BUILDING BLOCKS
+# ----------------------
+def _mask_head(values, count):
+    """Set the first `count` values to NaN (pandas' min_periods)."""
+    values[:max(count, 0)] = np.nan
+    return values
+
+
+def rolling_mean(x, n):
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        csum = np.cumsum(np.insert(x, 0, 0.0))
+        out[n - 1:] = (csum[n:] - csum[:-n]) / n
+    return out
+
+
+def rolling_std(x, n, ddof=1):
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).std(axis=1, ddof=ddof)
+    return out
+
+
+def ewm(x, alpha):
+    """y[0] = x[0]; y[t] = (1 - alpha) * y[t-1] + alpha * x[t]  (adjust=False)."""
+    from scipy.signal import lfilter  # imported on first use: keeps scipy out of startup imports
+    if len(x) == 0:
+        return np.array([], dtype=float)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return y
+
+
+def ema(x, span):
+    return ewm(x, 2.0 / (span + 1.0))
+
+
+def _ewm_from_first_valid(x, alpha):
+    """ewm that skips leading NaNs, like pandas does."""
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid):
+        start = valid[0]
+        out[start:] = ewm(x[start:], alpha)
+    return out
+
+
+def rsi_wilder(close, n):
+    diff = np.diff(close, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    ema_up = _mask_head(ewm(up, 1.0 / n), n - 1)
+    ema_down = _mask_head(ewm(down, 1.0 / n), n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(ema_down == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_down))
+    return rsi
+
+
+def rsi_sma(close, n):
+    diff = np.diff(close, prepend=np.nan)
+    up = rolling_mean(np.clip(diff, 0, None)[1:], n)
+    down = rolling_mean(-np.clip(diff, None, 0)[1:], n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + up / down)
+    return np.insert(rsi, 0, np.nan)
+
+
+def macd(close, fast, slow, signal, emas=None):
+    emas = emas or {}
+    fast_ema = emas[fast] if fast in emas else ema(close, fast)
+    slow_ema = emas[slow] if slow in emas else ema(close, slow)
+    line = _mask_head(fast_ema - slow_ema, slow - 1)
+    sig = _ewm_from_first_valid(line, 2.0 / (signal + 1.0))
+    first = np.flatnonzero(~np.isnan(line))
+    if len(first):
+        _mask_head(sig, first[0] + signal - 1)
+    return line, sig
+
+
+# ----------------------
+# ONE PASS
+# ----------------------
+def compute_indicators(close, params=None):
+    """
+    Compute every indicator in `params` (default DEFAULT_PARAMS) for `close`.
+    Returns {name: float64 array}, all the same length as `close`.
+    """
+    params = DEFAULT_PARAMS if params is None else params
+    close = np.asarray(close, dtype=float)
+    out = {}
+
+    for n in params.get("sma", ()):
+        out[f"SMA_{n}"] = rolling_mean(close, n)
+    emas = {n: ema(close, n) for n in params.get("ema", ())}
+    for n, values in emas.items():
+        out[f"EMA_{n}"] = values
+    for n in params.get("std", ()):
+        out[f"STD_{n}"] = rolling_std(close, n)
+    for n in params.get("rsi", ()):
+        out[f"RSI_{n}"] = rsi_wilder(close, n)
+    for n in params.get("rsi_sma", ()):
+        out[f"RSI_SMA_{n}"] = rsi_sma(close, n)
+    for fast, slow, signal in params.get("macd", ()):
+        line, sig = macd(close, fast, slow, signal, emas)
+        out[f"MACD_{fast}_{slow}"] = line
+        out[f"MACD_SIGNAL_{fast}_{slow}_{signal}"] = sig
+    for n, k in params.get("bollinger", ()):
+        mid = out.get(f"SMA_{n}")
+        mid = rolling_mean(close, n) if mid is None else mid
+        band = k * rolling_std(close, n, ddof=0)
+        out[f"BB_UPPER_{n}_{k}"] = mid + band
+        out[f"BB_LOWER_{n}_{k}"] = mid - band
+
+    return out
@@ -0,0 +1,56 @@
+# matrices.py
+"""
+Model design matrices built from the cached indicator arrays, with the same
+columns the predict_* functions use. Shared by the backtester and the batch
+engines so they never rebuild features per origin / per trial.
+"""
+import numpy as np
+
+FEATURE_SETS = {
+    "Linear Regression": {
+        "SMA_50": lambda f: f["SMA_50"],
+    },
+    "Multiple Regression": {
+        "SMA_10": lambda f: f["SMA_10"],
+        "SMA_20": lambda f: f["SMA_20"],
+        "Volatility_10": lambda f: f["STD_10"],
+        "RSI_14": lambda f: f["RSI_14"],
+        "MACD": lambda f: f["MACD_12_26"],
+        "MACD_Signal": lambda f: f["MACD_SIGNAL_12_26_9"],
+        "MACD_Diff": lambda f: f["MACD_12_26"] - f["MACD_SIGNAL_12_26_9"],
+        "BB_Upper": lambda f: f["BB_UPPER_20_2"],
+        "BB_Lower": lambda f: f["BB_LOWER_20_2"],
+        "BB_Width": lambda f: f["BB_UPPER_20_2"] - f["BB_LOWER_20_2"],
+    },
+    "XGBoost": {
+        "SMA": lambda f: f["SMA_14"],
+        "EMA": lambda f: f["EMA_14"],
+        "Volatility": lambda f: f["STD_14"],
+        "RSI": lambda f: f["RSI_SMA_14"],
+        "MACD": lambda f: f["EMA_12"] - f["EMA_26"],
+        "BB_upper": lambda f: f["SMA_14"] + 2 * f["STD_14"],
+        "BB_lower": lambda f: f["SMA_14"] - 2 * f["STD_14"],
+    },
+}
+
+
+def feature_matrix(feats, model_name):
+    """
+    (X, first_valid) for `model_name`: X is (rows, features) float64 and
+    first_valid the first row where every feature is defined (-1 if none).
+    """
+    columns = FEATURE_SETS[model_name]
+    X = np.column_stack([build(feats) for build in columns.values()]).astype(float)
+    valid = ~np.isnan(X).any(axis=1)
+    # Indicators only have NaNs during warm-up, so the valid rows are a suffix
+    first_valid = int(np.argmax(valid)) if valid.any() else -1
+    return X, first_valid
+
+
+def horizon_targets(close, horizons):
+    """(rows, len(horizons)) matrix of close[t + h], NaN past the end."""
+    close = np.asarray(close, dtype=float)
+    Y = np.full((len(close), len(horizons)), np.nan)
+    for j, h in enumerate(horizons):
+        Y[:len(close) - h, j] = close[h:]
+    return Y
@@ -0,0 +1,223 @@
+# streaming.py
+"""
+Streaming indicators: the compute_indicators() outputs one bar at a time.
+
+IndicatorState keeps just what the recurrences need: the running sums
+(cumulative close and gain / loss sums over the longest window), the last
+closes for the rolling standard deviations, and the EMA, Wilder RSI and MACD
+signal filter states. update(close) costs O(window) for the longest window,
+whatever the length of the history, and its values are the batch ones
+bit for bit: the sums are the same cumulative sums, and the filters run the
+same arithmetic as indicators.ewm().
+
+    state = IndicatorState.from_history(close)       # vectorized, once
+    state.update(101.3)                              # {"SMA_10": ..., "RSI_14": ..., ...}
+    state.to_arrays()                                # persist (see features.cache)
+"""
+import numpy as np
+from scripts.features.indicators import DEFAULT_PARAMS, ewm
+
+NAN = np.float64(np.nan)
+
+
+def _alpha(span):
+    return 2.0 / (span + 1.0)
+
+
+def _last(values, count):
+    """Last `count` values as a list of float64 scalars."""
+    return [np.float64(v) for v in values[len(values) - count:]]
+
+
+class IndicatorState:
+    """Recurrence state of every indicator in `params` after `rows` bars."""
+
+    def __init__(self, params=None):
+        self.params = DEFAULT_PARAMS if params is None else params
+        p = self.params
+        self.rows = 0
+        self.last_close = NAN
+        # Longest rolling mean / std window
+        self.mean_window = max([*p.get("sma", ()), *(n for n, _ in p.get("bollinger", ())), 1])
+        self.std_window = max([*p.get("std", ()), *(n for n, _ in p.get("bollinger", ())), 1])
+        self.closes = []                       # last std_window closes
+        self.csum = [np.float64(0.0)]          # last mean_window + 1 cumulative sums of close
+        self.gains = {n: [np.float64(0.0)] for n in p.get("rsi_sma", ())}     # cumulative gain sums
+        self.losses = {n: [np.float64(0.0)] for n in p.get("rsi_sma", ())}    # cumulative loss sums
+        spans = set(p.get("ema", ()))
+        for fast, slow, _ in p.get("macd", ()):
+            spans.update((fast, slow))
+        self.ema = {span: [NAN, NAN] for span in sorted(spans)}             # [y, z] per span
+        self.rsi = {n: [NAN, NAN] for n in p.get("rsi", ())}                # [z_up, z_down]
+        self.signal = {tuple(m): [NAN, -1] for m in p.get("macd", ())}       # [z, first row]
+
+    # ----------------------
+    # ONE BAR
+    # ----------------------
+    @staticmethod
+    def _step(x, alpha, z, first):
+        """One step of indicators.ewm(): (y, next z). `first` seeds z like its zi."""
+        if first:
+            z = (1.0 - alpha) * x
+        y = z + alpha * x
+        return y, 0.0 * x - (alpha - 1.0) * y
+
+    def update(self, close):
+        """Advance one bar; returns {name: value} for this bar, as compute_indicators() would."""
+        x = np.float64(close)
+        t = self.rows
+        p = self.params
+        out = {}
+        diff = x - self.last_close if t else NAN
+
+        self.closes = (self.closes + [x])[-self.std_window:]
+        self.csum = (self.csum + [self.csum[-1] + x])[-(self.mean_window + 1):]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for n in p.get("sma", ()):
+                out[f"SMA_{n}"] = (self.csum[-1] - self.csum[-1 - n]) / n if t + 1 >= n else NAN
+
+            for span, state in self.ema.items():
+                state[0], state[1] = self._step(x, _alpha(span), state[1], t == 0)
+            for n in p.get("ema", ()):
+                out[f"EMA_{n}"] = self.ema[n][0]
+
+            for n in p.get("std", ()):
+                out[f"STD_{n}"] = np.std(np.array(self.closes[-n:]), ddof=1) if t + 1 >= n else NAN
+
+            for n, state in self.rsi.items():
+                up = diff if diff > 0 else 0.0
+                down = -diff if diff < 0 else 0.0
+                ema_up, state[0] = self._step(np.float64(up), 1.0 / n, state[0], t == 0)
+                ema_down, state[1] = self._step(np.float64(down), 1.0 / n, state[1], t == 0)
+                if t < n - 1:
+                    ema_up = ema_down = NAN
+                out[f"RSI_{n}"] = np.float64(100.0) if ema_down == 0 else 100.0 - 100.0 / (1.0 + ema_up / ema_down)
+
+            for n in p.get("rsi_sma", ()):
+                if t:
+                    gains, losses = self.gains[n], self.losses[n]
+                    self.gains[n] = (gains + [gains[-1] + np.clip(diff, 0, None)])[-(n + 1):]
+                    self.losses[n] = (losses + [losses[-1] + -np.clip(diff, None, 0)])[-(n + 1):]
+                if t >= n:
+                    up = (self.gains[n][-1] - self.gains[n][0]) / n
+                    down = (self.losses[n][-1] - self.losses[n][0]) / n
+                    out[f"RSI_SMA_{n}"] = 100.0 - 100.0 / (1.0 + up / down)
+                else:
+                    out[f"RSI_SMA_{n}"] = NAN
+
+            for (fast, slow, signal), state in self.signal.items():
+                line = self.ema[fast][0] - self.ema[slow][0] if t >= slow - 1 else NAN
+                sig = NAN
+                if state[1] < 0 and not np.isnan(line):
+                    state[1] = t
+                if state[1] >= 0:
+                    sig, state[0] = self._step(line, _alpha(signal), state[0], t == state[1])
+                    if t < state[1] + signal - 1:
+                        sig = NAN
+                out[f"MACD_{fast}_{slow}"] = line
+                out[f"MACD_SIGNAL_{fast}_{slow}_{signal}"] = sig
+
+            for n, k in p.get("bollinger", ()):
+                if t + 1 >= n:
+                    mid = (self.csum[-1] - self.csum[-1 - n]) / n
+                    band = k * np.std(np.array(self.closes[-n:]), ddof=0)
+                    out[f"BB_UPPER_{n}_{k}"] = mid + band
+                    out[f"BB_LOWER_{n}_{k}"] = mid - band
+                else:
+                    out[f"BB_UPPER_{n}_{k}"] = out[f"BB_LOWER_{n}_{k}"] = NAN
+
+        self.rows = t + 1
+        self.last_close = x
+        return out
+
+    def run(self, closes):
+        """update() over `closes`; returns {name: array} for those bars."""
+        rows = [self.update(c) for c in np.asarray(closes, dtype=float)]
+        names = rows[0].keys() if rows else []
+        return {name: np.array([r[name] for r in rows], dtype=float) for name in names}
+
+    # ----------------------
+    # FROM A HISTORY
+    # ----------------------
+    @classmethod
+    def from_history(cls, close, params=None):
+        """The state after `close`, built with vectorized passes instead of one update() per bar."""
+        state = cls(params)
+        close = np.asarray(close, dtype=float)
+        n_rows = len(close)
+        if n_rows == 0:
+            return state
+        p = state.params
+        state.rows = n_rows
+        state.last_close = np.float64(close[-1])
+        state.closes = _last(close, min(state.std_window, n_rows))
+        csum = np.cumsum(np.insert(close, 0, 0.0))
+        state.csum = _last(csum, min(state.mean_window + 1, len(csum)))
+
+        diff = np.diff(close, prepend=np.nan)
+        for n in p.get("rsi_sma", ()):
+            gains = np.cumsum(np.insert(np.clip(diff, 0, None)[1:], 0, 0.0))
+            losses = np.cumsum(np.insert(-np.clip(diff, None, 0)[1:], 0, 0.0))
+            state.gains[n] = _last(gains, min(n + 1, len(gains)))
+            state.losses[n] = _last(losses, min(n + 1, len(losses)))
+
+        def filter_state(values, alpha):
+            y = np.float64(ewm(values, alpha)[-1])
+            return [y, 0.0 * np.float64(values[-1]) - (alpha - 1.0) * y]
+
+        for span in state.ema:
+            state.ema[span] = filter_state(close, _alpha(span))
+        for n in state.rsi:
+            up = np.where(diff > 0, diff, 0.0)
+            down = np.where(diff < 0, -diff, 0.0)
+            state.rsi[n] = [filter_state(up, 1.0 / n)[1], filter_state(down, 1.0 / n)[1]]
+        for fast, slow, signal in state.signal:
+            line = ewm(close, _alpha(fast)) - ewm(close, _alpha(slow))
+            line[:slow - 1] = np.nan
+            valid = np.flatnonzero(~np.isnan(line))
+            if len(valid):
+                start = valid[0]
+                state.signal[(fast, slow, signal)] = [filter_state(line[start:], _alpha(signal))[1], int(start)]
+        return state
+
+    # ----------------------
+    # PERSISTENCE
+    # ----------------------
+    def to_arrays(self):
+        """{name: np.ndarray} snapshot (for np.savez)."""
+        arrays = {
+            "rows": np.array(self.rows),
+            "last_close": np.array(self.last_close),
+            "closes": np.array(self.closes, dtype=float),
+            "csum": np.array(self.csum, dtype=float),
+        }
+        for n in self.gains:
+            arrays[f"gains_{n}"] = np.array(self.gains[n], dtype=float)
+            arrays[f"losses_{n}"] = np.array(self.losses[n], dtype=float)
+        for span, values in self.ema.items():
+            arrays[f"ema_{span}"] = np.array(values, dtype=float)
+        for n, values in self.rsi.items():
+            arrays[f"rsi_{n}"] = np.array(values, dtype=float)
+        for (fast, slow, signal), (z, start) in self.signal.items():
+            arrays[f"signal_{fast}_{slow}_{signal}"] = np.array([z, start], dtype=float)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, params=None):
+        state = cls(params)
+        state.rows = int(arrays["rows"])
+        state.last_close = np.float64(arrays["last_close"])
+        state.closes = [np.float64(v) for v in arrays["closes"]]
+        state.csum = [np.float64(v) for v in arrays["csum"]]
+        for n in state.gains:
+            state.gains[n] = [np.float64(v) for v in arrays[f"gains_{n}"]]
+            state.losses[n] = [np.float64(v) for v in arrays[f"losses_{n}"]]
+        for span in state.ema:
+            state.ema[span] = [np.float64(v) for v in arrays[f"ema_{span}"]]
+        for n in state.rsi:
+            state.rsi[n] = [np.float64(v) for v in arrays[f"rsi_{n}"]]
+        for fast, slow, signal in state.signal:
+            z, start = arrays[f"signal_{fast}_{slow}_{signal}"]
+            state.signal[(fast, slow, signal)] = [np.float64(z), int(start)]
+        return state
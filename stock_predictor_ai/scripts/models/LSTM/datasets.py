@@ -0,0 +1,71 @@
+# datasets.py
+"""
+Keras batch feeder over sliding windows.
+
+WindowDataset feeds Keras one batch at a time from any number of series:
+only the rows of the current batch are ever copied. It lives apart from
+windows.py because it subclasses a Keras class, so importing it loads
+TensorFlow.
+"""
+import math
+import numpy as np
+from scripts.models.LSTM.windows import sliding_windows
+
+try:
+    from tensorflow.keras.utils import PyDataset as _BatchSource  # type: ignore
+except ImportError:  # older Keras
+    from tensorflow.keras.utils import Sequence as _BatchSource  # type: ignore
+
+
+class WindowDataset(_BatchSource):
+    """
+    Batches of (X, y) windows drawn from one or more scaled series.
+
+    sources: list of 1-D arrays (one per ticker). `start` restricts each
+    series to windows whose target index is >= start (used to fine-tune on
+    recent bars only). Windows are addressed by (source, offset) integer
+    pairs, so the index is O(samples) ints rather than O(samples * seq_length)
+    floats.
+    """
+
+    def __init__(self, sources, seq_length, batch_size=32, shuffle=True, starts=None, seed=42, **kwargs):
+        super().__init__(**kwargs)
+        self.views = [sliding_windows(s, seq_length) for s in sources]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        source_ids, offsets = [], []
+        for i, (X, _) in enumerate(self.views):
+            first = 0 if starts is None else max(0, starts[i] - seq_length)
+            n = len(X) - first
+            if n > 0:
+                source_ids.append(np.full(n, i, dtype=np.int32))
+                offsets.append(np.arange(first, len(X), dtype=np.int64))
+        self.source_ids = np.concatenate(source_ids) if source_ids else np.empty(0, dtype=np.int32)
+        self.offsets = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+        self.order = np.arange(len(self.offsets))
+        if shuffle:
+            self.rng.shuffle(self.order)
+
+    def __len__(self):
+        return math.ceil(len(self.order) / self.batch_size)
+
+    @property
+    def num_samples(self):
+        return len(self.order)
+
+    def __getitem__(self, idx):
+        batch = self.order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        sources, offsets = self.source_ids[batch], self.offsets[batch]
+        X = np.empty((len(batch),) + self.views[0][0].shape[1:], dtype=np.float32)
+        y = np.empty((len(batch), 1), dtype=np.float32)
+        for i in np.unique(sources):
+            mask = sources == i
+            src_X, src_y = self.views[i]
+            X[mask] = src_X[offsets[mask]]
+            y[mask] = src_y[offsets[mask]]
+        return X, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
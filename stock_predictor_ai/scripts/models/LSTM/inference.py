@@ -0,0 +1,225 @@
+# inference.py
+"""
+NumPy inference for the build_lstm() networks (stacked LSTM layers + Dense).
+
+LSTMEngine holds the weights pulled out of a trained Keras model and runs the
+forward pass with plain matrix products: no framework call overhead, and no
+TensorFlow import needed to serve a stored model (the weights are saved as
+engine.npz next to model.keras in the model store).
+
+- predict(X): the network's output for every window in X, like model.predict.
+- forecast(windows, steps): recursive multi-step forecasts for a batch of
+  windows at once. The recurrent state after the window is kept and each
+  prediction is fed back as the next input, instead of re-running a shifted
+  window per step.
+- stack(engines): per-ticker networks of the same shape stacked into one
+  engine, so many tickers' forecasts run as one batched call.
+
+    engine = LSTMEngine.from_keras(model)
+    engine.forecast(scaled[-60:].reshape(1, 60, 1), steps=7)      # (1, 7)
+
+forecast_universe() serves the 7-day forecast of every stored ticker from
+the stored models in one batched pass.
+"""
+import os
+import numpy as np
+from scripts.utils import storage
+from scripts.models import model_store
+
+ENGINE_FILE = "engine.npz"
+
+
+def _sigmoid(x):
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-x))
+
+
+def _dot(x, w):
+    """x (B, n) times w: shared (n, m) or one matrix per row (B, n, m)."""
+    if w.ndim == 2:
+        return x @ w
+    return np.matmul(x[:, None, :], w)[:, 0, :]
+
+
+class LSTMEngine:
+    """
+    Forward pass of stacked LSTM layers followed by a Dense output layer.
+    `layers` is a list of (kernel, recurrent_kernel, bias) in Keras' gate order
+    (input, forget, cell, output). Weights may carry a leading axis of one
+    network per batch row (see stack()).
+    """
+
+    def __init__(self, layers, dense_kernel, dense_bias):
+        self.layers = [tuple(np.asarray(w, dtype=np.float32) for w in layer) for layer in layers]
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float32)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float32)
+
+    @property
+    def stacked(self):
+        return self.dense_kernel.ndim == 3
+
+    @property
+    def units(self):
+        return [layer[1].shape[-2] for layer in self.layers]
+
+    # ----------------------
+    # CONSTRUCTION
+    # ----------------------
+    @classmethod
+    def from_keras(cls, model):
+        """Engine with the weights of a trained build_lstm() model."""
+        layers, dense = [], None
+        for layer in model.layers:
+            weights = layer.get_weights()
+            if len(weights) == 3:
+                layers.append(weights)
+            elif len(weights) == 2:
+                dense = weights
+        if not layers or dense is None:
+            raise ValueError("Expected LSTM layers followed by a Dense layer.")
+        return cls(layers, *dense)
+
+    @classmethod
+    def stack(cls, engines):
+        """One engine running `engines[i]` on batch row i."""
+        engines = list(engines)
+        layers = [tuple(np.stack([e.layers[k][j] for e in engines]) for j in range(3))
+                  for k in range(len(engines[0].layers))]
+        return cls(layers, np.stack([e.dense_kernel for e in engines]), np.stack([e.dense_bias for e in engines]))
+
+    def save(self, path):
+        arrays = {"dense_kernel": self.dense_kernel, "dense_bias": self.dense_bias}
+        for k, (kernel, recurrent, bias) in enumerate(self.layers):
+            arrays.update({f"kernel_{k}": kernel, f"recurrent_{k}": recurrent, f"bias_{k}": bias})
+        with storage.atomic_write(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            n_layers = sum(1 for name in stored.files if name.startswith("kernel_"))
+            layers = [(stored[f"kernel_{k}"], stored[f"recurrent_{k}"], stored[f"bias_{k}"])
+                      for k in range(n_layers)]
+            return cls(layers, stored["dense_kernel"], stored["dense_bias"])
+
+    # ----------------------
+    # FORWARD PASS
+    # ----------------------
+    def initial_state(self, batch):
+        return [(np.zeros((batch, u), np.float32), np.zeros((batch, u), np.float32)) for u in self.units]
+
+    def step(self, x, state):
+        """One time step for inputs x (B, features): (output (B, 1), new state)."""
+        new_state = []
+        h_in = x
+        for (kernel, recurrent, bias), (h, c) in zip(self.layers, state):
+            z = _dot(h_in, kernel) + _dot(h, recurrent) + bias
+            u = h.shape[1]
+            i, f = _sigmoid(z[:, :u]), _sigmoid(z[:, u:2 * u])
+            g, o = np.tanh(z[:, 2 * u:3 * u]), _sigmoid(z[:, 3 * u:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            new_state.append((h, c))
+            h_in = h
+        return _dot(h_in, self.dense_kernel) + self.dense_bias, new_state
+
+    def run(self, X, state=None):
+        """Feed windows X (B, T, features); returns (output after the last step, state)."""
+        X = np.asarray(X, dtype=np.float32)
+        state = self.initial_state(len(X)) if state is None else state
+        out = None
+        for t in range(X.shape[1]):
+            out, state = self.step(X[:, t, :], state)
+        return out, state
+
+    def predict(self, X, batch_size=4096):
+        """(B, 1) outputs for the windows X (B, T, features), like model.predict(X)."""
+        if self.stacked:
+            return self.run(X)[0]
+        X = np.asarray(X)
+        outputs = [self.run(X[i:i + batch_size])[0] for i in range(0, len(X), batch_size)]
+        return np.concatenate(outputs) if outputs else np.empty((0, 1), np.float32)
+
+    def forecast(self, windows, steps=7):
+        """
+        Recursive forecasts (B, steps) for the windows (B, T, 1): the state
+        after each window is carried on and fed its own predictions.
+        """
+        if len(windows) == 0:
+            return np.empty((0, steps), np.float32)
+        out, state = self.run(windows)
+        preds = [out]
+        for _ in range(steps - 1):
+            out, state = self.step(out, state)
+            preds.append(out)
+        return np.concatenate(preds, axis=1)
+
+
+# ----------------------
+# STORED MODELS
+# ----------------------
+def engine_for(entry, model=None):
+    """
+    Engine of a model store entry: engine.npz if it was saved, else extracted
+    from `model` (or the stored model.keras) and saved for next time.
+    """
+    path = os.path.join(entry["path"], ENGINE_FILE)
+    if os.path.exists(path):
+        try:
+            return LSTMEngine.load(path)
+        except Exception:
+            pass  # unreadable: extract again below
+    if model is None:
+        from tensorflow.keras.models import load_model  # type: ignore
+        model = load_model(os.path.join(entry["path"], "model.keras"))
+    engine = LSTMEngine.from_keras(model)
+    engine.save(path)
+    return engine
+
+
+def forecast_universe(tickers=None, seq_length=60, units=50, epochs=5, batch_size=32, steps=7, mode="per_ticker"):
+    """
+    {ticker: [steps forecast prices]} for `tickers` (default: every stored
+    ticker), from one batched forward pass. mode="per_ticker" stacks each
+    ticker's stored network (tickers without one for the current data are
+    trained first through predict_lstm); mode="pooled" runs every window
+    through the pooled network.
+    """
+    tickers = storage.list_stocks() if tickers is None else list(tickers)
+    params = {"seq_length": seq_length, "units": units, "epochs": epochs, "batch_size": batch_size}
+    windows, scales, engines = [], [], []
+    pooled = None
+    if mode == "pooled":
+        from scripts.models.LSTM.pooled import train_pooled_lstm
+        # Fine-tuned first if the universe's data changed since it was saved
+        pooled = train_pooled_lstm(seq_length=seq_length, units=units, epochs=epochs, batch_size=batch_size)
+
+    served = []
+    for t in tickers:
+        arrays = storage.load_arrays(t)
+        if arrays is None or len(arrays["Close"]) <= seq_length:
+            continue
+        prices = np.asarray(arrays["Close"], dtype=float)
+        if pooled is not None:
+            low, high = pooled["scales"].get(t) or (prices.min(), prices.max())
+        else:
+            entry = model_store.lookup(t, "lstm", params)
+            if entry is None or entry["data_version"] != storage.data_version(t):
+                from scripts.models.LSTM.lstm import predict_lstm
+                predict_lstm(t, seq_length=seq_length, units=units, epochs=epochs, batch_size=batch_size)
+                entry = model_store.lookup(t, "lstm", params)
+            low, high = entry["scale_min"], entry["scale_max"]
+            engines.append(engine_for(entry))
+        span = (high - low) or 1.0
+        windows.append((prices[-seq_length:] - low) / span)
+        scales.append((low, span))
+        served.append(t)
+
+    if not served:
+        return {}
+    engine = engine_for(pooled) if pooled is not None else LSTMEngine.stack(engines)
+    scaled = engine.forecast(np.stack(windows)[:, :, None], steps)
+    low, span = np.array(scales).T
+    prices = scaled * span[:, None] + low[:, None]
+    return {t: prices[i].astype(float).tolist() for i, t in enumerate(served)}
@@ -1,26 +1,49 @@
 import os
-import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential  # type: ignore
-from tensorflow.keras.layers import LSTM, Dense
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import math
+from scripts.utils import storage, timing
+from scripts.models import model_store
+from scripts.models.LSTM.windows import sliding_windows
+from scripts.models.LSTM.inference import LSTMEngine, ENGINE_FILE, engine_for
+
+# Epochs used to fine-tune a stored model on newly appended bars
+FINE_TUNE_EPOCHS = 2
+# Extra (already seen) windows replayed with the new ones when fine-tuning
+FINE_TUNE_REPLAY = 120
+
+
+def build_lstm(seq_length, units):
+    # TensorFlow is imported only when a network is built or trained: serving
+    # an unchanged stored model runs on the NumPy engine alone
+    from tensorflow.keras.models import Sequential  # type: ignore
+    from tensorflow.keras.layers import LSTM, Dense
+    model = Sequential()
+    model.add(LSTM(units, return_sequences=True, input_shape=(seq_length, 1)))
+    model.add(LSTM(units))
+    model.add(Dense(1))
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
 
-def predict_lstm(stock_symbol):
+@timing.timed("LSTM")
+def predict_lstm(stock_symbol, seq_length=60, units=50, epochs=5, batch_size=32, use_store=True, mode="per_ticker"):
     """
     Trains a simple LSTM model and returns predictions + metrics for the given stock.
+    With `use_store`, a stored model is reused when the data hasn't changed and
+    fine-tuned on the new windows when only bars were appended. Forecasts and
+    metrics run on the NumPy engine (inference.py); an unchanged stored model
+    is served from its saved weights without loading Keras.
+    mode="pooled" serves the forecast from the one network trained on every
+    stored ticker (see pooled.py) instead of a per-ticker network.
     """
 
-    # === File path ===
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..','..'))
-    file_path = os.path.join(base_dir, 'data', 'cleaned', f'{stock_symbol}.csv')
-
-    if not os.path.exists(file_path):
-        return {"error": f"File '{file_path}' not found!"}
-
     # === Read stock data ===
-    data = pd.read_csv(file_path)
+    with timing.stage(timing.LOAD):
+        data = storage.load_stock(stock_symbol)
+    if data is None:
+        return {"error": f"No stored data found for '{stock_symbol}'!"}
 
     # Find Close column dynamically
     close_col = None
@@ -32,49 +55,98 @@ def predict_lstm(stock_symbol):
     if close_col is None:
         return {"error": f"Closing price column for {stock_symbol} not found!"}
 
-    # === Prepare Data ===
     prices = data[close_col].values.reshape(-1, 1)
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_prices = scaler.fit_transform(prices)
-
-    seq_length = 60
-    X, y = [], []
-    for i in range(seq_length, len(scaled_prices)):
-        X.append(scaled_prices[i-seq_length:i])
-        y.append(scaled_prices[i])
-    X, y = np.array(X), np.array(y)
-    X = X.reshape((X.shape[0], X.shape[1], 1))
-
-    # === Build LSTM model ===
-    model = Sequential()
-    model.add(LSTM(50, return_sequences=True, input_shape=(X.shape[1], 1)))
-    model.add(LSTM(50))
-    model.add(Dense(1))
-    model.compile(optimizer='adam', loss='mean_squared_error')
 
-    # === Train model ===
-    model.fit(X, y, epochs=5, batch_size=32, verbose=0)  # keep short for testing
+    if mode == "pooled":
+        from scripts.models.LSTM.pooled import get_pooled_model
+        with timing.stage(timing.FIT):
+            model, scaler = get_pooled_model(stock_symbol, prices, seq_length=seq_length, units=units,
+                                             epochs=epochs, batch_size=batch_size)
+        with timing.stage(timing.FEATURES):
+            scaled_prices = scaler.transform(prices)
+            X, y = sliding_windows(scaled_prices, seq_length)
+        return _forecast_and_score(LSTMEngine.from_keras(model), scaler, scaled_prices, X, y, seq_length)
+
+    params = {"seq_length": seq_length, "units": units, "epochs": epochs, "batch_size": batch_size}
+    data_version = storage.data_version(stock_symbol)
+    stored = model_store.lookup(stock_symbol, "lstm", params) if use_store else None
+
+    # A stored model can be reused if the history it saw is still a prefix of the data
+    reusable = (
+        stored is not None
+        and stored["rows"] <= len(prices)
+        and np.isclose(prices[stored["rows"] - 1, 0], stored["last_close"])
+    )
 
+    # === Prepare Data ===
+    with timing.stage(timing.FEATURES):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        if reusable:
+            # Keep the scaling the stored network was trained with
+            scaler.fit(np.array([[stored["scale_min"]], [stored["scale_max"]]]))
+        else:
+            scaler.fit(prices)
+        scaled_prices = scaler.transform(prices)
+
+        # Strided views: no per-window copies
+        X, y = sliding_windows(scaled_prices, seq_length)
+
+    # === Build / load and train model ===
+    unchanged = reusable and stored["data_version"] == data_version
+    with timing.stage(timing.FIT):
+        if unchanged:
+            # Nothing new to learn: serve the stored weights
+            model_store.touch(stored)
+            engine = engine_for(stored)
+        elif reusable:
+            from tensorflow.keras.models import load_model  # type: ignore
+            from scripts.models.LSTM.datasets import WindowDataset
+            model = load_model(os.path.join(stored["path"], "model.keras"))
+            new_windows = len(prices) - stored["rows"]
+            if new_windows > 0:
+                # Warm start: fine-tune on the new windows plus a replay of recent ones
+                start = max(seq_length, len(prices) - new_windows - FINE_TUNE_REPLAY)
+                batches = WindowDataset([scaled_prices], seq_length, batch_size, starts=[start])
+                model.fit(batches, epochs=FINE_TUNE_EPOCHS, verbose=0)
+        else:
+            from scripts.models.LSTM.datasets import WindowDataset
+            model = build_lstm(seq_length, units)
+            batches = WindowDataset([scaled_prices], seq_length, batch_size)
+            model.fit(batches, epochs=epochs, verbose=0)  # keep short for testing
+
+        if not unchanged:
+            engine = LSTMEngine.from_keras(model)
+
+        if use_store and not unchanged:
+            def write(folder):
+                model.save(os.path.join(folder, "model.keras"))
+                engine.save(os.path.join(folder, ENGINE_FILE))
+
+            model_store.save(
+                stock_symbol, "lstm", params, data_version, write,
+                rows=len(prices), last_close=float(prices[-1, 0]),
+                scale_min=float(scaler.data_min_[0]), scale_max=float(scaler.data_max_[0]),
+            )
+
+    return _forecast_and_score(engine, scaler, scaled_prices, X, y, seq_length)
+
+
+def _forecast_and_score(engine, scaler, scaled_prices, X, y, seq_length):
     # === Predict next 7 days ===
-    last_seq = scaled_prices[-seq_length:].reshape(1, seq_length, 1)
-    next_week_preds = []
-    current_seq = last_seq.copy()
-
-    for _ in range(7):
-        pred = model.predict(current_seq, verbose=0)
-        next_week_preds.append(pred[0, 0])
-        current_seq = np.append(current_seq[:, 1:, :], pred.reshape(1, 1, 1), axis=1)
-
-    next_week_preds = np.array(next_week_preds).reshape(-1, 1)
-    next_week_preds = scaler.inverse_transform(next_week_preds)
+    with timing.stage(timing.FORECAST):
+        # Recursive: the recurrent state is carried on through the predictions
+        last_seq = scaled_prices[-seq_length:].reshape(1, seq_length, 1)
+        next_week_preds = engine.forecast(last_seq, steps=7).reshape(-1, 1)
+        next_week_preds = scaler.inverse_transform(next_week_preds)
 
     # === Compute metrics on training ===
-    preds_train = model.predict(X, verbose=0)
-    preds_train = scaler.inverse_transform(preds_train)
-    y_true = scaler.inverse_transform(y)
+    with timing.stage(timing.METRICS):
+        preds_train = engine.predict(X)
+        preds_train = scaler.inverse_transform(preds_train)
+        y_true = scaler.inverse_transform(y)
 
-    mae = mean_absolute_error(y_true, preds_train)
-    rmse = math.sqrt(mean_squared_error(y_true, preds_train))
+        mae = mean_absolute_error(y_true, preds_train)
+        rmse = math.sqrt(mean_squared_error(y_true, preds_train))
 
     # === Return structured data ===
     return {
@@ -0,0 +1,129 @@
+# pooled.py
+"""
+Pooled LSTM: one network trained on windows from every stored ticker.
+
+Each ticker is min-max scaled on its own range, so the network learns the
+shape of price paths rather than price levels, and any ticker (including one
+it never saw) can be forecast by scaling it the same way. Training streams
+shuffled batches drawn across all tickers through WindowDataset, so the cost
+is paid once for the whole universe instead of once per ticker.
+
+Serving checks the universe's data version first: when any ticker's data
+changed (or tickers were added), the stored network is fine-tuned on the
+recent windows and new tickers before it is used.
+"""
+import os
+import hashlib
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from tensorflow.keras.models import load_model  # type: ignore
+from scripts.utils import storage
+from scripts.models import model_store
+from scripts.models.LSTM.lstm import build_lstm, FINE_TUNE_EPOCHS, FINE_TUNE_REPLAY
+from scripts.models.LSTM.datasets import WindowDataset
+
+POOLED_TICKER = "__pooled__"
+
+# Loaded pooled models, kept in memory between predictions
+_loaded = {}
+
+
+def _universe_version(tickers):
+    stored = storage.data_versions(tickers)
+    versions = "|".join(f"{t}={stored.get(t) or storage.data_version(t)}" for t in sorted(tickers))
+    return hashlib.sha1(versions.encode()).hexdigest()[:16]
+
+
+def _scale(prices, scale=None):
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    if scale is None:
+        scaler.fit(prices)
+    else:
+        scaler.fit(np.array([[scale[0]], [scale[1]]]))
+    return scaler
+
+
+def _load_closes(tickers):
+    closes = {}
+    for t in tickers:
+        arrays = storage.load_arrays(t)
+        if arrays is not None and "Close" in arrays:
+            closes[t] = np.asarray(arrays["Close"], dtype=float).reshape(-1, 1)
+    return closes
+
+
+def train_pooled_lstm(tickers=None, seq_length=60, units=50, epochs=5, batch_size=32, logger=None):
+    """
+    Train (or fine-tune) the pooled network on `tickers` (default: every stored
+    ticker) and save it in the model store. Returns the store entry.
+    """
+    if logger is None:
+        logger = print
+    tickers = storage.list_stocks() if tickers is None else list(tickers)
+    params = {"seq_length": seq_length, "units": units, "epochs": epochs, "batch_size": batch_size}
+    version = _universe_version(tickers)
+    stored = model_store.lookup(POOLED_TICKER, "lstm_pooled", params)
+    if stored is not None and stored["data_version"] == version:
+        return stored
+
+    closes = _load_closes(tickers)
+    scales = dict(stored["scales"]) if stored is not None else {}
+    rows = dict(stored["rows_by_ticker"]) if stored is not None else {}
+
+    sources, starts = [], []
+    for t, prices in closes.items():
+        scaler = _scale(prices, scales.get(t))
+        scales[t] = [float(scaler.data_min_[0]), float(scaler.data_max_[0])]
+        sources.append(scaler.transform(prices).reshape(-1))
+        # Fine-tuning only revisits recent windows; new tickers contribute everything
+        starts.append(max(seq_length, rows[t] - FINE_TUNE_REPLAY) if stored is not None and t in rows else 0)
+        rows[t] = len(prices)
+
+    if stored is not None:
+        model = load_model(os.path.join(stored["path"], "model.keras"))
+        batches = WindowDataset(sources, seq_length, batch_size, starts=starts)
+        logger(f"Fine-tuning pooled LSTM on {batches.num_samples} windows from {len(sources)} tickers...")
+        model.fit(batches, epochs=FINE_TUNE_EPOCHS, verbose=0)
+    else:
+        model = build_lstm(seq_length, units)
+        batches = WindowDataset(sources, seq_length, batch_size)
+        logger(f"Training pooled LSTM on {batches.num_samples} windows from {len(sources)} tickers...")
+        model.fit(batches, epochs=epochs, verbose=0)
+
+    entry = model_store.save(
+        POOLED_TICKER, "lstm_pooled", params, version,
+        lambda folder: model.save(os.path.join(folder, "model.keras")),
+        scales=scales, rows_by_ticker=rows,
+    )
+    _loaded[(entry["path"], version)] = model
+    return entry
+
+
+def get_pooled_model(stock_symbol, prices, seq_length=60, units=50, epochs=5, batch_size=32):
+    """
+    (model, scaler) for serving `stock_symbol` from the pooled network. Trains
+    it first if there is none yet for these hyperparameters, and fine-tunes it
+    when the universe's data changed since it was saved.
+    """
+    params = {"seq_length": seq_length, "units": units, "epochs": epochs, "batch_size": batch_size}
+    stored = model_store.lookup(POOLED_TICKER, "lstm_pooled", params)
+    if stored is None or stored["data_version"] != _universe_version(storage.list_stocks()):
+        stored = train_pooled_lstm(seq_length=seq_length, units=units, epochs=epochs, batch_size=batch_size)
+    else:
+        model_store.touch(stored)
+
+    key = (stored["path"], stored["data_version"])
+    if key not in _loaded:
+        _loaded.clear()
+        _loaded[key] = load_model(os.path.join(stored["path"], "model.keras"))
+    return _loaded[key], _scale(prices, stored["scales"].get(stock_symbol))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the pooled LSTM on every stored ticker.")
+    parser.add_argument("--tickers", nargs="*", help="tickers to train on (default: all stored)")
+    parser.add_argument("--epochs", type=int, default=5)
+    args = parser.parse_args()
+    entry = train_pooled_lstm(args.tickers, epochs=args.epochs)
+    print(f"Pooled LSTM saved to {entry['path']}")
@@ -0,0 +1,24 @@
+# windows.py
+"""
+Sliding windows without copies.
+
+sliding_windows() returns the (samples, seq_length, 1) training windows as a
+strided view of the price array, so building them costs no memory. It needs
+NumPy only, so serving a stored model never imports TensorFlow; the Keras
+batch feeder over these views is in datasets.py.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(series, seq_length):
+    """
+    X[i] = series[i:i+seq_length], y[i] = series[i+seq_length], as read-only views.
+    X has shape (len(series) - seq_length, seq_length, 1).
+    """
+    series = np.asarray(series, dtype=np.float32).reshape(-1)
+    if len(series) <= seq_length:
+        return np.empty((0, seq_length, 1), dtype=np.float32), np.empty((0, 1), dtype=np.float32)
+    X = sliding_window_view(series[:-1], seq_length)[:, :, None]
+    y = series[seq_length:, None]
+    return X, y
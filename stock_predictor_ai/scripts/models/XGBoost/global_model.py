@@ -0,0 +1,251 @@
+# global_model.py
+"""
+Global XGBoost: one booster trained on rows from every stored ticker.
+
+Features are the predict_xgb indicators made scale-free (relative to the
+close), plus 1- and 5-day returns and categorical ticker / GICS sector codes.
+The booster is multi-output: one target per horizon, the return from close[t]
+to close[t + h] for h = 1..7, so a single predict() over the latest row of
+every ticker yields real 7-day forecasts for the whole universe.
+
+Training uses the histogram method on a QuantileDMatrix built once per
+universe version with all cores; the matrices are kept in memory so the
+holdout scoring and the forecast reuse them. When the universe changes the
+stored booster gets WARM_START_TREES more trees instead of a full retrain.
+
+    python -m scripts.models.XGBoost.global_model          # train + forecast all
+"""
+import os
+import hashlib
+import numpy as np
+import xgboost as xgb
+from scripts.utils import storage
+from scripts.utils.universe import get_sectors
+from scripts.features.cache import get_features
+from scripts.features.matrices import FEATURE_SETS, feature_matrix, horizon_targets
+from scripts.models import model_store
+
+GLOBAL_TICKER = "__global__"
+HORIZONS = tuple(range(1, 8))
+WARM_START_TREES = 20
+
+# Columns of the XGBoost feature set that are price levels / price-scaled
+PRICE_LEVELS = ("SMA", "EMA", "BB_upper", "BB_lower")
+PRICE_SCALED = ("Volatility", "MACD")
+FEATURE_NAMES = list(FEATURE_SETS["XGBoost"]) + ["Return_1", "Return_5", "Ticker", "Sector"]
+FEATURE_TYPES = ["q"] * (len(FEATURE_NAMES) - 2) + ["c", "c"]
+
+# Built matrices for the current universe version
+_data = {}
+# Loaded boosters and their forecasts, keyed by (store path, version)
+_loaded = {}
+_forecasts = {}
+
+
+def _universe_version(versions):
+    key = "|".join(f"{t}={v}" for t, v in sorted(versions.items()))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _relative_features(feats):
+    """(rows, features) scale-free matrix for one ticker (NaN during warm-up)."""
+    X, _ = feature_matrix(feats, "XGBoost")
+    close = np.asarray(feats["Close"], dtype=float)
+    names = list(FEATURE_SETS["XGBoost"])
+    X = X.copy()
+    for j, name in enumerate(names):
+        if name in PRICE_LEVELS:
+            X[:, j] = X[:, j] / close - 1
+        elif name in PRICE_SCALED:
+            X[:, j] = X[:, j] / close
+        elif name == "RSI":
+            X[:, j] = X[:, j] / 100
+    returns = np.full((len(close), 2), np.nan)
+    returns[1:, 0] = close[1:] / close[:-1] - 1
+    returns[5:, 1] = close[5:] / close[:-5] - 1
+    return np.column_stack([X, returns]), close
+
+
+def build_data(tickers=None, n_days=7, known=None, known_sectors=None):
+    """
+    Stacked training / holdout / latest rows for `tickers` (default: all stored).
+    The last `n_days` origins with known targets of each ticker are held out
+    for the metrics. Ticker and sector codes follow `known` / `known_sectors`
+    (the orders a stored booster was trained with) so they stay stable; new
+    tickers and sectors get new codes. Cached per universe version.
+    """
+    versions = storage.data_versions(tickers)
+    version = _universe_version(versions)
+    codes = list(known or [])
+    codes += [t for t in sorted(versions) if t not in set(codes)]
+    sectors = get_sectors()
+    sector_names = list(known_sectors or [])
+    sector_names += sorted({str(sectors.get(t)) for t in versions} - set(sector_names))
+    key = (version, n_days, tuple(codes), tuple(sector_names))
+    if key in _data:
+        return _data[key]
+    _data.clear()
+
+    sector_codes = {s: i for i, s in enumerate(sector_names)}
+    train_X, train_Y, hold_X, hold_Y, hold_close, hold_ticker, latest_X, latest_close = [], [], [], [], [], [], [], []
+    tickers_out = []
+    code_of = {t: i for i, t in enumerate(codes)}
+    for t in sorted(versions):
+        code = code_of[t]
+        feats = get_features(t)
+        if feats is None:
+            continue
+        X, close = _relative_features(feats)
+        X = np.column_stack([X, np.full(len(X), code), np.full(len(X), sector_codes[str(sectors.get(t))])])
+        Y = horizon_targets(close, HORIZONS) / close[:, None] - 1
+        valid = ~np.isnan(X).any(axis=1)
+        if not valid.any():
+            continue
+        labelled = np.flatnonzero(valid & ~np.isnan(Y).any(axis=1))
+        hold, train = labelled[len(labelled) - n_days:], labelled[:len(labelled) - n_days]
+        train_X.append(X[train])
+        train_Y.append(Y[train])
+        hold_X.append(X[hold])
+        hold_Y.append(Y[hold])
+        hold_close.append(close[hold])
+        hold_ticker.append(np.full(len(hold), len(tickers_out)))
+        latest = np.flatnonzero(valid)[-1]
+        latest_X.append(X[latest])
+        latest_close.append(close[latest])
+        tickers_out.append(t)
+
+    if not tickers_out or not sum(len(x) for x in train_X):
+        raise ValueError("Not enough stored data to train the global XGBoost model.")
+
+    threads = os.cpu_count() or 1
+    data = {
+        "version": version,
+        "tickers": tickers_out,
+        "codes": codes,
+        "sectors": sector_names,
+        "dtrain": xgb.QuantileDMatrix(np.vstack(train_X), np.vstack(train_Y), feature_names=FEATURE_NAMES,
+                                      feature_types=FEATURE_TYPES, enable_categorical=True, nthread=threads),
+        "dhold": xgb.DMatrix(np.vstack(hold_X), feature_names=FEATURE_NAMES, feature_types=FEATURE_TYPES,
+                             enable_categorical=True, nthread=threads),
+        "dlatest": xgb.DMatrix(np.vstack(latest_X), feature_names=FEATURE_NAMES, feature_types=FEATURE_TYPES,
+                               enable_categorical=True, nthread=threads),
+        "hold_Y": np.vstack(hold_Y),
+        "hold_close": np.concatenate(hold_close),
+        "hold_ticker": np.concatenate(hold_ticker),
+        "latest_close": np.array(latest_close),
+    }
+    _data[key] = data
+    return data
+
+
+def _booster_params(learning_rate, max_depth):
+    return {
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "multi_strategy": "one_output_per_tree",
+        "learning_rate": learning_rate,
+        "max_depth": max_depth,
+        "nthread": os.cpu_count() or 1,
+        "seed": 42,
+    }
+
+
+def train_global_xgb(tickers=None, n_days=7, n_estimators=200, learning_rate=0.05, max_depth=5, logger=None):
+    """
+    Train (or warm start) the global booster on `tickers` (default: all stored)
+    and save it in the model store. Returns (booster, store entry, data).
+    """
+    if logger is None:
+        logger = print
+    params = {"n_days": n_days, "n_estimators": n_estimators, "learning_rate": learning_rate, "max_depth": max_depth}
+    stored = model_store.lookup(GLOBAL_TICKER, "xgboost_global", params)
+    data = build_data(tickers, n_days, known=stored["codes"] if stored is not None else None,
+                      known_sectors=stored.get("sectors") if stored is not None else None)
+
+    if stored is not None and stored["data_version"] == data["version"]:
+        model_store.touch(stored)
+        return _load(stored), stored, data
+
+    booster_params = _booster_params(learning_rate, max_depth)
+    if stored is not None and stored["n_trees"] + WARM_START_TREES <= 2 * n_estimators:
+        logger(f"Adding {WARM_START_TREES} trees to the global XGBoost model ({len(data['tickers'])} tickers)...")
+        booster = xgb.train(booster_params, data["dtrain"], num_boost_round=WARM_START_TREES, xgb_model=_load(stored))
+        n_trees = stored["n_trees"] + WARM_START_TREES
+    else:
+        logger(f"Training the global XGBoost model on {data['dtrain'].num_row()} rows "
+               f"from {len(data['tickers'])} tickers...")
+        booster = xgb.train(booster_params, data["dtrain"], num_boost_round=n_estimators)
+        n_trees = n_estimators
+
+    entry = model_store.save(
+        GLOBAL_TICKER, "xgboost_global", params, data["version"],
+        lambda folder: booster.save_model(os.path.join(folder, "model.json")),
+        n_trees=n_trees, codes=data["codes"], sectors=data["sectors"],
+    )
+    _loaded.clear()
+    _loaded[(entry["path"], data["version"])] = booster
+    return booster, entry, data
+
+
+def _load(stored):
+    key = (stored["path"], stored["data_version"])
+    if key not in _loaded:
+        _loaded.clear()
+        _loaded[key] = xgb.Booster(model_file=os.path.join(stored["path"], "model.json"))
+    return _loaded[key]
+
+
+def forecast_universe(tickers=None, n_days=7, n_estimators=200, learning_rate=0.05, max_depth=5):
+    """
+    {ticker: {"prediction", "next_7_days", "mae", "rmse"}} for every ticker,
+    from one batched predict over their latest rows. mae / rmse are the price
+    errors of the 1..7 day forecasts made at each ticker's held-out origins.
+    """
+    booster, entry, data = train_global_xgb(tickers, n_days, n_estimators, learning_rate, max_depth,
+                                            logger=lambda message: None)
+    key = (entry["path"], data["version"])
+    if key in _forecasts:
+        return _forecasts[key]
+
+    forecast = data["latest_close"][:, None] * (1 + booster.predict(data["dlatest"]))
+    hold_pred = data["hold_close"][:, None] * (1 + booster.predict(data["dhold"]))
+    hold_true = data["hold_close"][:, None] * (1 + data["hold_Y"])
+    abs_err = np.abs(hold_pred - hold_true).mean(axis=1)
+    sq_err = ((hold_pred - hold_true) ** 2).mean(axis=1)
+    counts = np.bincount(data["hold_ticker"], minlength=len(data["tickers"]))
+    mae = np.bincount(data["hold_ticker"], abs_err, len(data["tickers"])) / np.maximum(counts, 1)
+    rmse = np.sqrt(np.bincount(data["hold_ticker"], sq_err, len(data["tickers"])) / np.maximum(counts, 1))
+
+    results = {}
+    for i, t in enumerate(data["tickers"]):
+        results[t] = {
+            "prediction": float(forecast[i, -1]),
+            "next_7_days": [float(v) for v in forecast[i]],
+            "mae": float(mae[i]) if counts[i] else "—",
+            "rmse": float(rmse[i]) if counts[i] else "—",
+        }
+    _forecasts.clear()
+    _forecasts[key] = results
+    return results
+
+
+def predict_global(stock_symbol, **kwargs):
+    """predict_xgb(mode="global") result for one ticker."""
+    results = forecast_universe(**kwargs)
+    if stock_symbol not in results:
+        return {"prediction": "N/A", "mae": "—", "rmse": "—"}
+    return results[stock_symbol]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the global XGBoost model and forecast every stored ticker.")
+    parser.add_argument("--tickers", nargs="*", help="tickers to train on (default: all stored)")
+    parser.add_argument("--estimators", type=int, default=200)
+    args = parser.parse_args()
+    forecasts = forecast_universe(args.tickers, n_estimators=args.estimators)
+    for t, r in forecasts.items():
+        # "N/A" / "—" when a ticker has no forecast or no scored rows
+        pred = f"{r['prediction']:>10.2f}" if isinstance(r['prediction'], float) else f"{r['prediction']:>10}"
+        mae = f"{r['mae']:.3f}" if isinstance(r['mae'], float) else r['mae']
+        print(f"{t:<8} {pred}  MAE {mae}")
@@ -1,14 +1,28 @@
 import os
+import pickle
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+from scripts.utils import storage, timing
+from scripts.features.cache import get_features
+from scripts.models import model_store
 
-def predict_xgb(stock_symbol, n_days=7):
+# Trees added to a stored model when only new bars were appended
+WARM_START_TREES = 20
+
+
+@timing.timed("XGBoost")
+def predict_xgb(stock_symbol, n_days=7, n_estimators=200, learning_rate=0.05, max_depth=5, use_store=True,
+                mode="per_ticker"):
     """
     Predict next n_days closing prices using XGBoost.
+    With `use_store`, a stored model is reused when the data hasn't changed and
+    grown by WARM_START_TREES trees when only bars were appended.
+    mode="global" serves the forecast from the one booster trained on every
+    stored ticker (see global_model.py), which also returns "next_7_days".
 
     Returns a dictionary:
     {
@@ -17,16 +31,17 @@ def predict_xgb(stock_symbol, n_days=7):
         "rmse": float
     }
     """
-    # ==== Paths ====
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-    file_path = os.path.join(base_dir, 'data', 'cleaned', f'{stock_symbol}.csv')
-
-    if not os.path.exists(file_path):
-        print(f"❌ Error: File '{file_path}' not found!")
-        return {"prediction": "N/A", "mae": "—", "rmse": "—"}
+    if mode == "global":
+        from scripts.models.XGBoost.global_model import predict_global
+        return predict_global(stock_symbol, n_days=n_days, n_estimators=n_estimators,
+                              learning_rate=learning_rate, max_depth=max_depth)
 
     # ==== Load Data ====
-    data = pd.read_csv(file_path)
+    with timing.stage(timing.LOAD):
+        data = storage.load_stock(stock_symbol)
+    if data is None:
+        print(f"❌ Error: No stored data found for '{stock_symbol}'!")
+        return {"prediction": "N/A", "mae": "—", "rmse": "—"}
     if 'Date' not in data.columns:
         print("❌ Error: 'Date' column not found!")
         return {"prediction": "N/A", "mae": "—", "rmse": "—"}
@@ -43,54 +58,85 @@ def predict_xgb(stock_symbol, n_days=7):
 
     df = data[[close_col]].copy()
 
-    # ==== Feature Engineering ====
-    df['SMA'] = df[close_col].rolling(14).mean()
-    df['EMA'] = df[close_col].ewm(span=14, adjust=False).mean()
-    df['Volatility'] = df[close_col].rolling(14).std()
+    # ==== Feature Engineering (shared, cached indicator arrays) ====
+    with timing.stage(timing.FEATURES):
+        feats = get_features(stock_symbol)
+        df['SMA'] = feats['SMA_14']
+        df['EMA'] = feats['EMA_14']
+        df['Volatility'] = feats['STD_14']
+        df['RSI'] = feats['RSI_SMA_14']
+        df['MACD'] = feats['EMA_12'] - feats['EMA_26']
 
-    delta = df[close_col].diff()
-    up = delta.clip(lower=0)
-    down = -1 * delta.clip(upper=0)
-    roll_up = up.rolling(14).mean()
-    roll_down = down.rolling(14).mean()
-    RS = roll_up / roll_down
-    df['RSI'] = 100 - (100 / (1 + RS))
+        df['BB_upper'] = df['SMA'] + 2 * df['Volatility']
+        df['BB_lower'] = df['SMA'] - 2 * df['Volatility']
 
-    ema12 = df[close_col].ewm(span=12, adjust=False).mean()
-    ema26 = df[close_col].ewm(span=26, adjust=False).mean()
-    df['MACD'] = ema12 - ema26
-
-    df['BB_upper'] = df['SMA'] + 2 * df['Volatility']
-    df['BB_lower'] = df['SMA'] - 2 * df['Volatility']
-
-    df.dropna(inplace=True)
+        df.dropna(inplace=True)
 
     if len(df) <= n_days:
         print(f"❌ Not enough data to predict {n_days} days!")
         return {"prediction": "N/A", "mae": "—", "rmse": "—"}
 
     # ==== Features & Target ====
-    X = df.drop(columns=[close_col])
-    y = df[close_col]
-
-    # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=n_days, shuffle=False)
-
-    # Scale features
-    scaler = MinMaxScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    # Train model
-    model = XGBRegressor(n_estimators=200, learning_rate=0.05, max_depth=5, random_state=42)
-    model.fit(X_train_scaled, y_train)
+    with timing.stage(timing.FEATURES):
+        X = df.drop(columns=[close_col])
+        y = df[close_col]
+
+        # Train-test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=n_days, shuffle=False)
+
+    params = {"n_days": n_days, "n_estimators": n_estimators, "learning_rate": learning_rate, "max_depth": max_depth}
+    data_version = storage.data_version(stock_symbol)
+    stored = model_store.lookup(stock_symbol, "xgboost", params) if use_store else None
+    closes = data[close_col].values
+    reusable = (
+        stored is not None
+        and stored["rows"] <= len(closes)
+        and np.isclose(closes[stored["rows"] - 1], stored["last_close"])
+        and stored["n_trees"] + WARM_START_TREES <= 2 * n_estimators
+    )
+
+    with timing.stage(timing.FIT):
+        if reusable:
+            with open(os.path.join(stored["path"], "scaler.pkl"), "rb") as f:
+                scaler = pickle.load(f)
+            model = XGBRegressor()
+            model.load_model(os.path.join(stored["path"], "model.json"))
+            n_trees = stored["n_trees"]
+        else:
+            scaler = MinMaxScaler()
+            scaler.fit(X_train)
+        X_train_scaled = scaler.transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+        # Train model (or reuse / warm start the stored one)
+        if reusable and stored["data_version"] == data_version:
+            model_store.touch(stored)
+        elif reusable:
+            booster = model.get_booster()
+            model = XGBRegressor(n_estimators=WARM_START_TREES, learning_rate=learning_rate, max_depth=max_depth, random_state=42)
+            model.fit(X_train_scaled, y_train, xgb_model=booster)
+            n_trees += WARM_START_TREES
+        else:
+            model = XGBRegressor(n_estimators=n_estimators, learning_rate=learning_rate, max_depth=max_depth, random_state=42)
+            model.fit(X_train_scaled, y_train)
+            n_trees = n_estimators
+
+        if use_store and not (reusable and stored["data_version"] == data_version):
+            def write(folder):
+                model.save_model(os.path.join(folder, "model.json"))
+                with open(os.path.join(folder, "scaler.pkl"), "wb") as f:
+                    pickle.dump(scaler, f)
+            model_store.save(stock_symbol, "xgboost", params, data_version, write,
+                             rows=len(closes), last_close=float(closes[-1]), n_trees=n_trees)
 
     # Predict
-    preds = model.predict(X_test_scaled)
+    with timing.stage(timing.FORECAST):
+        preds = model.predict(X_test_scaled)
 
     # Compute metrics
-    mae_val = mean_absolute_error(y_test, preds)
-    rmse_val = np.sqrt(mean_squared_error(y_test, preds))
+    with timing.stage(timing.METRICS):
+        mae_val = mean_absolute_error(y_test, preds)
+        rmse_val = np.sqrt(mean_squared_error(y_test, preds))
 
     # Return last predicted value and metrics
     return {
@@ -1,31 +1,135 @@
 # combine.py
 import os
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
-from scripts.models.LSTM.lstm import predict_lstm
-from scripts.models.regression.linear_regression import predict_linear_regression
-from scripts.models.regression.multiple_regression import predict_multiple_regression
-from scripts.models.XGBoost.xgboost_model import predict_xgb
-
-ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-CLEANED_FOLDER = os.path.join(ROOT_DIR, 'data', 'cleaned')
-
-def combine_predictions(stock_symbol):
-    csv_path = os.path.join(CLEANED_FOLDER, f"{stock_symbol}.csv")
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Cleaned CSV not found: {csv_path}")
-
-    predictions = {
-        "LSTM": predict_lstm(stock_symbol),
-        "Linear Regression": predict_linear_regression(csv_path),
-        "Multiple Regression": predict_multiple_regression(stock_symbol),
-        "XGBoost": predict_xgb(stock_symbol)
-    }
+from scripts.utils import storage, result_cache
+from scripts.utils.jobs import report_progress
+from scripts.models import registry
+from scripts.tuning.configs import tuned_params
+
+CLEANED_FOLDER = storage.CLEANED_FOLDER
+
+# Built-in model names; backends are imported on first use (see registry)
+MODELS = registry.names()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ----------------------
+# WORKERS
+# ----------------------
+def _init_worker(threads):
+    """Cap TensorFlow / XGBoost / BLAS threads so parallel models don't oversubscribe the CPU."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = str(threads)
+
+
+def run_model(model_name, stock_symbol):
+    """Run one model; errors come back as {"error": ...} instead of raising."""
+    try:
+        return registry.predict(model_name, stock_symbol)
+    except Exception as e:
+        return {"error": f"{model_name} failed: {e}"}
+
+
+def get_pool(max_workers=None):
+    """Shared process pool (spawned, so TensorFlow state is never forked)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = max_workers or min(len(MODELS), os.cpu_count() or 1)
+            threads = max(1, (os.cpu_count() or 1) // max_workers)
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+# ----------------------
+# RUN MODELS
+# ----------------------
+def run_models(stock_symbol, models=None, parallel=True, logger=None):
+    """
+    {model name: result} for `stock_symbol`. Models that already ran on the
+    current data version are served from the result cache; the rest run at the same
+    time in the process pool (or one after another with parallel=False).
+    `logger` receives a line and a progress update per finished model.
+    """
+    if logger is None:
+        logger = lambda message: None
+    models = list(models or registry.names())
+    data_version = storage.data_version(stock_symbol)
+    # Keyed on the tuned config too: a new one (saved by another process) is a miss
+    keys = {name: (name, json.dumps(tuned_params(name, stock_symbol), sort_keys=True)) for name in models}
+    results = {}
+    missing = []
+    for name in models:
+        cached = result_cache.get("model", stock_symbol, data_version, keys[name])
+        if cached is result_cache.MISSING:
+            missing.append(name)
+        else:
+            results[name] = cached
+
+    def finished(name):
+        logger(f"{name}: {results[name].get('error', 'done')}")
+        report_progress(logger, len(results), len(models), model=name)
+
+    if parallel and len(missing) > 1:
+        futures = {}
+        try:
+            pool = get_pool()
+            futures = {pool.submit(run_model, name, stock_symbol): name for name in missing}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                finished(futures[future])
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): start a fresh pool next time
+            shutdown_pool()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    for name in missing:
+        if name not in results:
+            results[name] = run_model(name, stock_symbol)
+            finished(name)
+
+    if data_version is not None:
+        for name in missing:
+            if "error" not in results[name]:
+                result_cache.put("model", stock_symbol, data_version, results[name], keys[name])
+
+    return {name: results[name] for name in models}
+
+
+def combine_predictions(stock_symbol, parallel=True):
+    if not storage.has_stock(stock_symbol):
+        raise FileNotFoundError(f"No stored data found for {stock_symbol}")
+
+    predictions = run_models(stock_symbol, parallel=parallel)
 
     summary = []
     combined_next_7_days = pd.DataFrame()
 
     for model_name, result in predictions.items():
-        if "error" in result:
+        if "error" in result or not isinstance(result.get("prediction"), (int, float)):
             summary.append({
                 "Model": model_name,
                 "Prediction": "Error",
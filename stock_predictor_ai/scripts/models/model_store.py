@@ -0,0 +1,167 @@
+# model_store.py
+"""
+Local registry of trained models.
+
+Each entry lives in data/models/<TICKER>/<model_type>/<params hash>/ with the
+model file(s) written by the model code plus a meta.json recording the
+hyperparameters, the data version it was trained on, the number of rows it
+has seen and when it was last used. predict_* functions use it to:
+
+- load the model as-is when the ticker's data version hasn't changed,
+- warm start (fine-tune / add trees) when only new bars were appended,
+- train from scratch otherwise.
+
+Retention is configurable with STOCK_MODEL_STORE_MAX (entries kept per model
+type, least recently used evicted first; the default is above the S&P 500
+universe so a nightly batch never evicts what it is about to reuse) and
+STOCK_MODEL_STORE_MAX_AGE_DAYS. The shared entries (the global XGBoost and
+pooled LSTM) only expire by age. Eviction runs from save() at most once per
+STOCK_MODEL_STORE_EVICT_HOURS, not on every save.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+from scripts.utils import storage
+
+MODEL_FOLDER = os.path.join(storage.DATA_DIR, 'models')
+MAX_ENTRIES = int(os.environ.get("STOCK_MODEL_STORE_MAX", 2000))
+MAX_AGE_DAYS = float(os.environ.get("STOCK_MODEL_STORE_MAX_AGE_DAYS", 30))
+EVICT_HOURS = float(os.environ.get("STOCK_MODEL_STORE_EVICT_HOURS", 1))
+# Touched after every eviction pass
+EVICT_STAMP = os.path.join(MODEL_FOLDER, '.last_evicted')
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def entry_dir(ticker, model_type, params):
+    return os.path.join(MODEL_FOLDER, ticker, model_type, params_hash(params))
+
+
+def lookup(ticker, model_type, params):
+    """meta dict (with its "path") of the stored model, or None."""
+    path = entry_dir(ticker, model_type, params)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta["path"] = path
+    return meta
+
+
+def touch(meta):
+    """Mark an entry as used now (for LRU eviction)."""
+    meta = {k: v for k, v in meta.items() if k != "path"}
+    meta["last_used"] = time.time()
+    _write_meta(entry_dir(meta["ticker"], meta["model_type"], meta["params"]), meta)
+
+
+def save(ticker, model_type, params, data_version, write_fn, **extra):
+    """
+    Store a trained model. `write_fn(folder)` writes the model files into
+    `folder`; `extra` (rows, last_close, scaler ranges, ...) goes into meta.json.
+    """
+    path = entry_dir(ticker, model_type, params)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    write_fn(tmp_path)
+    now = time.time()
+    meta = {
+        "ticker": ticker,
+        "model_type": model_type,
+        "params": params,
+        "data_version": data_version,
+        "trained_at": now,
+        "last_used": now,
+        **extra,
+    }
+    _write_meta(tmp_path, meta)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    _evict_if_due()
+    meta["path"] = path
+    return meta
+
+
+def _write_meta(path, meta):
+    tmp_file = os.path.join(path, f"meta.json.tmp-{os.getpid()}")
+    with open(tmp_file, "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp_file, os.path.join(path, "meta.json"))
+
+
+def list_entries():
+    entries = []
+    if not os.path.isdir(MODEL_FOLDER):
+        return entries
+    for ticker in os.listdir(MODEL_FOLDER):
+        ticker_dir = os.path.join(MODEL_FOLDER, ticker)
+        if not os.path.isdir(ticker_dir):
+            continue
+        for model_type in os.listdir(ticker_dir):
+            type_dir = os.path.join(ticker_dir, model_type)
+            for h in os.listdir(type_dir):
+                meta_path = os.path.join(type_dir, h, "meta.json")
+                if os.path.exists(meta_path):
+                    try:
+                        with open(meta_path) as f:
+                            meta = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    meta["path"] = os.path.join(type_dir, h)
+                    entries.append(meta)
+    return entries
+
+
+def remove(ticker, model_type=None):
+    """Drop stored models for `ticker` (optionally only one model type)."""
+    path = os.path.join(MODEL_FOLDER, ticker, model_type) if model_type else os.path.join(MODEL_FOLDER, ticker)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _shared(meta):
+    """Universe-wide entries (__global__, __pooled__), not per-ticker ones."""
+    return str(meta.get("ticker", "")).startswith("__")
+
+
+def evict(max_entries=None, max_age_days=None):
+    """
+    Remove entries unused for `max_age_days`, then, per model type, the LRU
+    per-ticker ones above `max_entries`.
+    """
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    max_age_days = MAX_AGE_DAYS if max_age_days is None else max_age_days
+    entries = sorted(list_entries(), key=lambda m: m.get("last_used", 0), reverse=True)
+    cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    kept = {}
+    removed = 0
+    for meta in entries:
+        expired = cutoff and meta.get("last_used", 0) < cutoff
+        if not expired and not _shared(meta):
+            kept[meta["model_type"]] = kept.get(meta["model_type"], 0) + 1
+            expired = kept[meta["model_type"]] > max_entries
+        if expired:
+            shutil.rmtree(meta["path"], ignore_errors=True)
+            removed += 1
+    if os.path.isdir(MODEL_FOLDER):
+        with open(EVICT_STAMP, "w"):
+            pass
+    return removed
+
+
+def _evict_if_due():
+    """evict() unless a pass already ran within the last EVICT_HOURS."""
+    try:
+        if time.time() - os.path.getmtime(EVICT_STAMP) < EVICT_HOURS * 3600:
+            return 0
+    except OSError:
+        pass
+    return evict()
@@ -0,0 +1,84 @@
+# registry.py
+"""
+Model backends by name, imported on first use.
+
+Each backend is declared as (module, function) and nothing is imported until
+it is actually run, so the app and the CLIs start without loading
+TensorFlow / XGBoost / scikit-learn.
+
+    from scripts.models import registry
+    registry.predict("XGBoost", "AAPL")
+
+Hyperparameters saved by the tuning search (scripts.tuning) are filled in
+for any keyword argument the caller doesn't pass.
+"""
+import os
+import importlib
+import threading
+from scripts.utils import storage
+from scripts.tuning.configs import tuned_params
+
+
+class Backend:
+    """A named model: `module.function(ticker, **kwargs)`, loaded lazily."""
+
+    def __init__(self, name, module, function, takes_path=False):
+        self.name = name
+        self.module = module
+        self.function = function
+        # Legacy signature: the function takes the cleaned CSV path, not the ticker
+        self.takes_path = takes_path
+        self._func = None
+
+    @property
+    def loaded(self):
+        return self._func is not None
+
+    def load(self):
+        if self._func is None:
+            self._func = getattr(importlib.import_module(self.module), self.function)
+        return self._func
+
+    def __call__(self, ticker, **kwargs):
+        func = self.load()
+        if self.takes_path:
+            return func(os.path.join(storage.CLEANED_FOLDER, f"{ticker}.csv"), **kwargs)
+        return func(ticker, **kwargs)
+
+
+_backends = {}
+_lock = threading.Lock()
+
+
+def register(name, module, function, takes_path=False):
+    """Declare a backend; the module isn't imported until the backend is used."""
+    with _lock:
+        _backends[name] = Backend(name, module, function, takes_path)
+    return _backends[name]
+
+
+def get(name):
+    if name not in _backends:
+        raise KeyError(f"Unknown model '{name}'. Choose from {names()}.")
+    return _backends[name]
+
+
+def names():
+    return list(_backends)
+
+
+def predict(name, ticker, tuned=True, **kwargs):
+    """
+    Run model `name` on `ticker` (importing its backend the first time). With
+    `tuned`, the saved tuned config for the ticker (or universe) is applied.
+    """
+    if tuned:
+        kwargs = {**tuned_params(name, ticker), **kwargs}
+    return get(name)(ticker, **kwargs)
+
+
+register("LSTM", "scripts.models.LSTM.lstm", "predict_lstm")
+register("Linear Regression", "scripts.models.regression.linear_regression", "predict_linear_regression",
+         takes_path=True)
+register("Multiple Regression", "scripts.models.regression.multiple_regression", "predict_multiple_regression")
+register("XGBoost", "scripts.models.XGBoost.xgboost_model", "predict_xgb")
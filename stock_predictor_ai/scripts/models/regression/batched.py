@@ -0,0 +1,276 @@
+# batched.py
+"""
+Batched least squares: the regression models for the whole universe at once.
+
+The design matrices of all tickers are stacked on a shared date grid into a
+(tickers, dates, features) panel, NaN where a ticker has no row or a feature
+is still warming up. Every ticker's OLS fit is then solved in one batched
+SVD instead of one sklearn LinearRegression per ticker, and the results are
+the same dicts predict_linear_regression / predict_multiple_regression return.
+
+    from scripts.models.regression.batched import linear_regression_universe
+    results = linear_regression_universe()          # {ticker: result}
+
+rolling_forecasts() refits every ticker on a trailing window at each origin,
+one batched solve per origin.
+
+Stacked panels are cached under data/cache/panels, keyed on every ticker's
+data version, so repeat runs skip the per-ticker feature loads.
+"""
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from scripts.utils import storage
+from scripts.features.cache import get_features
+from scripts.features.matrices import feature_matrix, horizon_targets
+
+# Forecast horizon (rows ahead) of each regression model
+HORIZONS = {"Linear Regression": 7, "Multiple Regression": 5}
+
+# Singular values below RCOND * largest are treated as zero (exactly collinear
+# columns such as BB_Width = BB_Upper - BB_Lower), like sklearn's lstsq
+RCOND = 1e-10
+
+PANEL_CACHE_FOLDER = os.path.join(storage.DATA_DIR, 'cache', 'panels')
+PANEL_FIELDS = ("tickers", "dates", "X", "y", "target_pos")
+
+# Last panel per (model, horizon), kept in memory between calls
+_panels = {}
+
+
+def _panel_path(model_name, horizon, versions):
+    key = "|".join(f"{t}={v}" for t, v in sorted(versions.items()))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    prefix = f"{model_name.replace(' ', '_')}_{horizon}_"
+    return os.path.join(PANEL_CACHE_FOLDER, f"{prefix}{digest}.npz"), prefix
+
+
+def load_panel(tickers, model_name, horizon=None):
+    """
+    {"tickers", "dates", "X" (T, D, k), "y" (T, D), "target_pos" (T, D)} on the
+    union date grid. y holds close[t + horizon] on each ticker's own rows, and
+    target_pos the grid position of that target's date. Unstored tickers are
+    skipped. Arrays are shared with the cache: don't modify them.
+    """
+    horizon = horizon or HORIZONS[model_name]
+    versions = storage.data_versions(tickers)
+    path, prefix = _panel_path(model_name, horizon, versions)
+    cached = _panels.get((model_name, horizon))
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    if os.path.exists(path):
+        try:
+            with np.load(path) as stored:
+                panel = {field: stored[field] for field in PANEL_FIELDS}
+            panel["tickers"] = panel["tickers"].tolist()
+            _panels[(model_name, horizon)] = (path, panel)
+            return panel
+        except Exception:
+            pass  # unreadable entry: rebuild below
+
+    panel = _build_panel([t for t in tickers if t in versions], model_name, horizon)
+
+    os.makedirs(PANEL_CACHE_FOLDER, exist_ok=True)
+    for f in os.listdir(PANEL_CACHE_FOLDER):
+        if f.startswith(prefix):
+            try:
+                os.remove(os.path.join(PANEL_CACHE_FOLDER, f))
+            except OSError:
+                pass
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **{field: np.asarray(panel[field]) for field in PANEL_FIELDS})
+    os.replace(tmp_path, path)
+    _panels[(model_name, horizon)] = (path, panel)
+    return panel
+
+
+def _build_panel(tickers, model_name, horizon):
+    loaded = []
+    for t in tickers:
+        feats = get_features(t)
+        if feats is None:
+            continue
+        X, _ = feature_matrix(feats, model_name)
+        y = horizon_targets(feats["Close"], (horizon,))[:, 0]
+        loaded.append((t, np.asarray(feats["Date"]), X, y))
+
+    dates = np.unique(np.concatenate([d for _, d, _, _ in loaded])) if loaded else np.array([], dtype="datetime64[ns]")
+    T, D = len(loaded), len(dates)
+    k = loaded[0][2].shape[1] if loaded else 0
+    X_panel = np.full((T, D, k), np.nan)
+    y_panel = np.full((T, D), np.nan)
+    target_pos = np.full((T, D), np.iinfo(np.int64).max, dtype=np.int64)
+    for i, (_, d, X, y) in enumerate(loaded):
+        pos = np.searchsorted(dates, d)
+        X_panel[i, pos] = X
+        y_panel[i, pos] = y
+        target_pos[i, pos[:len(pos) - horizon]] = pos[horizon:]
+    return {"tickers": [t for t, _, _, _ in loaded], "dates": dates,
+            "X": X_panel, "y": y_panel, "target_pos": target_pos}
+
+
+def batched_lstsq(X, y, mask, rcond=RCOND):
+    """
+    OLS with intercept for every ticker at once.
+
+    X (T, D, k), y (T, D), mask (T, D) selects each ticker's training rows.
+    Returns (coef (T, k), intercept (T,)); NaN for tickers without rows.
+    Columns are centred and scaled per ticker before a batched SVD, which keeps
+    the solve well conditioned and gives the minimum-norm solution when
+    columns are collinear.
+    """
+    w = mask.astype(float)
+    n = w.sum(axis=1)
+    n_safe = np.maximum(n, 1)
+    Xz = np.where(mask[..., None], X, 0.0)
+    yz = np.where(mask, y, 0.0)
+    x_mean = Xz.sum(axis=1) / n_safe[:, None]
+    y_mean = yz.sum(axis=1) / n_safe
+    Xc = (Xz - x_mean[:, None, :]) * w[..., None]
+    yc = (yz - y_mean[:, None]) * w
+    scale = np.sqrt((Xc ** 2).sum(axis=1))
+    scale[scale == 0] = 1.0
+
+    U, S, Vt = np.linalg.svd(Xc / scale[:, None, :], full_matrices=False)
+    keep = S > rcond * S[:, :1]
+    inv_S = np.divide(1.0, S, out=np.zeros_like(S), where=keep)
+    Uty = np.einsum("tdk,td->tk", U, yc)
+    coef = np.einsum("tjk,tj->tk", Vt, inv_S * Uty) / scale
+    intercept = y_mean - (x_mean * coef).sum(axis=1)
+
+    empty = n == 0
+    coef[empty] = np.nan
+    intercept[empty] = np.nan
+    return coef, intercept
+
+
+def _apply(coef, intercept, X):
+    """Predictions for X (T, D, k) or (T, k)."""
+    if X.ndim == 2:
+        return (X * coef).sum(axis=1) + intercept
+    return np.einsum("tdk,tk->td", X, coef) + intercept[:, None]
+
+
+def _masked_mean(values, mask):
+    """Row means of `values` over `mask` (NaN for rows with nothing selected)."""
+    count = mask.sum(axis=1)
+    total = np.where(mask, values, 0.0).sum(axis=1)
+    return np.divide(total, count, out=np.full(len(count), np.nan), where=count > 0)
+
+
+def _last_true(mask):
+    """Index of the last True per row, -1 where none."""
+    rev = mask[:, ::-1].argmax(axis=1)
+    return np.where(mask.any(axis=1), mask.shape[1] - 1 - rev, -1)
+
+
+def linear_regression_universe(tickers=None):
+    """predict_linear_regression() for every ticker in one batched solve."""
+    tickers = storage.list_stocks() if tickers is None else tickers
+    panel = load_panel(tickers, "Linear Regression")
+    X, y = panel["X"], panel["y"]
+    train = ~np.isnan(X).any(axis=2) & ~np.isnan(y)
+    coef, intercept = batched_lstsq(X, y, train)
+
+    err = _apply(coef, intercept, X) - y
+    mae = _masked_mean(np.abs(err), train)
+    rmse = np.sqrt(_masked_mean(err ** 2, train))
+    # Like the per-ticker model, forecast from the last row that has a target
+    last = _last_true(train)
+
+    results = {}
+    for i, t in enumerate(panel["tickers"]):
+        if last[i] < 0:
+            results[t] = {"error": "Not enough data to compute SMA_50."}
+            continue
+        latest_date = pd.Timestamp(panel["dates"][last[i]])
+        results[t] = {
+            "prediction": float(_apply(coef[i:i + 1], intercept[i:i + 1], X[i:i + 1, last[i]])[0]),
+            "latest_date": latest_date,
+            "next_week_date": latest_date + timedelta(days=7),
+            "metrics": {"MAE": float(mae[i]), "RMSE": float(rmse[i])},
+        }
+    return results
+
+
+def multiple_regression_universe(tickers=None, train_fraction=0.8):
+    """predict_multiple_regression() for every ticker in one batched solve."""
+    tickers = storage.list_stocks() if tickers is None else tickers
+    panel = load_panel(tickers, "Multiple Regression")
+    X, y = panel["X"], panel["y"]
+    features_ok = ~np.isnan(X).any(axis=2)
+    usable = features_ok & ~np.isnan(y)
+    # Chronological split: the first 80% of each ticker's usable rows train
+    rank = np.cumsum(usable, axis=1)
+    split = (usable.sum(axis=1) * train_fraction).astype(int)
+    train = usable & (rank <= split[:, None])
+    test = usable & ~train
+    coef, intercept = batched_lstsq(X, y, train)
+
+    err = _apply(coef, intercept, X) - y
+    mae = _masked_mean(np.abs(err), test)
+    rmse = np.sqrt(_masked_mean(err ** 2, test))
+    latest = _last_true(features_ok)
+
+    results = {}
+    for i, t in enumerate(panel["tickers"]):
+        if not train[i].any() or not test[i].any():
+            results[t] = {"error": "Not enough data after feature engineering."}
+            continue
+        latest_date = pd.Timestamp(panel["dates"][latest[i]])
+        prediction = _apply(coef[i:i + 1], intercept[i:i + 1], X[i:i + 1, latest[i]])[0]
+        results[t] = {
+            "prediction": round(float(prediction), 2),
+            "mae": round(float(mae[i]), 3),
+            "rmse": round(float(rmse[i]), 3),
+            "latest_date": str(latest_date.date()),
+            "next_week_date": str((latest_date + pd.offsets.BDay(5)).date()),
+        }
+    return results
+
+
+UNIVERSE_FUNCTIONS = {
+    "Linear Regression": linear_regression_universe,
+    "Multiple Regression": multiple_regression_universe,
+}
+
+
+def rolling_forecasts(model_name, tickers=None, window=250, step=20, min_rows=None):
+    """
+    Rolling-window refits for every ticker: at each origin (every `step` grid
+    dates) each model is refit on the rows whose target was known by then,
+    within the last `window` grid dates, and forecasts from the origin row.
+    Returns a long DataFrame (ticker, date, prediction, actual, error).
+    """
+    tickers = storage.list_stocks() if tickers is None else tickers
+    horizon = HORIZONS[model_name]
+    panel = load_panel(tickers, model_name, horizon)
+    X, y, target_pos = panel["X"], panel["y"], panel["target_pos"]
+    usable = ~np.isnan(X).any(axis=2) & ~np.isnan(y)
+    min_rows = min_rows or X.shape[2] + 2
+
+    frames = []
+    for origin in range(window + horizon, X.shape[1], step):
+        lo = max(0, origin - horizon - window + 1)
+        rows = slice(lo, origin + 1)
+        mask = usable[:, rows] & (target_pos[:, rows] <= origin)
+        fit = mask.sum(axis=1) >= min_rows
+        at_origin = ~np.isnan(X[:, origin]).any(axis=1)
+        if not (fit & at_origin).any():
+            continue
+        coef, intercept = batched_lstsq(X[:, rows], y[:, rows], mask)
+        preds = _apply(coef, intercept, X[:, origin])
+        ok = fit & at_origin
+        frames.append(pd.DataFrame({
+            "ticker": np.asarray(panel["tickers"])[ok],
+            "date": pd.Timestamp(panel["dates"][origin]),
+            "prediction": preds[ok],
+            "actual": y[ok, origin],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["ticker", "date", "prediction", "actual", "error"])
+    out = pd.concat(frames, ignore_index=True)
+    out["error"] = out["prediction"] - out["actual"]
+    return out
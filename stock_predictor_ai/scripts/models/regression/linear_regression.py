@@ -5,15 +5,23 @@ from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 from datetime import timedelta
 import os
+from scripts.utils import storage, timing
+from scripts.features.cache import get_features
+from scripts.features.indicators import DEFAULT_PARAMS
 
-def predict_linear_regression(csv_path):
+@timing.timed("Linear Regression")
+def predict_linear_regression(csv_path, window=50):
     """
     Run linear regression on a stock CSV and predict the next week's closing price.
 
     Parameters
     ----------
     csv_path : str
-        Full path to the CSV file (e.g., '.../data/cleaned/AAPL.csv').
+        Full path to the CSV file (e.g., '.../data/cleaned/AAPL.csv'). The ticker
+        is taken from the file name and loaded through the storage backend; the
+        CSV itself is only read if the backend doesn't have the ticker.
+    window : int
+        SMA window of the feature (default 50).
 
     Returns
     -------
@@ -28,50 +36,63 @@ def predict_linear_regression(csv_path):
             }
         }
     """
-    # --- Load CSV ---
-    df = pd.read_csv(csv_path)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.sort_values('Date', inplace=True)
-
+    # --- Load data ---
     stock_symbol = os.path.basename(csv_path).replace(".csv", "")
+    with timing.stage(timing.LOAD):
+        df = storage.load_stock(stock_symbol)
+        if df is None:
+            df = pd.read_csv(csv_path)
+        df['Date'] = pd.to_datetime(df['Date'])
+        df.sort_values('Date', inplace=True)
+
     close_col = f'Close_{stock_symbol}'
 
     if close_col not in df.columns:
         raise ValueError(f"Column {close_col} not found in {csv_path}")
 
     # --- SMA Feature ---
-    df['SMA_50'] = df[close_col].rolling(window=50).mean()
-    df.dropna(subset=['SMA_50'], inplace=True)
+    sma_col = f'SMA_{window}'
+    with timing.stage(timing.FEATURES):
+        feats = get_features(stock_symbol, DEFAULT_PARAMS if window in DEFAULT_PARAMS["sma"] else {"sma": (window,)})
+        if feats is not None and len(feats[sma_col]) == len(df):
+            df[sma_col] = feats[sma_col]
+        else:
+            df[sma_col] = df[close_col].rolling(window=window).mean()
+    df.dropna(subset=[sma_col], inplace=True)
     if df.empty:
-        raise ValueError("Not enough data to compute SMA_50.")
+        raise ValueError(f"Not enough data to compute {sma_col}.")
 
     # --- Prepare target ---
     df['Target_Close'] = df[close_col].shift(-7)
     df.dropna(subset=['Target_Close'], inplace=True)
 
-    X = df[['SMA_50']]
+    X = df[[sma_col]]
     y = df['Target_Close']
 
     # --- Train Model ---
-    model = LinearRegression()
-    model.fit(X, y)
-    y_pred = model.predict(X)
+    with timing.stage(timing.FIT):
+        model = LinearRegression()
+        model.fit(X, y)
+    with timing.stage(timing.METRICS):
+        y_pred = model.predict(X)
 
     # --- Predict next 7 trading days ---
-    latest_sma = df.iloc[-1]['SMA_50']
-    predicted_next = model.predict([[latest_sma]])[0]
+    with timing.stage(timing.FORECAST):
+        latest_sma = df.iloc[-1][sma_col]
+        predicted_next = model.predict([[latest_sma]])[0]
 
-    # --- Next trading date ---
-    latest_date = df.iloc[-1]['Date']
-    future_days = df[df['Date'] > latest_date]['Date']
-    if len(future_days) >= 5:
-        next_week_date = future_days.iloc[4]
-    else:
-        next_week_date = latest_date + timedelta(days=7)
+        # --- Next trading date ---
+        latest_date = df.iloc[-1]['Date']
+        future_days = df[df['Date'] > latest_date]['Date']
+        if len(future_days) >= 5:
+            next_week_date = future_days.iloc[4]
+        else:
+            next_week_date = latest_date + timedelta(days=7)
 
     # --- Metrics ---
-    mae_val = mean_absolute_error(y, y_pred)
-    rmse_val = np.sqrt(mean_squared_error(y, y_pred))
+    with timing.stage(timing.METRICS):
+        mae_val = mean_absolute_error(y, y_pred)
+        rmse_val = np.sqrt(mean_squared_error(y, y_pred))
 
     return {
         "prediction": predicted_next,
@@ -82,3 +103,12 @@ def predict_linear_regression(csv_path):
             "RMSE": rmse_val
         }
     }
+
+
+def predict_linear_regression_universe(tickers=None):
+    """
+    predict_linear_regression() for many tickers (default: all stored) at once:
+    {ticker: result}, solved in one batched least-squares pass.
+    """
+    from scripts.models.regression.batched import linear_regression_universe
+    return linear_regression_universe(tickers)
@@ -1,29 +1,23 @@
-import os
 import pandas as pd
 import numpy as np
 from datetime import timedelta
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from ta.momentum import RSIIndicator
-from ta.trend import MACD
-from ta.volatility import BollingerBands
+from scripts.utils import storage, timing
+from scripts.features.cache import get_features
 
+@timing.timed("Multiple Regression")
 def predict_multiple_regression(stock_symbol):
     """
     Run multiple regression using technical indicators to predict next week's closing price.
     Works with CSVs that have either 'Close' or 'Close_<symbol>' columns.
     """
 
-    # === Setup Paths ===
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..','..'))
-    cleaned_path = os.path.join(base_dir, 'data', 'cleaned')
-    csv_path = os.path.join(cleaned_path, f'{stock_symbol}.csv')
-
-    if not os.path.exists(csv_path):
-        return {"error": f"File not found: {csv_path}"}
-
     # === Load Data ===
-    df = pd.read_csv(csv_path)
+    with timing.stage(timing.LOAD):
+        df = storage.load_stock(stock_symbol)
+    if df is None:
+        return {"error": f"No stored data found for {stock_symbol}."}
 
     # --- Detect Close column style ---
     possible_close_cols = [f'Close_{stock_symbol}', 'Close']
@@ -34,36 +28,33 @@ def predict_multiple_regression(stock_symbol):
     # === Preprocess ===
     df['Date'] = pd.to_datetime(df['Date'])
     df.sort_values('Date', inplace=True)
-    original_df = df.copy()
-
-    # === Feature Engineering ===
-    df['SMA_10'] = df[close_col].rolling(window=10).mean()
-    df['SMA_20'] = df[close_col].rolling(window=20).mean()
-    df['Volatility_10'] = df[close_col].rolling(window=10).std()
-
-    rsi = RSIIndicator(close=df[close_col], window=14)
-    df["RSI_14"] = rsi.rsi()
 
-    macd = MACD(close=df[close_col])
-    df["MACD"] = macd.macd()
-    df["MACD_Signal"] = macd.macd_signal()
-    df["MACD_Diff"] = df["MACD"] - df["MACD_Signal"]
-
-    bb = BollingerBands(close=df[close_col], window=20, window_dev=2)
-    df["BB_Upper"] = bb.bollinger_hband()
-    df["BB_Lower"] = bb.bollinger_lband()
-    df["BB_Width"] = df["BB_Upper"] - df["BB_Lower"]
-
-    # Target = 5 days ahead close
-    df['Target_Close'] = df[close_col].shift(-5)
-
-    # Feature list
-    features = [
-        'SMA_10', 'SMA_20', 'Volatility_10',
-        'RSI_14', 'MACD', 'MACD_Signal', 'MACD_Diff',
-        'BB_Upper', 'BB_Lower', 'BB_Width'
-    ]
-    df.dropna(inplace=True)
+    # === Feature Engineering (shared, cached indicator arrays) ===
+    with timing.stage(timing.FEATURES):
+        feats = get_features(stock_symbol)
+        df['SMA_10'] = feats['SMA_10']
+        df['SMA_20'] = feats['SMA_20']
+        df['Volatility_10'] = feats['STD_10']
+        df["RSI_14"] = feats['RSI_14']
+        df["MACD"] = feats['MACD_12_26']
+        df["MACD_Signal"] = feats['MACD_SIGNAL_12_26_9']
+        df["MACD_Diff"] = df["MACD"] - df["MACD_Signal"]
+        df["BB_Upper"] = feats['BB_UPPER_20_2']
+        df["BB_Lower"] = feats['BB_LOWER_20_2']
+        df["BB_Width"] = df["BB_Upper"] - df["BB_Lower"]
+
+        # Target = 5 days ahead close
+        df['Target_Close'] = df[close_col].shift(-5)
+
+        # Feature list
+        features = [
+            'SMA_10', 'SMA_20', 'Volatility_10',
+            'RSI_14', 'MACD', 'MACD_Signal', 'MACD_Diff',
+            'BB_Upper', 'BB_Lower', 'BB_Width'
+        ]
+        # Latest features come from the same arrays (last row with every indicator)
+        latest_valid = df.dropna(subset=features)
+        df.dropna(inplace=True)
 
     if df.empty:
         return {"error": "Not enough data after feature engineering."}
@@ -76,50 +67,35 @@ def predict_multiple_regression(stock_symbol):
     y_train, y_test = y[:split_point], y[split_point:]
 
     # === Train Model ===
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+    with timing.stage(timing.FIT):
+        model = LinearRegression()
+        model.fit(X_train, y_train)
+    with timing.stage(timing.METRICS):
+        y_pred = model.predict(X_test)
 
     # === Predict next week ===
-    latest_valid = original_df.tail(50).copy()
-    latest_valid['SMA_10'] = latest_valid[close_col].rolling(window=10).mean()
-    latest_valid['SMA_20'] = latest_valid[close_col].rolling(window=20).mean()
-    latest_valid['Volatility_10'] = latest_valid[close_col].rolling(window=10).std()
-
-    rsi = RSIIndicator(close=latest_valid[close_col], window=14)
-    latest_valid['RSI_14'] = rsi.rsi()
-
-    macd = MACD(close=latest_valid[close_col])
-    latest_valid['MACD'] = macd.macd()
-    latest_valid['MACD_Signal'] = macd.macd_signal()
-    latest_valid['MACD_Diff'] = latest_valid['MACD'] - latest_valid['MACD_Signal']
-
-    bb = BollingerBands(close=latest_valid[close_col], window=20, window_dev=2)
-    latest_valid['BB_Upper'] = bb.bollinger_hband()
-    latest_valid['BB_Lower'] = bb.bollinger_lband()
-    latest_valid['BB_Width'] = latest_valid['BB_Upper'] - latest_valid['BB_Lower']
-
-    latest_valid.dropna(inplace=True)
     if latest_valid.empty:
         return {"error": "Not enough recent data for prediction."}
 
-    latest_row = latest_valid.iloc[-1]
-    latest_features = latest_row[features].values.reshape(1, -1)
-    latest_date = latest_row['Date']
+    with timing.stage(timing.FORECAST):
+        latest_row = latest_valid.iloc[-1]
+        latest_features = latest_row[features].values.reshape(1, -1)
+        latest_date = latest_row['Date']
 
-    predicted_price = model.predict(latest_features)[0]
+        predicted_price = model.predict(latest_features)[0]
 
-    # === Calculate Next Business Week Date ===
-    next_week_date = latest_date
-    days_added = 0
-    while days_added < 5:
-        next_week_date += timedelta(days=1)
-        if next_week_date.weekday() < 5:
-            days_added += 1
+        # === Calculate Next Business Week Date ===
+        next_week_date = latest_date
+        days_added = 0
+        while days_added < 5:
+            next_week_date += timedelta(days=1)
+            if next_week_date.weekday() < 5:
+                days_added += 1
 
     # === Evaluation Metrics ===
-    mae = mean_absolute_error(y_test, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+    with timing.stage(timing.METRICS):
+        mae = mean_absolute_error(y_test, y_pred)
+        rmse = np.sqrt(mean_squared_error(y_test, y_pred))
 
     # === Return Output ===
     return {
@@ -129,3 +105,12 @@ def predict_multiple_regression(stock_symbol):
         "latest_date": str(latest_date.date()),
         "next_week_date": str(next_week_date.date())
     }
+
+
+def predict_multiple_regression_universe(tickers=None):
+    """
+    predict_multiple_regression() for many tickers (default: all stored) at
+    once: {ticker: result}, solved in one batched least-squares pass.
+    """
+    from scripts.models.regression.batched import multiple_regression_universe
+    return multiple_regression_universe(tickers)
@@ -0,0 +1,87 @@
+# configs.py
+"""
+Tuned hyperparameters, written by the search (search.py) per ticker or for
+the whole universe, in data/tuning/best_configs.json:
+
+    {"per_ticker": {"AAPL": {"XGBoost": {"params": {...}, "score": ..., ...}}},
+     "universe":   {"XGBoost": {"params": {...}, "score": ..., ...}}}
+
+tuned_params(model, ticker) is what registry.predict() fills in: the
+ticker's own config, else the universe one, else {} (the function defaults).
+"""
+import os
+import json
+import threading
+from datetime import datetime
+from scripts.utils import storage
+
+TUNING_FOLDER = os.path.join(storage.DATA_DIR, 'tuning')
+CONFIG_FILE = os.path.join(TUNING_FOLDER, 'best_configs.json')
+PER_TICKER = "per_ticker"
+UNIVERSE = "universe"
+
+_lock = threading.Lock()
+# (mtime, configs) of the last read of CONFIG_FILE
+_loaded = (None, None)
+
+
+def _empty():
+    return {PER_TICKER: {}, UNIVERSE: {}}
+
+
+def load_configs():
+    """Every saved config; re-read only when the file changed."""
+    global _loaded
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE)
+    except OSError:
+        return _empty()
+    with _lock:
+        if _loaded[0] == mtime:
+            return _loaded[1]
+    try:
+        with open(CONFIG_FILE) as f:
+            configs = {**_empty(), **json.load(f)}
+    except (OSError, ValueError):
+        return _empty()
+    with _lock:
+        _loaded = (mtime, configs)
+    return configs
+
+
+def best_config(model, ticker=None):
+    """Saved entry for `model` on `ticker` (falling back to the universe one), or None."""
+    configs = load_configs()
+    entry = configs[PER_TICKER].get(ticker, {}).get(model) if ticker is not None else None
+    return entry or configs[UNIVERSE].get(model)
+
+
+def tuned_params(model, ticker=None):
+    """Keyword arguments of the tuned config for `model` on `ticker` ({} if none)."""
+    entry = best_config(model, ticker)
+    return dict(entry["params"]) if entry else {}
+
+
+def save_config(model, params, score, ticker=None, **extra):
+    """Record the winning `params` of `model` for `ticker` (None: the universe)."""
+    global _loaded
+    entry = {"params": params, "score": score, "tuned_at": datetime.now().isoformat(timespec="seconds"), **extra}
+    os.makedirs(TUNING_FOLDER, exist_ok=True)
+    with _lock:
+        configs = _empty()
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE) as f:
+                    configs.update(json.load(f))
+            except (OSError, ValueError):
+                pass  # unreadable: start over
+        if ticker is None:
+            configs[UNIVERSE][model] = entry
+        else:
+            configs[PER_TICKER].setdefault(ticker, {})[model] = entry
+        with storage.atomic_write(CONFIG_FILE) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(configs, f, indent=2, default=str)
+        _loaded = (None, None)
+    return entry
+
@@ -0,0 +1,346 @@
+# search.py
+"""
+Hyperparameter search with successive halving.
+
+Every configuration of a model's search space is trained on a small budget
+(XGBoost trees, LSTM epochs) and scored on a held-out tail of the history;
+only the best 1/eta go on to the next budget rung, where they resume from
+their checkpoint instead of starting over. XGBoost trials are scored on
+predict_xgb's own objective (same-row close from its MinMax-scaled features,
+last n_days rows held out) and the saved tree count is the best rung budget.
+LSTM trials track the validation error per epoch and stop once it stalls
+(early stopping); the saved epoch count is where it was lowest.
+
+- Trials of a rung run in parallel worker processes (spawned, with capped
+  threads), reading prices from one shared-memory panel.
+- Feature matrices (from the feature cache) and scaled series are prepared
+  once per worker and ticker and reused by every trial and rung; LSTM
+  windows are strided views, and validation runs on the NumPy engine.
+- scope="ticker" searches each ticker on its own; scope="universe" scores
+  each configuration on all tickers (mean relative error) and saves one
+  config for all of them. Winners go to configs.CONFIG_FILE, and
+  registry.predict() applies them from then on.
+
+    python -m scripts.tuning.search --models XGBoost LSTM --tickers AAPL MSFT
+    python -m scripts.tuning.search --scope universe --eta 3 --workers 4
+"""
+import os
+import math
+import time
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scripts.utils import storage, panel
+from scripts.features.cache import get_features
+from scripts.features.matrices import feature_matrix, horizon_targets
+from scripts.models.ensemble.combine import _init_worker
+from scripts.tuning.configs import TUNING_FOLDER, save_config
+
+SEARCH_SPACES = {
+    "XGBoost": {"max_depth": (3, 5, 7), "learning_rate": (0.03, 0.05, 0.1)},
+    "LSTM": {"seq_length": (30, 60, 90), "units": (32, 50, 64)},
+    "Linear Regression": {"window": (10, 14, 20, 30, 50, 100, 200)},
+}
+
+# (budget parameter, rungs): survivors of each rung are trained up to the next budget
+RUNGS = {
+    "XGBoost": ("n_estimators", (50, 150, 450)),
+    "LSTM": ("epochs", (1, 3, 9)),
+    "Linear Regression": (None, (None,)),    # closed-form fit: one rung, no pruning
+}
+
+# Share of each history held out (most recent rows) for scoring
+VAL_FRACTION = 0.2
+# Forecast horizon of the regression target (close[t + HORIZON], as in predict_linear_regression)
+HORIZON = 7
+# Rows predict_xgb holds out for its metrics (its n_days)
+XGB_TEST_DAYS = 7
+LSTM_BATCH_SIZE = 32
+# Early stopping: an LSTM trial stops training once its validation error
+# hasn't improved for this many epochs
+PATIENCE = 3
+
+
+def grid(model, space=None):
+    """Every configuration (dict) of `model`'s search space."""
+    space = space or SEARCH_SPACES[model]
+    return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+
+# ----------------------
+# PREPARED DATA (per worker)
+# ----------------------
+# (model, ticker, data version) -> arrays, reused by every trial and rung this worker runs
+_prepared = {}
+
+
+def _split(rows):
+    """First validation row of a history of `rows` rows."""
+    return rows - max(1, int(rows * VAL_FRACTION))
+
+
+def _prepare(model, ticker):
+    version = storage.data_version(ticker)
+    key = (model, ticker, version)
+    if key in _prepared:
+        return _prepared[key]
+    for k in [k for k in _prepared if k[:2] == (model, ticker)]:
+        del _prepared[k]  # older data version
+
+    if model == "XGBoost":
+        from sklearn.preprocessing import MinMaxScaler
+        # predict_xgb's design: same-row close from the features, last n_days rows held out
+        feats = get_features(ticker)
+        X, first_valid = feature_matrix(feats, "XGBoost")
+        X, y = X[max(first_valid, 0):], feats["Close"][max(first_valid, 0):]
+        cut = len(y) - XGB_TEST_DAYS
+        scaler = MinMaxScaler().fit(X[:cut])
+        data = {"X_train": scaler.transform(X[:cut]), "y_train": y[:cut],
+                "X_val": scaler.transform(X[cut:]), "y_val": y[cut:]}
+    elif model == "LSTM":
+        close = np.asarray(storage.load_arrays(ticker)["Close"], dtype=float)
+        cut = _split(len(close))
+        low, high = close[:cut].min(), close[:cut].max()
+        span = (high - low) or 1.0
+        data = {"scaled": ((close - low) / span).astype(np.float32), "cut": cut, "span": span,
+                "mean_val": float(np.mean(np.abs(close[cut:])))}
+    else:
+        windows = SEARCH_SPACES["Linear Regression"]["window"]
+        feats = get_features(ticker, {"sma": tuple(windows)})
+        y = horizon_targets(feats["Close"], (HORIZON,))[:, 0]
+        data = {"feats": feats, "y": y}
+    _prepared[key] = data
+    return data
+
+
+def _stalled(curve, patience=PATIENCE):
+    return len(curve) > 0 and len(curve) - 1 - int(np.argmin(curve)) >= patience
+
+
+def _padded(curve, budget):
+    """`curve` cut or extended (with its last value, for stopped trials) to `budget` steps."""
+    return np.pad(curve, (0, max(budget - len(curve), 0)), mode="edge")[:budget]
+
+
+def _relative_rmse(errors, actual):
+    return float(np.sqrt(np.mean(np.square(errors))) / np.mean(np.abs(actual)))
+
+
+# ----------------------
+# TRIALS (run in workers)
+# ----------------------
+def _xgb_curve(config, ticker, budget, folder, threads):
+    """Validation curve (relative RMSE after each tree) of `config` trained up to `budget` trees."""
+    from xgboost import XGBRegressor
+    data = _prepare("XGBoost", ticker)
+    model_path = os.path.join(folder, "model.json")
+    curve_path = os.path.join(folder, "curve.npy")
+    done = np.load(curve_path) if os.path.exists(curve_path) else np.empty(0)
+    if len(done) < budget:
+        model = XGBRegressor(n_estimators=budget - len(done), n_jobs=threads, random_state=42,
+                             eval_metric="rmse", **config)
+        model.fit(data["X_train"], data["y_train"], eval_set=[(data["X_val"], data["y_val"])],
+                  xgb_model=model_path if len(done) else None, verbose=False)
+        rmse = np.asarray(model.evals_result()["validation_0"]["rmse"])
+        done = np.concatenate([done, rmse / np.mean(np.abs(data["y_val"]))])
+        os.makedirs(folder, exist_ok=True)
+        model.save_model(model_path)
+        np.save(curve_path, done)
+    return done[:budget]
+
+
+def _lstm_curve(config, ticker, budget, folder, threads):
+    """Validation curve (relative RMSE after each epoch) of `config` trained up to `budget` epochs."""
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model  # type: ignore
+    from scripts.models.LSTM.lstm import build_lstm
+    from scripts.models.LSTM.windows import sliding_windows
+    from scripts.models.LSTM.datasets import WindowDataset
+    from scripts.models.LSTM.inference import LSTMEngine
+    data = _prepare("LSTM", ticker)
+    seq_length, cut = config["seq_length"], data["cut"]
+    model_path = os.path.join(folder, "model.keras")
+    curve_path = os.path.join(folder, "curve.npy")
+    done = np.load(curve_path) if os.path.exists(curve_path) else np.empty(0)
+    if len(done) < budget and not _stalled(done):
+        if len(done):
+            model = load_model(model_path)
+        else:
+            tf.keras.utils.set_random_seed(42)
+            model = build_lstm(seq_length, config["units"])
+        batches = WindowDataset([data["scaled"][:cut]], seq_length, LSTM_BATCH_SIZE)
+        X, y = sliding_windows(data["scaled"], seq_length)
+        X_val, y_val = X[cut - seq_length:], y[cut - seq_length:, 0]
+        while len(done) < budget and not _stalled(done):
+            model.fit(batches, epochs=1, verbose=0)
+            errors = LSTMEngine.from_keras(model).predict(X_val)[:, 0] - y_val
+            done = np.append(done, math.sqrt(np.mean(np.square(errors))) * data["span"] / data["mean_val"])
+        os.makedirs(folder, exist_ok=True)
+        model.save(model_path)
+        np.save(curve_path, done)
+    return _padded(done, budget)
+
+
+def _regression_score(config, ticker):
+    """Relative RMSE of the SMA-window linear regression fitted on the training rows."""
+    data = _prepare("Linear Regression", ticker)
+    x, y = data["feats"][f"SMA_{config['window']}"], data["y"]
+    rows = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    cut = _split(len(rows))
+    train, val = rows[:max(cut - HORIZON, 2)], rows[cut:]
+    A = np.column_stack([x[train], np.ones(len(train))])
+    coef = np.linalg.lstsq(A, y[train], rcond=None)[0]
+    errors = coef[0] * x[val] + coef[1] - y[val]
+    return _relative_rmse(errors, y[val])
+
+
+def run_trial(model, config, tickers, budget, folder, threads=1):
+    """
+    Train `config` up to `budget` on each of `tickers` (resuming from the
+    checkpoints under `folder`) and score it: {"score": mean relative
+    validation RMSE at the best budget, "budget": that budget}. XGBoost
+    budgets are picked among the rung budgets, LSTM ones among all epochs.
+    """
+    if model == "Linear Regression":
+        scores = [_regression_score(config, t) for t in tickers]
+        return {"score": float(np.mean(scores)), "budget": None}
+    curve = _xgb_curve if model == "XGBoost" else _lstm_curve
+    curves = [curve(config, t, budget, os.path.join(folder, t), threads) for t in tickers]
+    mean = np.mean(curves, axis=0)
+    candidates = np.arange(1, budget + 1)
+    if model == "XGBoost":
+        candidates = np.array([b for b in RUNGS[model][1] if b <= budget])
+    scores = mean[candidates - 1]
+    best = int(np.nanargmin(scores)) if np.isfinite(scores).any() else len(scores) - 1
+    return {"score": float(scores[best]), "budget": int(candidates[best])}
+
+
+def _run_trial_safe(*args):
+    try:
+        return run_trial(*args)
+    except Exception as e:
+        return {"score": math.inf, "budget": None, "error": str(e)}
+
+
+def _init_tuning_worker(threads, descriptor):
+    _init_worker(threads)
+    panel.init_worker(descriptor)
+
+
+# ----------------------
+# SUCCESSIVE HALVING
+# ----------------------
+def successive_halving(model, tickers, configs=None, eta=3, pool=None, threads=1, run_dir=None, logger=None):
+    """
+    Search `configs` (default: the whole grid) of `model` on `tickers`.
+    Returns (best trial, history rows); a trial is {"trial", "config",
+    "score", "budget", "params"} where params are the keyword arguments of
+    the model function.
+    """
+    if logger is None:
+        logger = print
+    configs = grid(model) if configs is None else configs
+    resource, rungs = RUNGS[model]
+    alive = [{"trial": i, "config": c} for i, c in enumerate(configs)]
+    history = []
+    with tempfile.TemporaryDirectory(prefix=f"{model.replace(' ', '_')}-", dir=run_dir) as folder:
+        for level, budget in enumerate(rungs):
+            args = [(model, t["config"], tickers, budget, os.path.join(folder, str(t["trial"])), threads)
+                    for t in alive]
+            results = pool.map(_run_trial_safe, *zip(*args)) if pool is not None else \
+                [_run_trial_safe(*a) for a in args]
+            for trial, result in zip(alive, results):
+                trial.update(result)
+                history.append({"model": model, "rung": level, "max_budget": budget, "trial": trial["trial"],
+                                **trial["config"], "score": trial["score"], "best_budget": trial["budget"],
+                                "error": result.get("error")})
+            alive.sort(key=lambda t: t["score"] if np.isfinite(t["score"]) else math.inf)
+            logger(f"{model} rung {level} (budget {budget}): {len(alive)} trials, "
+                   f"best {alive[0]['score']:.4f} {alive[0]['config']}")
+            if level < len(rungs) - 1:
+                alive = alive[:max(1, len(alive) // eta)]
+
+    best = alive[0]
+    best["params"] = dict(best["config"])
+    if resource is not None and best["budget"] is not None:
+        best["params"][resource] = best["budget"]
+    return best, history
+
+
+def tune(models=("XGBoost", "LSTM", "Linear Regression"), tickers=None, scope="ticker", eta=3, workers=None,
+         save=True, logger=None):
+    """
+    Tune `models` on `tickers` (default: all stored). scope="ticker" saves a
+    config per ticker, scope="universe" one config for all of them.
+    """
+    if logger is None:
+        logger = print
+    if scope not in ("ticker", "universe"):
+        raise ValueError(f"Unknown scope '{scope}'. Choose 'ticker' or 'universe'.")
+    tickers = storage.list_stocks() if tickers is None else [t for t in tickers if storage.has_stock(t)]
+    if not tickers:
+        return {"message": "No stored stocks to tune.", "best": {}, "trials": pd.DataFrame()}
+    groups = [[t] for t in tickers] if scope == "ticker" else [tickers]
+    workers = workers or min(max(len(grid(m)) for m in models), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    os.makedirs(TUNING_FOLDER, exist_ok=True)
+
+    start = time.perf_counter()
+    best, history = {}, []
+    # Only pool workers read the shared panel: a single worker loads from storage
+    with (panel.publish(tickers) if workers > 1 else nullcontext()) as shared:
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_tuning_worker, initargs=(threads, shared.descriptor))
+        try:
+            for group in groups:
+                key = group[0] if scope == "ticker" else "__universe__"
+                for model in models:
+                    trial, rows = successive_halving(model, group, eta=eta, pool=pool, threads=threads,
+                                                     run_dir=TUNING_FOLDER, logger=logger)
+                    history.extend({"scope": key, **row} for row in rows)
+                    if not np.isfinite(trial["score"]):
+                        logger(f"❌ Tuning {model} failed for {key}: {trial.get('error')}")
+                        continue
+                    best.setdefault(key, {})[model] = trial["params"]
+                    if save:
+                        ticker = group[0] if scope == "ticker" else None
+                        versions = storage.data_versions(group)
+                        save_config(model, trial["params"], trial["score"], ticker, trials=len(grid(model)),
+                                    tickers=len(group), data_version=versions.get(ticker) if ticker else None)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    seconds = time.perf_counter() - start
+    return {
+        "message": f"Tuned {len(models)} models on {len(tickers)} tickers ({scope}) in {seconds:.1f}s",
+        "best": best,
+        "trials": pd.DataFrame(history),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search for the models.")
+    parser.add_argument("--tickers", nargs="*", help="tickers (default: all stored)")
+    parser.add_argument("--models", nargs="*", choices=list(SEARCH_SPACES), default=list(SEARCH_SPACES))
+    parser.add_argument("--scope", choices=["ticker", "universe"], default="ticker",
+                        help="save a config per ticker or one for the whole universe")
+    parser.add_argument("--eta", type=int, default=3, help="keep the best 1/eta trials at each rung")
+    parser.add_argument("--workers", type=int, help="parallel trials (default: one per core)")
+    parser.add_argument("--no-save", action="store_true", help="report the winners without saving them")
+    args = parser.parse_args()
+    result = tune(args.models, args.tickers, args.scope, args.eta, args.workers, save=not args.no_save)
+    print(result["message"])
+    for key, params in result["best"].items():
+        print(f"{key}: {params}")
+
+
+if __name__ == "__main__":
+    main()
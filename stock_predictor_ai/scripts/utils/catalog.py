@@ -0,0 +1,163 @@
+# catalog.py
+"""
+SQLite index of the stored data, so listings, counts and staleness checks
+never scan the data folders.
+
+- stocks: one row per (backend, ticker) with row count, first/last date,
+  checksum of the stored arrays and last-update time. Appends only bump the
+  row count and last date and clear the checksum; verify() fills it in again.
+- raw_files: the raw download snapshots in data/raw.
+- indexed: which of the above have been filled from a full scan once.
+
+The storage helpers keep it up to date on every write, append and delete.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '..', '..', '..'))
+DATA_DIR = os.environ.get("STOCK_DATA_DIR", os.path.join(BASE_DIR, 'data'))
+CATALOG_PATH = os.path.join(DATA_DIR, 'catalog.sqlite')
+
+# Bump when the schema changes; older catalogs are rebuilt from disk
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stocks (
+    backend    TEXT NOT NULL,
+    ticker     TEXT NOT NULL,
+    rows       INTEGER NOT NULL,
+    first_date TEXT,
+    last_date  TEXT,
+    checksum   TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (backend, ticker)
+);
+CREATE INDEX IF NOT EXISTS stocks_last_date ON stocks (backend, last_date);
+CREATE TABLE IF NOT EXISTS raw_files (
+    ticker   TEXT PRIMARY KEY,
+    bytes    INTEGER,
+    saved_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indexed (
+    name TEXT PRIMARY KEY
+);
+"""
+
+
+def connect():
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # The catalog is only an index of what's on disk: drop and rescan
+        conn.executescript("DROP TABLE IF EXISTS stocks; DROP TABLE IF EXISTS raw_files; DROP TABLE IF EXISTS indexed;")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _date_str(value):
+    return None if value is None else str(value)[:10]
+
+
+def record(ticker, rows, first_date, last_date, checksum=None, backend="npy"):
+    """Insert or replace the entry for `ticker` in `backend`."""
+    with connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO stocks (backend, ticker, rows, first_date, last_date, checksum, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (backend, ticker, int(rows), _date_str(first_date), _date_str(last_date), checksum,
+             datetime.now().isoformat()),
+        )
+
+
+def extend(ticker, added, last_date, first_date=None, backend="npy"):
+    """Account for `added` rows appended to `ticker`; False if it has no entry."""
+    with connect() as conn:
+        cur = conn.execute(
+            "UPDATE stocks SET rows = rows + ?, first_date = COALESCE(first_date, ?), last_date = ?, "
+            "checksum = NULL, updated_at = ? WHERE backend = ? AND ticker = ?",
+            (int(added), _date_str(first_date), _date_str(last_date), datetime.now().isoformat(), backend, ticker),
+        )
+    return cur.rowcount > 0
+
+
+def set_checksum(ticker, checksum, backend="npy"):
+    """Store the checksum of `ticker`'s arrays without touching its update time."""
+    with connect() as conn:
+        conn.execute("UPDATE stocks SET checksum = ? WHERE backend = ? AND ticker = ?", (checksum, backend, ticker))
+
+
+def remove(ticker, backend="npy"):
+    with connect() as conn:
+        conn.execute("DELETE FROM stocks WHERE backend = ? AND ticker = ?", (backend, ticker))
+
+
+def get(ticker, backend="npy"):
+    """Entry for `ticker` as a dict, or None."""
+    with connect() as conn:
+        row = conn.execute("SELECT * FROM stocks WHERE backend = ? AND ticker = ?", (backend, ticker)).fetchone()
+    return dict(row) if row else None
+
+
+def entries(backend="npy"):
+    """{ticker: entry dict} for every ticker in `backend`, in one query."""
+    with connect() as conn:
+        return {r["ticker"]: dict(r) for r in conn.execute("SELECT * FROM stocks WHERE backend = ?", (backend,))}
+
+
+def tickers(backend="npy"):
+    """Sorted tickers stored in `backend`."""
+    with connect() as conn:
+        return [r[0] for r in conn.execute("SELECT ticker FROM stocks WHERE backend = ? ORDER BY ticker", (backend,))]
+
+
+def count(backend="npy"):
+    with connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM stocks WHERE backend = ?", (backend,)).fetchone()[0]
+
+
+def last_dates(backend="npy"):
+    """{ticker: 'YYYY-MM-DD'} for every indexed ticker."""
+    with connect() as conn:
+        return {r["ticker"]: r["last_date"]
+                for r in conn.execute("SELECT ticker, last_date FROM stocks WHERE backend = ?", (backend,))}
+
+
+def stale(before, backend="npy"):
+    """Tickers whose last stored date is earlier than `before` (oldest first)."""
+    with connect() as conn:
+        return [r[0] for r in conn.execute(
+            "SELECT ticker FROM stocks WHERE backend = ? AND last_date < ? ORDER BY last_date, ticker",
+            (backend, _date_str(before)),
+        )]
+
+
+def record_raw(ticker, size=None):
+    with connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO raw_files (ticker, bytes, saved_at) VALUES (?, ?, ?)",
+                     (ticker, size, datetime.now().isoformat()))
+
+
+def remove_raw(ticker):
+    with connect() as conn:
+        conn.execute("DELETE FROM raw_files WHERE ticker = ?", (ticker,))
+
+
+def raw_tickers():
+    with connect() as conn:
+        return [r[0] for r in conn.execute("SELECT ticker FROM raw_files ORDER BY ticker")]
+
+
+def is_indexed(name):
+    with connect() as conn:
+        return conn.execute("SELECT 1 FROM indexed WHERE name = ?", (name,)).fetchone() is not None
+
+
+def mark_indexed(name, indexed=True):
+    with connect() as conn:
+        if indexed:
+            conn.execute("INSERT OR IGNORE INTO indexed (name) VALUES (?)", (name,))
+        else:
+            conn.execute("DELETE FROM indexed WHERE name = ?", (name,))
@@ -1,40 +1,70 @@
 import os
 import random
-import requests
 import pandas as pd
-import yfinance as yf
-from scripts.data_collection_clean_delete_update.clean_data import clean_data_auto_single
+from scripts.data_collection_clean_delete_update.clean_data import clean_frame
+from scripts.utils import storage, timing, intraday
+from scripts.utils.downloader import download_many
+from scripts.utils.universe import get_sp500_tickers
+from scripts.data_collection_clean_delete_update.stock_update import update_stocks as incremental_update
 
 # ----------------------
 # GLOBAL FOLDERS
 # ----------------------
-BASE_DIR = os.path.abspath(os.path.join(__file__, '..', '..', '..'))
-RAW_FOLDER = os.path.join(BASE_DIR, 'data', 'raw')
-CLEANED_FOLDER = os.path.join(BASE_DIR, 'data', 'cleaned')
-os.makedirs(RAW_FOLDER, exist_ok=True)
-os.makedirs(CLEANED_FOLDER, exist_ok=True)
+BASE_DIR = storage.BASE_DIR
+RAW_FOLDER = storage.RAW_FOLDER
+CLEANED_FOLDER = storage.CLEANED_FOLDER
+
+# Keep a CSV snapshot of every download in data/raw (STOCK_RAW_SNAPSHOT=0 to skip)
+RAW_SNAPSHOT = os.environ.get("STOCK_RAW_SNAPSHOT", "1") != "0"
+
+
+def _clean_and_store(t, df):
+    """Clean a downloaded frame in memory and hand it to the configured storage backend."""
+    with timing.stage("clean"):
+        cleaned = clean_frame(df)
+    with timing.stage("store"):
+        storage.save_stock(t, cleaned)
+
+
+def _save_and_clean(logger, raw_snapshot=RAW_SNAPSHOT, interval=intraday.DAILY):
+    """Per-ticker stage for the download engine: optional raw snapshot, then clean + store."""
+    def process(t, df):
+        if intraday.is_intraday(interval):
+            # Intraday bars go to the partitioned store; no raw snapshot at this volume
+            with timing.stage("clean"):
+                cleaned = clean_frame(df)
+            with timing.stage("store"):
+                intraday.save_bars(t, interval, cleaned)
+            logger(f"Saved {len(cleaned)} {interval} bars for {t}.")
+            return
+        if raw_snapshot:
+            with timing.stage("raw"):
+                storage.save_raw(t, df)
+            logger(f"Saved {t} to raw folder.")
+        _clean_and_store(t, df)
+        logger(f"Cleaned {t} and saved to cleaned folder.")
+    return process
 
 # ----------------------
 # FETCH STOCKS
 # ----------------------
-def fetch_stocks(choice="random_100", ticker=None, num=None, min_num=None, max_num=None, logger=None):
+@timing.timed(ticker=False)
+def fetch_stocks(choice="random_100", ticker=None, num=None, min_num=None, max_num=None, logger=None,
+                 download_fn=None, max_workers=4, group_size=20, raw_snapshot=RAW_SNAPSHOT, interval=intraday.DAILY):
+    """
+    Download and store new tickers. With an intraday `interval` ("1m", "5m",
+    "1h", ...) the bars go to the partitioned intraday store instead, for as
+    much history as the provider serves at that interval.
+    """
     if logger is None:
         logger = print
+    bars = intraday.is_intraday(interval)
 
-    # --- Get S&P500 tickers dynamically ---
-        # --- Get S&P500 tickers dynamically (Wikipedia fallback) ---
-    try:
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        headers = {"User-Agent": "Mozilla/5.0"}
-        sp500_df = pd.read_html(requests.get(url, headers=headers).text)[0]
-        sp500_tickers = [t.replace('.', '-') for t in sp500_df['Symbol'].tolist()]
-        logger(f"✅ Fetched {len(sp500_tickers)} tickers from Wikipedia.")
-    except Exception as e:
-        logger(f"⚠️ Failed to fetch S&P 500 tickers from Wikipedia: {e}")
-        sp500_tickers = []
+    # --- S&P500 tickers (cached list; no lookup needed for a single ticker) ---
+    with timing.stage("universe"):
+        sp500_tickers = [] if choice == "single" else get_sp500_tickers(logger=logger)
 
-
-    existing = [f.replace('.csv','') for f in os.listdir(RAW_FOLDER) if f.endswith('.csv')]
+    existing = set(intraday.list_tickers(interval)) if bars else set(storage.list_raw()) | set(storage.list_stocks())
     available = [t for t in sp500_tickers if t not in existing]
 
     # ---------- Choose tickers ----------
@@ -57,57 +87,40 @@ def fetch_stocks(choice="random_100", ticker=None, num=None, min_num=None, max_n
     logger(f"Downloading {len(tickers_to_download)} stocks...")
 
     # ---------- Download & clean ----------
-    for t in tickers_to_download:
-        try:
-            df = yf.download(t, period="2y")
-            if not df.empty:
-                raw_file_path = os.path.join(RAW_FOLDER, f"{t}.csv")
-                df.to_csv(raw_file_path)
-                logger(f"Saved {t} to raw folder.")
-                try:
-                    clean_data_auto_single(raw_file_path, CLEANED_FOLDER)
-                    logger(f"Cleaned {t} and saved to cleaned folder.")
-                except Exception as e:
-                    logger(f"❌ Cleaning failed for {t}: {e}")
-        except Exception as e:
-            logger(f"Failed to download {t}: {e}")
-
-    return {"message": f"{len(tickers_to_download)} stocks downloaded and cleaned successfully."}
+    with timing.stage("download"):
+        stats = download_many(tickers_to_download, _save_and_clean(logger, raw_snapshot, interval),
+                              download_fn=download_fn, max_workers=max_workers, group_size=group_size, logger=logger,
+                              period=intraday.PERIODS[interval] if bars else "2y", interval=interval)
+
+    return {
+        "message": f"{len(stats['processed'])} stocks downloaded and cleaned successfully "
+                   f"({stats['tickers_per_sec']:.2f} tickers/sec).",
+        "failed": stats["failed"],
+        "tickers_per_sec": stats["tickers_per_sec"],
+    }
 
 
 # ----------------------
 # UPDATE STOCKS
 # ----------------------
-def update_stocks(logger=None):
+@timing.timed(ticker=False)
+def update_stocks(logger=None, download_fn=None, max_workers=4, group_size=20, interval=intraday.DAILY):
+    """Append only the bars missing since each stored ticker's last Date (or last `interval` bar)."""
     if logger is None:
         logger = print
 
-    files = [f for f in os.listdir(RAW_FOLDER) if f.endswith(".csv")]
-    if not files:
-        return {"message": "No raw CSV files found to update."}
-
-    for f in files:
-        t = f.replace(".csv", "")
-        try:
-            df = yf.download(t, period="2y")
-            if not df.empty:
-                raw_file_path = os.path.join(RAW_FOLDER, f)
-                df.to_csv(raw_file_path)
-                logger(f"Updated {t} in raw folder.")
-                try:
-                    clean_data_auto_single(raw_file_path, CLEANED_FOLDER)
-                    logger(f"Cleaned {t} and saved to cleaned folder.")
-                except Exception as e:
-                    logger(f"❌ Cleaning failed for {t}: {e}")
-        except Exception as e:
-            logger(f"Failed to update {t}: {e}")
-
-    return {"message": f"{len(files)} stocks updated and cleaned successfully."}
+    stored = intraday.list_tickers(interval) if intraday.is_intraday(interval) else storage.list_stocks()
+    if not stored:
+        return {"message": "No stored stocks found to update."}
+
+    return incremental_update(logger=logger, download_fn=download_fn,
+                              max_workers=max_workers, group_size=group_size, interval=interval)
 
 
 # ----------------------
 # DELETE STOCKS
 # ----------------------
+@timing.timed(ticker=False)
 def delete_stocks(tickers=None, random_count=None, logger=None):
     if logger is None:
         logger = print
@@ -117,41 +130,63 @@ def delete_stocks(tickers=None, random_count=None, logger=None):
     # Delete by tickers
     if tickers:
         for t in tickers:
-            for folder in [RAW_FOLDER, CLEANED_FOLDER]:
-                file_path = os.path.join(folder, f"{t}.csv")
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    deleted_files.append(file_path)
-                    logger(f"Deleted {file_path}")
+            file_path = storage.delete_raw(t)
+            if file_path:
+                deleted_files.append(file_path)
+                logger(f"Deleted {file_path}")
+            if storage.delete_stock(t):
+                deleted_files.append(t)
+                logger(f"Deleted {t} from {storage.DEFAULT_BACKEND} storage")
+            if intraday.delete_bars(t):
+                deleted_files.append(f"{t} intraday")
+                logger(f"Deleted {t} intraday bars")
 
     # Delete random count
     elif random_count:
-        all_files = [f for f in os.listdir(RAW_FOLDER) if f.endswith(".csv")]
-        if not all_files:
-            logger("No CSV files found to delete.")
-            return {"message": "No CSV files found to delete."}
-
-        chosen_files = random.sample(all_files, min(random_count, len(all_files)))
-        for f in chosen_files:
-            for folder in [RAW_FOLDER, CLEANED_FOLDER]:
-                file_path = os.path.join(folder, f)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    deleted_files.append(file_path)
-                    logger(f"Deleted {file_path}")
+        all_tickers = sorted(set(storage.list_raw()) | set(storage.list_stocks()))
+        if not all_tickers:
+            logger("No stored stocks found to delete.")
+            return {"message": "No stored stocks found to delete."}
+
+        for t in random.sample(all_tickers, min(random_count, len(all_tickers))):
+            file_path = storage.delete_raw(t)
+            if file_path:
+                deleted_files.append(file_path)
+                logger(f"Deleted {file_path}")
+            if storage.delete_stock(t):
+                deleted_files.append(t)
+                logger(f"Deleted {t} from {storage.DEFAULT_BACKEND} storage")
+            if intraday.delete_bars(t):
+                deleted_files.append(f"{t} intraday")
+                logger(f"Deleted {t} intraday bars")
 
     return {"message": f"Deleted {len(deleted_files)} files."}
 
 
+# ----------------------
+# LOAD STOCK
+# ----------------------
+def load_stock(ticker):
+    """Cleaned frame for `ticker` from the configured backend (None if missing)."""
+    return storage.load_stock(ticker)
+
+
 # ----------------------
 # COUNT STOCKS
 # ----------------------
 def count_stocks():
-    raw_files = [f.replace(".csv","") for f in os.listdir(RAW_FOLDER) if f.endswith(".csv")]
-    cleaned_files = [f.replace(".csv","") for f in os.listdir(CLEANED_FOLDER) if f.endswith(".csv")]
+    """Counts and ticker lists, answered from the catalog (no folder scans)."""
+    raw_files = storage.list_raw()
+    cleaned_files = storage.list_stocks()
     return {
         "raw_stocks": len(raw_files),
         "cleaned_stocks": len(cleaned_files),
         "raw_tickers": raw_files,
         "cleaned_tickers": cleaned_files
     }
+
+
+def stale_stocks(max_age_days=1):
+    """Stored tickers whose last bar is older than `max_age_days` business days."""
+    cutoff = pd.Timestamp.today().normalize() - pd.offsets.BDay(max_age_days)
+    return storage.stale_stocks(cutoff)
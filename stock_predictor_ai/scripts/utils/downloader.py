@@ -0,0 +1,197 @@
+# downloader.py
+"""
+Concurrent bulk download engine.
+
+Tickers are grouped into multi-symbol requests that run on a bounded thread
+pool. Finished frames are handed to `process(ticker, df)` on the calling
+thread while the remaining groups are still downloading, so the clean/save
+stage overlaps the network stage and `logger` (e.g. st.write) is never called
+from a worker thread.
+"""
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from scripts.utils.jobs import report_progress
+
+DEFAULT_HOST = "query1.finance.yahoo.com"
+
+
+# ----------------------
+# PROVIDER
+# ----------------------
+def yf_download(tickers, **kwargs):
+    """Default provider: one multi-symbol yfinance request."""
+    import yfinance as yf
+    kwargs.setdefault("period", "2y")
+    return yf.download(tickers, group_by="column", progress=False, threads=False, **kwargs)
+
+
+yf_download.host = DEFAULT_HOST
+
+
+def split_download(df, tickers):
+    """
+    Split a multi-symbol download into {ticker: frame}. Each frame keeps the
+    (Price, Ticker) two-level columns of a single-ticker download, so the raw
+    CSV layout (and clean_data_auto_single) stays the same.
+    """
+    frames = {}
+    if df is None or df.empty:
+        return frames
+    if not isinstance(df.columns, pd.MultiIndex):
+        # Single ticker without the ticker level
+        df = df.copy()
+        df.columns = pd.MultiIndex.from_product([df.columns, [tickers[0]]], names=["Price", "Ticker"])
+    available = set(df.columns.get_level_values(1))
+    for t in tickers:
+        if t not in available:
+            continue
+        sub = df.loc[:, df.columns.get_level_values(1) == t].dropna(how="all")
+        if not sub.empty:
+            frames[t] = sub
+    return frames
+
+
+# ----------------------
+# RATE LIMIT
+# ----------------------
+class RateLimiter:
+    """Spaces out request starts so a host sees at most `rate` requests/sec."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host, rate):
+    """One shared limiter per host, so concurrent engines don't add up."""
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None or limiter.interval != (1.0 / rate if rate else 0.0):
+            limiter = _limiters[host] = RateLimiter(rate)
+        return limiter
+
+
+# ----------------------
+# ENGINE
+# ----------------------
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def download_many(tickers, process, download_fn=None, group_size=20, max_workers=4,
+                  retries=3, backoff=1.0, rate_limit=2.0, logger=None, **download_kwargs):
+    """
+    Download `tickers` concurrently and call `process(ticker, df)` for each one.
+
+    - download_fn(tickers, **download_kwargs) -> DataFrame, defaults to yfinance.
+      Set a `host` attribute on it to share a rate limit with other providers.
+    - group_size: tickers per multi-symbol request
+    - max_workers: concurrent requests
+    - retries/backoff: attempts per group, sleeping backoff * 2**attempt (+ jitter)
+    - rate_limit: max requests/sec per host
+
+    Returns {"processed", "failed", "seconds", "tickers_per_sec"}.
+    """
+    if logger is None:
+        logger = print
+    if download_fn is None:
+        download_fn = yf_download
+
+    tickers = list(dict.fromkeys(tickers))
+    limiter = get_rate_limiter(getattr(download_fn, "host", DEFAULT_HOST), rate_limit)
+    events = queue.Queue(maxsize=max(2 * max_workers, 4))
+    stop = threading.Event()
+    processed, failed = [], {}
+    received_bytes = 0
+    start = time.perf_counter()
+
+    def fetch_group(group):
+        for attempt in range(retries):
+            if stop.is_set():
+                return
+            try:
+                limiter.wait()
+                df = download_fn(group if len(group) > 1 else group[0], **download_kwargs)
+                if df is None or df.empty:
+                    raise ValueError("empty response")
+                frames = split_download(df, group)
+                for t in group:
+                    if t in frames:
+                        events.put(("frame", t, frames[t]))
+                    else:
+                        events.put(("failed", t, "no data returned"))
+                return
+            except Exception as e:
+                if attempt + 1 < retries:
+                    delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+                    events.put(("log", f"⚠️ Retry {attempt + 1}/{retries - 1} for {', '.join(group)} in {delay:.1f}s: {e}", None))
+                    time.sleep(delay)
+                else:
+                    for t in group:
+                        events.put(("failed", t, str(e)))
+
+    groups = chunked(tickers, max(1, group_size))
+    pending = len(tickers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(fetch_group, group) for group in groups]
+
+        # Clean/save stage, overlapping with the downloads still in flight
+        try:
+            while pending:
+                kind, t, payload = events.get()
+                if kind == "log":
+                    logger(t)
+                    continue
+                pending -= 1
+                if kind == "failed":
+                    failed[t] = payload
+                    logger(f"Failed to download {t}: {payload}")
+                else:
+                    received_bytes += int(payload.memory_usage(index=True).sum())
+                    try:
+                        process(t, payload)
+                        processed.append(t)
+                    except Exception as e:
+                        failed[t] = str(e)
+                        logger(f"❌ Processing failed for {t}: {e}")
+                report_progress(logger, len(tickers) - pending, len(tickers),
+                                failed=len(failed), bytes=received_bytes)
+        except BaseException:
+            # Cancelled (or interrupted): stop the workers, unblocking any waiting on the queue
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    events.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            raise
+
+    seconds = time.perf_counter() - start
+    rate = len(processed) / seconds if seconds > 0 else 0.0
+    logger(f"⏱️ {len(processed)}/{len(tickers)} tickers in {seconds:.1f}s ({rate:.2f} tickers/sec)")
+    return {
+        "processed": processed,
+        "failed": failed,
+        "seconds": seconds,
+        "tickers_per_sec": rate,
+    }
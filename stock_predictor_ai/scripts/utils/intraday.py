@@ -0,0 +1,340 @@
+# intraday.py
+"""
+Intraday bars, partitioned by ticker / interval / trading day:
+
+    intraday/<TICKER>/<interval>/<YYYY-MM-DD>/Date.npy, Close.npy, ...
+
+Each day is a columnar partition in the npy backend's layout. Appends only
+grow the newest day (or start the next ones), and a windowed read only opens
+the days that overlap the window. Timestamps are the exchange's wall-clock
+time (timezone dropped), so a partition is one trading session.
+
+An interval series is addressed as "<TICKER>@<interval>" (series_key()).
+storage.load_stock / load_arrays / data_version accept such keys, so the
+models, the feature cache and graph_plot run on intraday bars unchanged;
+a key for an interval that isn't stored is resampled on the fly from the
+coarsest stored interval that divides it:
+
+    from scripts.utils import intraday
+    intraday.load_bars("AAPL", "1m", start="2025-06-02 10:00", end="2025-06-02 11:00")
+    registry.predict("XGBoost", "AAPL@1h")    # 1h bars built from stored 1m / 5m / 30m bars
+
+The daily interval ("1d") stays in the regular storage backend.
+"""
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from scripts.utils import storage, catalog
+
+INTRADAY_FOLDER = os.path.join(storage.DATA_DIR, 'intraday')
+
+DAILY = "1d"
+SEPARATOR = storage.INTERVAL_SEPARATOR
+
+# Bar length in minutes (yfinance interval names)
+INTERVALS = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60, DAILY: 1440}
+
+# How much history yfinance serves per interval on the first download
+PERIODS = {"1m": "7d", "2m": "60d", "5m": "60d", "15m": "60d", "30m": "60d", "60m": "730d", "90m": "60d",
+           "1h": "730d"}
+
+# How each field is aggregated when resampling to a coarser interval
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Adj Close": "last",
+                "Volume": "sum"}
+
+
+def is_intraday(interval):
+    return interval is not None and interval != DAILY
+
+
+def _check(interval):
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval '{interval}'. Choose from {list(INTERVALS)}.")
+    return interval
+
+
+def _catalog_name(interval):
+    return f"intraday_{interval}"
+
+
+# ----------------------
+# SERIES KEYS
+# ----------------------
+def series_key(ticker, interval=None):
+    """'AAPL', '15m' -> 'AAPL@15m' (the daily series is just the ticker)."""
+    return f"{ticker}{SEPARATOR}{_check(interval)}" if is_intraday(interval) else ticker
+
+
+def split_key(key):
+    """'AAPL@15m' -> ('AAPL', '15m'); 'AAPL' -> ('AAPL', None)."""
+    ticker, _, interval = key.partition(SEPARATOR)
+    return ticker, (_check(interval) if interval else None)
+
+
+def is_series_key(key):
+    return SEPARATOR in key
+
+
+# ----------------------
+# PARTITIONS
+# ----------------------
+def _folder(ticker, interval):
+    return os.path.join(INTRADAY_FOLDER, ticker, interval)
+
+
+def _days(ticker, interval):
+    """Columnar store whose "tickers" are the day partitions of one series."""
+    return storage.NpyBackend(folder=_folder(ticker, interval))
+
+
+def partitions(ticker, interval):
+    """Sorted trading days ('YYYY-MM-DD') stored for `ticker` at `interval`."""
+    if not os.path.isdir(_folder(ticker, interval)):
+        return []
+    return _days(ticker, interval).list_tickers()
+
+
+def stored_intervals(ticker):
+    """Intervals with at least one stored partition for `ticker`."""
+    folder = os.path.join(INTRADAY_FOLDER, ticker)
+    if not os.path.isdir(folder):
+        return []
+    return sorted((i for i in os.listdir(folder) if i in INTERVALS and partitions(ticker, i)),
+                  key=INTERVALS.get)
+
+
+def _by_day(df):
+    day = pd.to_datetime(df['Date']).dt.strftime("%Y-%m-%d")
+    return [(d, rows) for d, rows in df.groupby(day, sort=True)]
+
+
+def _record(ticker, interval, rows, first, last):
+    catalog.record(ticker, rows, first, last, backend=_catalog_name(interval))
+
+
+def _index(ticker, interval):
+    """Refresh the catalog entry of one series from its partitions on disk."""
+    days = partitions(ticker, interval)
+    if not days:
+        catalog.remove(ticker, _catalog_name(interval))
+        return
+    store = _days(ticker, interval)
+    rows = sum(len(store.read_arrays(d)["Date"]) for d in days)
+    _record(ticker, interval, rows, days[0], store.read_arrays(days[-1])["Date"][-1])
+
+
+def _ensure_indexed(interval):
+    name = f"stocks:{_catalog_name(interval)}"
+    if not catalog.is_indexed(name):
+        if os.path.isdir(INTRADAY_FOLDER):
+            for t in os.listdir(INTRADAY_FOLDER):
+                if partitions(t, interval):
+                    _index(t, interval)
+        catalog.mark_indexed(name)
+
+
+# ----------------------
+# WRITE
+# ----------------------
+def save_bars(ticker, interval, df):
+    """Store cleaned bars (Date, Close_<T>, ...) as the whole `interval` series of `ticker`."""
+    _check(interval)
+    if os.path.isdir(_folder(ticker, interval)):
+        shutil.rmtree(_folder(ticker, interval))
+    df = df.sort_values('Date').drop_duplicates(subset='Date', keep='last')
+    store = _days(ticker, interval)
+    for day, rows in _by_day(df):
+        store.write(day, rows)
+    if df.empty:
+        catalog.remove(ticker, _catalog_name(interval))
+    else:
+        _record(ticker, interval, len(df), df['Date'].iloc[0], df['Date'].iloc[-1])
+    storage._changed(series_key(ticker, interval))
+
+
+def append_bars(ticker, interval, df):
+    """
+    Append bars from the last stored one on. Bars at or after the last
+    stored timestamp replace the stored ones, so a bar downloaded while it
+    was still forming is corrected by the next update. Only the newest
+    partition is written to: in place when every bar is new, rewritten when
+    its tail is replaced. Later days become new partitions.
+    """
+    _check(interval)
+    last = last_timestamp(ticker, interval)
+    if last is None:
+        return save_bars(ticker, interval, df)
+    df = df[pd.to_datetime(df['Date']) >= last].sort_values('Date').drop_duplicates(subset='Date', keep='last')
+    if df.empty:
+        return
+    newest = partitions(ticker, interval)[-1]
+    store = _days(ticker, interval)
+    replaced = 0
+    for day, rows in _by_day(df):
+        if day == newest and pd.Timestamp(rows['Date'].iloc[0]) <= last:
+            stored = store.read_arrays(day)
+            keep = stored["Date"] < np.datetime64(pd.Timestamp(rows['Date'].iloc[0]), "ns")
+            replaced = int(len(keep) - keep.sum())
+            kept = pd.DataFrame({col: np.asarray(stored['Date' if col == 'Date' else storage.split_column(col)[0]])[keep]
+                                 for col in rows.columns})
+            store.write(day, pd.concat([kept, rows], ignore_index=True))
+        elif day == newest:
+            store.append(day, rows)
+        else:
+            store.write(day, rows)
+    entry = catalog.get(ticker, _catalog_name(interval))
+    _record(ticker, interval, entry["rows"] - replaced + len(df), entry["first_date"], df['Date'].iloc[-1])
+    storage._changed(series_key(ticker, interval))
+
+
+def delete_bars(ticker, interval=None):
+    """Remove `ticker`'s bars at `interval` (default: every intraday interval). True if any existed."""
+    intervals = [interval] if interval else [i for i in INTERVALS if os.path.isdir(_folder(ticker, i))]
+    deleted = False
+    for i in intervals:
+        catalog.remove(ticker, _catalog_name(i))
+        if os.path.isdir(_folder(ticker, i)):
+            shutil.rmtree(_folder(ticker, i))
+            deleted = True
+        storage._changed(series_key(ticker, i))
+    folder = os.path.join(INTRADAY_FOLDER, ticker)
+    if os.path.isdir(folder) and not os.listdir(folder):
+        os.rmdir(folder)
+    return deleted
+
+
+# ----------------------
+# READ
+# ----------------------
+def list_tickers(interval):
+    """Sorted tickers with `interval` bars, answered from the catalog."""
+    _ensure_indexed(_check(interval))
+    return catalog.tickers(_catalog_name(interval))
+
+
+def last_timestamp(ticker, interval):
+    """Timestamp of the last stored bar (read from the newest partition), or None."""
+    days = partitions(ticker, interval)
+    if not days:
+        return None
+    return pd.Timestamp(_days(ticker, interval).read_arrays(days[-1])["Date"][-1])
+
+
+def data_version(ticker, interval):
+    _ensure_indexed(_check(interval))
+    entry = catalog.get(ticker, _catalog_name(interval))
+    if entry is None:
+        return None
+    return f"{entry['rows']}:{entry['last_date']}:{entry['updated_at']}"
+
+
+def load_bar_arrays(ticker, interval, start=None, end=None):
+    """
+    {"Date", <field>: array} of the bars in [start, end] (default: all), or
+    None if nothing is stored. Only the overlapping partitions are read.
+    """
+    days = partitions(ticker, interval)
+    if start is not None:
+        start = pd.Timestamp(start)
+        days = [d for d in days if d >= start.strftime("%Y-%m-%d")]
+    if end is not None:
+        end = pd.Timestamp(end)
+        days = [d for d in days if d <= end.strftime("%Y-%m-%d")]
+    if not days:
+        return None
+    store = _days(ticker, interval)
+    parts = [store.read_arrays(d) for d in days]
+    if len(parts) == 1:
+        arrays = dict(parts[0])
+    else:
+        arrays = {field: np.concatenate([p[field] for p in parts]) for field in parts[0]}
+
+    dates = arrays["Date"]
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "ns")))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "ns"), side="right"))
+    return {field: values[lo:hi] for field, values in arrays.items()}
+
+
+def load_bars(ticker, interval, start=None, end=None):
+    """Cleaned frame (Date, Close_<T>, ...) of the bars in [start, end], or None."""
+    return storage._frame(ticker, load_bar_arrays(ticker, interval, start, end))
+
+
+# ----------------------
+# RESAMPLING
+# ----------------------
+def _rule(interval):
+    return "1D" if interval == DAILY else f"{INTERVALS[_check(interval)]}min"
+
+
+def resample_arrays(arrays, interval):
+    """
+    OHLCV arrays aggregated to `interval` bars (first Open, max High, min Low,
+    last Close, summed Volume); bins without a bar are dropped. Bins are
+    anchored on the first bar, so sessions opening at :30 keep whole hours.
+    """
+    df = pd.DataFrame({f: np.asarray(v) for f, v in arrays.items() if f != "Date"},
+                      index=pd.DatetimeIndex(np.asarray(arrays["Date"])))
+    if df.empty:
+        return {"Date": np.asarray(arrays["Date"]), **{f: df[f].to_numpy() for f in df.columns}}
+    origin = "start_day" if interval == DAILY else "start"
+    bins = df.resample(_rule(interval), origin=origin)
+    out = bins.agg({f: AGGREGATIONS.get(f, "last") for f in df.columns})
+    out = out[bins.size() > 0]
+    resampled = {"Date": out.index.values.astype("datetime64[ns]")}
+    for f in df.columns:
+        resampled[f] = out[f].to_numpy().astype(np.asarray(arrays[f]).dtype, copy=False)
+    return resampled
+
+
+def resample_frame(df, interval):
+    """A cleaned frame (Date, Close_<T>, ...) resampled to `interval` bars."""
+    columns = [c for c in df.columns if c != 'Date']
+    arrays = {"Date": pd.to_datetime(df['Date']).values, **{c: df[c].to_numpy() for c in columns}}
+    fields = {c: storage.split_column(c)[0] for c in columns}
+    resampled = resample_arrays({"Date": arrays["Date"], **{fields[c]: arrays[c] for c in columns}}, interval)
+    return pd.DataFrame({"Date": resampled["Date"], **{c: resampled[fields[c]] for c in columns}})
+
+
+def _source(ticker, interval):
+    """Stored interval to build `interval` bars from: itself, or the coarsest one dividing it."""
+    stored = stored_intervals(ticker)
+    if interval in stored:
+        return interval
+    minutes = INTERVALS[interval]
+    usable = [i for i in stored if INTERVALS[i] < minutes and minutes % INTERVALS[i] == 0]
+    return usable[-1] if usable else None
+
+
+def series_arrays(key, start=None, end=None):
+    """{"Date", <field>: array} of series `key` ('AAPL@1h'), resampled if needed; None if unavailable."""
+    ticker, interval = split_key(key)
+    source = _source(ticker, interval)
+    if source is None:
+        return None
+    arrays = load_bar_arrays(ticker, source, start, end)
+    if arrays is None or source == interval:
+        return arrays
+    return resample_arrays(arrays, interval)
+
+
+def series_frame(key, start=None, end=None):
+    """Cleaned frame of series `key`, with columns named after the key (Close_AAPL@1h, ...)."""
+    return storage._frame(key, series_arrays(key, start, end))
+
+
+def series_version(key):
+    """Data version of series `key`: the version of the stored interval it is built from."""
+    ticker, interval = split_key(key)
+    source = _source(ticker, interval)
+    if source is None:
+        return None
+    version = data_version(ticker, source)
+    return None if version is None else f"{source}:{version}"
+
+
+def series_last(key):
+    ticker, interval = split_key(key)
+    source = _source(ticker, interval)
+    return None if source is None else last_timestamp(ticker, source)
@@ -0,0 +1,331 @@
+# jobs.py
+"""
+Background jobs for downloads, updates, deletes and predictions.
+
+Jobs are queued in a SQLite table (data/jobs.sqlite) and executed by a pool of
+worker threads, either inside the Streamlit process (start_workers) or in a
+separate one:
+
+    python -m scripts.utils.jobs --workers 2
+
+Each task is an existing data_manager / combine function called with a
+JobLogger as its `logger`. Plain messages are kept as the job's log; code that
+knows its progress calls report_progress(logger, done, total, bytes=...) and
+the job gets structured progress with an ETA. Cancelling a job makes its next
+log or progress call raise JobCancelled, which unwinds the task.
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import importlib
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from scripts.utils import storage
+
+JOBS_DB = os.path.join(storage.DATA_DIR, 'jobs.sqlite')
+MAX_LOG_LINES = 200
+
+# Job kind -> (module, function); params are passed as keyword arguments
+TASKS = {
+    "download": ("scripts.utils.data_manager", "fetch_stocks"),
+    "update": ("scripts.utils.data_manager", "update_stocks"),
+    "delete": ("scripts.utils.data_manager", "delete_stocks"),
+    "predict": ("scripts.models.ensemble.combine", "run_models"),
+}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    cancel      INTEGER NOT NULL DEFAULT 0,
+    progress    TEXT,
+    log         TEXT NOT NULL DEFAULT '[]',
+    result      TEXT,
+    error       TEXT,
+    worker_pid  INTEGER,
+    created_at  TEXT NOT NULL,
+    started_at  TEXT,
+    finished_at TEXT
+)
+"""
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a task when its job has been cancelled. Like
+    asyncio.CancelledError it isn't an Exception, so the tasks' per-ticker
+    `except Exception` handlers don't swallow it.
+    """
+
+
+def connect():
+    os.makedirs(os.path.dirname(JOBS_DB), exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _to_json(value):
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict("records")
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _row(row):
+    job = dict(row)
+    for field in ("params", "progress", "log", "result"):
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    job["cancel"] = bool(job["cancel"])
+    return job
+
+
+# ----------------------
+# QUEUE
+# ----------------------
+def submit(kind, **params):
+    """Queue a job and return its id."""
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind '{kind}'. Choose from {list(TASKS)}.")
+    with connect() as conn:
+        cur = conn.execute("INSERT INTO jobs (kind, params, status, created_at) VALUES (?, ?, ?, ?)",
+                           (kind, json.dumps(params), QUEUED, _now()))
+        return cur.lastrowid
+
+
+def get(job_id):
+    """Job as a dict (params, status, progress, log, result, ...), or None."""
+    with connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row(row) if row else None
+
+
+def list_jobs(limit=20, active_only=False):
+    """Most recent jobs first."""
+    query = "SELECT * FROM jobs"
+    if active_only:
+        query += f" WHERE status IN {ACTIVE}"
+    with connect() as conn:
+        return [_row(r) for r in conn.execute(query + " ORDER BY id DESC LIMIT ?", (limit,))]
+
+
+def cancel(job_id):
+    """Cancel a queued job now, or ask a running one to stop at its next checkpoint."""
+    with connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                     (CANCELLED, _now(), job_id, QUEUED))
+        conn.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+
+
+def _claim():
+    """Atomically move the oldest queued job to running; returns it or None."""
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        conn.execute("UPDATE jobs SET status = ?, started_at = ?, worker_pid = ? WHERE id = ?",
+                     (RUNNING, _now(), os.getpid(), row["id"]))
+        conn.commit()
+        return _row(row)
+    finally:
+        conn.close()
+
+
+def _finish(job_id, status, result=None, error=None):
+    with connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                     (status, None if result is None else json.dumps(result, default=_to_json),
+                      error, _now(), job_id))
+
+
+# Windows process query constants
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+_STILL_ACTIVE = 259
+_ERROR_ACCESS_DENIED = 5
+
+
+def _pid_alive_windows(pid):
+    # os.kill(pid, 0) would send CTRL_C_EVENT there: ask for the exit code instead
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access denied means the process exists; anything else, that it doesn't
+        return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == _STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        return _pid_alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def requeue_interrupted():
+    """Put jobs left 'running' by a process that has since exited back in the queue."""
+    with connect() as conn:
+        rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        for row in rows:
+            if row["worker_pid"] is None or not _pid_alive(row["worker_pid"]):
+                conn.execute("UPDATE jobs SET status = ?, cancel = 0 WHERE id = ?", (QUEUED, row["id"]))
+
+
+# ----------------------
+# PROGRESS
+# ----------------------
+class JobLogger:
+    """
+    `logger` handed to a task: calling it appends a log line, .progress()
+    records structured progress. Both raise JobCancelled once the job is cancelled.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.monotonic()
+
+    def _check_cancel(self, conn):
+        if conn.execute("SELECT cancel FROM jobs WHERE id = ?", (self.job_id,)).fetchone()[0]:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def __call__(self, message):
+        with connect() as conn:
+            log = json.loads(conn.execute("SELECT log FROM jobs WHERE id = ?", (self.job_id,)).fetchone()[0])
+            log = (log + [str(message)])[-MAX_LOG_LINES:]
+            conn.execute("UPDATE jobs SET log = ? WHERE id = ?", (json.dumps(log), self.job_id))
+        self._check_cancel(conn)
+
+    def progress(self, done, total, **info):
+        elapsed = time.monotonic() - self.started
+        eta = elapsed / done * (total - done) if done and total else None
+        progress = {"done": done, "total": total, "elapsed": round(elapsed, 1),
+                    "eta": None if eta is None else round(eta, 1), **info}
+        with connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), self.job_id))
+        self._check_cancel(conn)
+
+
+def report_progress(logger, done, total, **info):
+    """Forward progress to loggers that understand it (JobLogger); no-op for print / st.write."""
+    progress = getattr(logger, "progress", None)
+    if progress is not None:
+        progress(done, total, **info)
+
+
+# ----------------------
+# WORKERS
+# ----------------------
+def run_job(job):
+    """Execute one claimed job to completion, recording its outcome."""
+    module_name, func_name = TASKS[job["kind"]]
+    logger = JobLogger(job["id"])
+    try:
+        task = getattr(importlib.import_module(module_name), func_name)
+        result = task(**job["params"], logger=logger)
+        _finish(job["id"], DONE, result=result)
+    except JobCancelled:
+        _finish(job["id"], CANCELLED)
+    except Exception as e:
+        _finish(job["id"], FAILED, error=str(e))
+
+
+class JobRunner:
+    """Pool of worker threads that claim and run queued jobs."""
+
+    def __init__(self, workers=2, poll_interval=0.5):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = _claim()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            run_job(job)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def is_alive(self):
+        return any(t.is_alive() for t in self._threads)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def start_workers(workers=2):
+    """Start the in-process worker pool once (safe to call on every app rerun)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            requeue_interrupted()
+            _runner = JobRunner(workers).start()
+        return _runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued background jobs.")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    runner = start_workers(args.workers)
+    print(f"Job workers running ({args.workers}); Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        runner.stop(wait=False)
+
+
+if __name__ == "__main__":
+    main()
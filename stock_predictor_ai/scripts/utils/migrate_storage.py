@@ -0,0 +1,60 @@
+# migrate_storage.py
+"""
+Convert the existing CSV folders into another storage backend.
+
+    python -m scripts.utils.migrate_storage              # data/cleaned + data/raw -> npy
+    python -m scripts.utils.migrate_storage --to csv     # back to per-ticker CSVs
+"""
+import argparse
+from scripts.utils import storage
+from scripts.data_collection_clean_delete_update.clean_data import clean_data_auto_single
+
+
+def migrate(source="csv", target="npy", include_raw=True, delete_source=False, logger=None):
+    if logger is None:
+        logger = print
+    if source == target:
+        return {"message": "Source and target backend are the same, nothing to do."}
+
+    src = storage.get_backend(source)
+    migrated = []
+
+    for t in src.list_tickers():
+        try:
+            storage.save_stock(t, src.read(t), backend=target)
+            migrated.append(t)
+            if delete_source:
+                storage.delete_stock(t, backend=source)
+            logger(f"Migrated {t} ({source} -> {target})")
+        except Exception as e:
+            logger(f"❌ Migration failed for {t}: {e}")
+
+    # Raw downloads that were never cleaned
+    if include_raw:
+        for t in storage.list_raw():
+            if storage.has_stock(t, backend=target):
+                continue
+            try:
+                df = clean_data_auto_single(storage.raw_path(t), storage.CLEANED_FOLDER, save=False)
+                storage.save_stock(t, df, backend=target)
+                migrated.append(t)
+                logger(f"Cleaned and migrated raw {t} -> {target}")
+            except Exception as e:
+                logger(f"❌ Migration failed for raw {t}: {e}")
+
+    return {"message": f"{len(migrated)} stocks migrated to {target} storage."}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored stock data between storage backends.")
+    parser.add_argument("--from", dest="source", default="csv", choices=list(storage.BACKENDS))
+    parser.add_argument("--to", dest="target", default="npy", choices=list(storage.BACKENDS))
+    parser.add_argument("--skip-raw", action="store_true", help="don't clean/migrate files only present in data/raw")
+    parser.add_argument("--delete-source", action="store_true", help="remove each ticker from the source backend after copying")
+    args = parser.parse_args()
+    result = migrate(args.source, args.target, include_raw=not args.skip_raw, delete_source=args.delete_source)
+    print(result["message"])
+
+
+if __name__ == "__main__":
+    main()
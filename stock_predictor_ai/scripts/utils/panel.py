@@ -0,0 +1,332 @@
+# panel.py
+"""
+Aligned price panel: every stored ticker in one float32 array.
+
+    values (tickers, dates, fields)   float32, NaN where a ticker has no row
+    mask   (tickers, dates)           True where the ticker has a row
+    dates  (dates,)                   datetime64[ns], the union of all tickers' dates
+
+build_panel() stacks the stored arrays on the shared date grid (kept in
+memory per data version). publish() stacks them straight into one
+multiprocessing.shared_memory block; its `descriptor` is a small picklable
+dict, and attach(descriptor) in another process maps the same block without
+copying. install() makes storage.load_stock / load_arrays read the panel's
+tickers from it while their data version is unchanged, so pool workers
+running the per-ticker models never parse their own copy.
+
+    from scripts.utils import panel
+    with panel.publish() as shared:                  # parent
+        pool.submit(..., shared.descriptor)
+    panel.install(panel.attach(descriptor))          # worker
+
+    p = panel.build_panel()
+    p.select(["AAPL", "MSFT"], start="2024-01-01").field("Close")   # (2, dates)
+
+Volume is held as float32 as well (exact up to 2**24 shares a day).
+"""
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from scripts.utils import storage
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# Byte alignment of the arrays inside a shared block
+_ALIGN = 64
+
+# Last built panel per (backend, fields), reused while no ticker's data changed
+_built = {}
+_lock = threading.Lock()
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _layout(T, D, F):
+    """Byte offsets of values, mask and dates in a shared block, and its size."""
+    values_at = 0
+    mask_at = _aligned(values_at + T * D * F * 4)
+    dates_at = _aligned(mask_at + T * D)
+    return values_at, mask_at, dates_at, max(1, dates_at + D * 8)
+
+
+def _open_shared(name):
+    try:
+        # Python 3.13+: an attaching process must not unlink the block at exit
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Older versions: spawned pool workers share the parent's resource
+        # tracker, which only unlinks the block if the owner never does
+        return shared_memory.SharedMemory(name=name)
+
+
+class PricePanel:
+    """
+    Tickers x dates x fields price array. Slices returned by field() and date
+    ranges of select() are views: don't modify them.
+    """
+
+    def __init__(self, tickers, dates, values, mask, fields=FIELDS, versions=None, backend=None, shm=None,
+                 owner=False):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.values = values
+        self.mask = mask
+        self.fields = tuple(fields)
+        self.versions = dict(versions or {})
+        self.backend = backend
+        self._shm = shm
+        self._owner = owner
+        self._rows = {t: i for i, t in enumerate(self.tickers)}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._rows
+
+    def __repr__(self):
+        span = f"{self.dates[0]}..{self.dates[-1]}" if len(self.dates) else "empty"
+        return f"<PricePanel {len(self.tickers)} tickers x {len(self.dates)} dates ({span}) x {self.fields}>"
+
+    @property
+    def shared(self):
+        return self._shm is not None
+
+    # ----------------------
+    # SLICING
+    # ----------------------
+    def date_slice(self, start=None, end=None):
+        """Grid positions of the dates in [start, end] as a slice."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "ns")))
+        hi = len(self.dates) if end is None else int(
+            np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), "ns"), side="right"))
+        return slice(lo, hi)
+
+    def field(self, name):
+        """(tickers, dates) view of one field."""
+        if name not in self.fields:
+            raise KeyError(f"Field '{name}' not in panel {self.fields}.")
+        return self.values[:, :, self.fields.index(name)]
+
+    def select(self, tickers=None, start=None, end=None, fields=None):
+        """
+        Sub-panel of `tickers` (missing ones are skipped), dates in
+        [start, end] and `fields`. A date range alone is a view; picking
+        tickers or fields copies just the selected block.
+        """
+        dates = self.date_slice(start, end)
+        values, mask = self.values[:, dates], self.mask[:, dates]
+        names = self.tickers
+        if tickers is not None:
+            names = [t for t in tickers if t in self._rows]
+            rows = [self._rows[t] for t in names]
+            values, mask = values[rows], mask[rows]
+        if fields is not None:
+            values = values[:, :, [self.fields.index(f) for f in fields]]
+        return PricePanel(names, self.dates[dates], values, mask, fields or self.fields,
+                          {t: self.versions[t] for t in names if t in self.versions}, self.backend)
+
+    def read_arrays(self, ticker):
+        """
+        {"Date", <field>: array} for `ticker`'s own rows, like storage.load_arrays
+        (views when its rows are contiguous on the grid), or None if the ticker
+        isn't in the panel.
+        """
+        i = self._rows.get(ticker)
+        if i is None:
+            return None
+        present = self.mask[i]
+        positions = np.flatnonzero(present)
+        if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+            rows = slice(positions[0], positions[-1] + 1)
+        else:
+            rows = positions
+        # Same field order as the npy backend
+        arrays = {"Date": self.dates[rows]}
+        for name in sorted(self.fields):
+            arrays[name] = self.values[i, rows, self.fields.index(name)]
+        return arrays
+
+    def frame(self, ticker):
+        """Cleaned frame (Date, Close_<T>, ...) for `ticker` like storage.load_stock, or None."""
+        return storage._frame(ticker, self.read_arrays(ticker))
+
+    # ----------------------
+    # SHARED MEMORY
+    # ----------------------
+    @property
+    def descriptor(self):
+        """Picklable handle for attach() (shared panels only)."""
+        if self._shm is None:
+            raise ValueError("Panel isn't in shared memory; publish() it first.")
+        return {"name": self._shm.name, "tickers": self.tickers, "fields": self.fields,
+                "dates": len(self.dates), "versions": self.versions, "backend": self.backend}
+
+    def share(self):
+        """Copy of this panel in a new shared memory block, owned by the caller."""
+        T, D, F = self.values.shape
+        shm = shared_memory.SharedMemory(create=True, size=_layout(T, D, F)[-1])
+        shared = _from_buffer(shm, self.tickers, D, self.fields, self.versions, self.backend, owner=True)
+        shared.values[...] = self.values
+        shared.mask[...] = self.mask
+        shared.dates[...] = self.dates
+        return shared
+
+    def close(self):
+        """Detach from the shared block (the owner also frees it)."""
+        if self._shm is None:
+            return
+        shm, owner = self._shm, self._owner
+        self.values = self.mask = self.dates = None
+        self._shm = None
+        try:
+            shm.close()
+        except BufferError:
+            pass  # views handed out are still alive; the mapping goes with them
+        if owner:
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _from_buffer(shm, tickers, D, fields, versions, backend, owner=False):
+    T, F = len(tickers), len(fields)
+    values_at, mask_at, dates_at, _ = _layout(T, D, F)
+    values = np.ndarray((T, D, F), dtype=np.float32, buffer=shm.buf, offset=values_at)
+    mask = np.ndarray((T, D), dtype=bool, buffer=shm.buf, offset=mask_at)
+    dates = np.ndarray((D,), dtype="datetime64[ns]", buffer=shm.buf, offset=dates_at)
+    return PricePanel(tickers, dates, values, mask, fields, versions, backend, shm=shm, owner=owner)
+
+
+def attach(descriptor):
+    """The shared panel behind `descriptor`, mapped without copying."""
+    shm = _open_shared(descriptor["name"])
+    return _from_buffer(shm, descriptor["tickers"], descriptor["dates"], descriptor["fields"],
+                        descriptor["versions"], descriptor["backend"])
+
+
+# ----------------------
+# BUILDING
+# ----------------------
+def _stack(tickers, versions, fields, backend, shared=False):
+    """Stack the stored arrays on the union date grid; `shared` builds it in a new shared block."""
+    loaded = []
+    for t in tickers:
+        arrays = storage.load_arrays(t, backend)
+        if arrays is not None and len(arrays["Date"]):
+            loaded.append((t, arrays))
+
+    dates = (np.unique(np.concatenate([np.asarray(a["Date"]) for _, a in loaded])).astype("datetime64[ns]")
+             if loaded else np.array([], dtype="datetime64[ns]"))
+    names = [t for t, _ in loaded]
+    versions = {t: versions[t] for t in names}
+    T, D, F = len(loaded), len(dates), len(fields)
+    if shared:
+        shm = shared_memory.SharedMemory(create=True, size=_layout(T, D, F)[-1])
+        built = _from_buffer(shm, names, D, fields, versions, backend, owner=True)
+        built.values.fill(np.nan)
+        built.mask.fill(False)
+        built.dates[...] = dates
+    else:
+        built = PricePanel(names, dates, np.full((T, D, F), np.nan, dtype=np.float32),
+                           np.zeros((T, D), dtype=bool), fields, versions, backend)
+    try:
+        for i, (_, arrays) in enumerate(loaded):
+            pos = np.searchsorted(dates, np.asarray(arrays["Date"]))
+            built.mask[i, pos] = True
+            for j, name in enumerate(fields):
+                if name in arrays:
+                    built.values[i, pos, j] = arrays[name]
+    except BaseException:
+        built.close()
+        raise
+    return built
+
+
+def _stored(tickers, backend):
+    """(backend name, {ticker: data version}, stored tickers in order) for `tickers`."""
+    backend = storage.get_backend(backend).name
+    versions = storage.data_versions(tickers, backend)
+    names = sorted(versions) if tickers is None else [t for t in tickers if t in versions]
+    return backend, versions, names
+
+
+def build_panel(tickers=None, fields=FIELDS, backend=None):
+    """
+    PricePanel of `tickers` (default: every stored ticker); unstored tickers
+    are skipped. Rebuilt only when a ticker's data version changes.
+    """
+    backend, versions, names = _stored(tickers, backend)
+    fields = tuple(fields)
+    key = (backend, fields)
+    with _lock:
+        cached = _built.get(key)
+        if cached is not None and cached.tickers == names and all(cached.versions.get(t) == versions[t]
+                                                                    for t in names):
+            return cached
+    built = _stack(names, versions, fields, backend)
+    with _lock:
+        _built[key] = built
+    return built
+
+
+def publish(tickers=None, fields=FIELDS, backend=None):
+    """
+    Panel of `tickers` stacked straight into a new shared memory block. It is
+    not kept in build_panel()'s cache, so the publishing process holds the
+    universe once. The caller owns the block: use it as a context manager
+    (or close() it) to free it.
+    """
+    backend, versions, names = _stored(tickers, backend)
+    return _stack(names, versions, tuple(fields), backend, shared=True)
+
+
+def clear_panels():
+    """Drop the in-memory built panels."""
+    with _lock:
+        _built.clear()
+
+
+# ----------------------
+# STORAGE READ-THROUGH
+# ----------------------
+_installed = None
+
+
+class _Reader:
+    """storage shared reader: serves a panel's tickers while their version is current."""
+
+    def __init__(self, panel):
+        self.panel = panel
+
+    def read_arrays(self, ticker, backend):
+        panel = self.panel
+        if ticker not in panel or backend.name != panel.backend:
+            return None
+        if storage.data_version(ticker, backend.name) != panel.versions.get(ticker):
+            return None  # rewritten since the panel was built
+        return panel.read_arrays(ticker)
+
+
+def install(panel):
+    """Serve storage reads of `panel`'s tickers from it in this process (None to stop)."""
+    global _installed
+    _installed = panel
+    storage.set_shared_reader(_Reader(panel) if panel is not None else None)
+
+
+def installed():
+    return _installed
+
+
+def init_worker(descriptor):
+    """Pool initializer: attach the published panel and read from it."""
+    install(attach(descriptor))
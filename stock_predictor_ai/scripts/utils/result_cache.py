@@ -0,0 +1,96 @@
+# result_cache.py
+"""
+In-memory results keyed on each ticker's data version.
+
+Loaded frames, rendered charts and model outputs are stored under
+(kind, ticker, data version, args), so they are reused across Streamlit reruns
+and CLI calls until the ticker's stored data changes. A write through
+scripts.utils.storage changes the version and also drops the ticker's entries
+right away; memory is bounded with LRU eviction (STOCK_RESULT_CACHE_SIZE).
+
+    from scripts.utils import result_cache
+    df = result_cache.load_frame("AAPL")
+    chart = result_cache.cached("chart")(graph_plot.plot_stock_graph)("AAPL")
+"""
+import os
+import threading
+import functools
+from collections import OrderedDict
+from scripts.utils import storage
+
+MAX_ENTRIES = int(os.environ.get("STOCK_RESULT_CACHE_SIZE", 256))
+
+MISSING = object()
+
+
+class ResultCache:
+    """Thread-safe LRU of results keyed by (kind, ticker, data version, args)."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, ticker, version, args=()):
+        """Cached value, or MISSING."""
+        key = (kind, ticker, version, args)
+        with self._lock:
+            if key not in self._entries:
+                return MISSING
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, kind, ticker, version, value, args=()):
+        with self._lock:
+            self._entries[(kind, ticker, version, args)] = value
+            self._entries.move_to_end((kind, ticker, version, args))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ticker=None, kind=None):
+        """Drop the entries for `ticker` and/or `kind` (everything by default)."""
+        with self._lock:
+            for key in [k for k in self._entries
+                        if (ticker is None or k[1] == ticker) and (kind is None or k[0] == kind)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cached(self, kind, copy=None):
+        """
+        Decorator for functions whose first argument is a ticker. Results are
+        reused while the ticker's data version is unchanged; `copy` is applied
+        to every returned value so callers can't modify the cached one.
+        Nothing is cached for tickers that aren't stored.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(ticker, *args, **kwargs):
+                version = storage.data_version(ticker)
+                if version is None:
+                    return func(ticker, *args, **kwargs)
+                call_args = (args, tuple(sorted(kwargs.items())))
+                value = self.get(kind, ticker, version, call_args)
+                if value is MISSING:
+                    value = func(ticker, *args, **kwargs)
+                    if value is not None:
+                        self.put(kind, ticker, version, value, call_args)
+                return copy(value) if copy is not None and value is not None else value
+            return wrapper
+        return decorator
+
+
+_cache = ResultCache()
+storage.on_change(_cache.invalidate)
+
+get = _cache.get
+put = _cache.put
+invalidate = _cache.invalidate
+cached = _cache.cached
+
+
+@cached("frame", copy=lambda df: df.copy())
+def load_frame(ticker):
+    """Cleaned frame for `ticker` (a private copy), parsed once per data version."""
+    return storage.load_stock(ticker)
@@ -0,0 +1,557 @@
+import io
+import os
+import hashlib
+import shutil
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from scripts.utils import catalog
+
+# ----------------------
+# GLOBAL FOLDERS
+# ----------------------
+BASE_DIR = os.path.abspath(os.path.join(__file__, '..', '..', '..'))
+DATA_DIR = os.environ.get("STOCK_DATA_DIR", os.path.join(BASE_DIR, 'data'))
+RAW_FOLDER = os.path.join(DATA_DIR, 'raw')
+CLEANED_FOLDER = os.path.join(DATA_DIR, 'cleaned')
+COLUMNAR_FOLDER = os.path.join(DATA_DIR, 'columnar')
+os.makedirs(RAW_FOLDER, exist_ok=True)
+os.makedirs(CLEANED_FOLDER, exist_ok=True)
+
+
+def _default_backend():
+    """
+    STOCK_STORAGE_BACKEND if set, else "npy". An install whose data is still
+    only in data/cleaned/*.csv (not migrated yet) keeps reading it: "csv".
+    """
+    name = os.environ.get("STOCK_STORAGE_BACKEND")
+    if name:
+        return name
+    with os.scandir(CLEANED_FOLDER) as entries:
+        has_csv = any(e.name.endswith(".csv") for e in entries)
+    has_npy = False
+    if has_csv and os.path.isdir(COLUMNAR_FOLDER):
+        with os.scandir(COLUMNAR_FOLDER) as entries:
+            has_npy = any(e.is_dir() for e in entries)
+    return "csv" if has_csv and not has_npy else "npy"
+
+
+# Which backend stores the cleaned OHLCV data ("npy" or "csv")
+DEFAULT_BACKEND = _default_backend()
+
+# "AAPL@15m" names an intraday series (see scripts.utils.intraday); the loaders accept it
+INTERVAL_SEPARATOR = "@"
+
+
+def split_column(col):
+    """'Close_AAPL' -> ('Close', 'AAPL')."""
+    field, _, ticker = col.partition('_')
+    return field, ticker
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    Yield a temporary path next to `path`, renamed over `path` only when the
+    block succeeds. Readers (including memory maps of the old file) never see
+    a half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _save_npy(path, values):
+    with atomic_write(path) as tmp_path:
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+
+
+# ----------------------
+# CSV BACKEND
+# ----------------------
+class CsvBackend:
+    """Cleaned data as one CSV per ticker (the original layout)."""
+
+    name = "csv"
+
+    def __init__(self, folder=CLEANED_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, ticker):
+        return os.path.join(self.folder, f"{ticker}.csv")
+
+    def exists(self, ticker):
+        return os.path.exists(self.path(ticker))
+
+    def list_tickers(self):
+        return sorted(f[:-4] for f in os.listdir(self.folder) if f.endswith(".csv"))
+
+    def write(self, ticker, df):
+        with atomic_write(self.path(ticker)) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+
+    def append(self, ticker, df):
+        """
+        Append rows in place, without rewriting the file (columns follow the
+        existing header). A reader racing the write may see a torn last line,
+        which read() leaves out; one left by an interrupted append is cut off
+        here before writing.
+        """
+        path = self.path(ticker)
+        with open(path, 'r+b') as f:
+            header = f.readline().decode().strip().split(',')
+            end = f.seek(0, os.SEEK_END)
+            complete = _complete_lines_end(f)
+            if complete < end:
+                f.truncate(complete)
+        df[header].to_csv(path, mode='a', header=False, index=False)
+
+    def read(self, ticker):
+        if not self.exists(ticker):
+            return None
+        with open(self.path(ticker), 'rb') as f:
+            data = f.read()
+        # Up to the last complete line: an append may be in progress
+        return pd.read_csv(io.BytesIO(data[:data.rfind(b"\n") + 1]), parse_dates=['Date'])
+
+    def read_arrays(self, ticker):
+        df = self.read(ticker)
+        if df is None:
+            return None
+        arrays = {"Date": df['Date'].values}
+        for col in df.columns[1:]:
+            arrays[split_column(col)[0]] = df[col].values
+        return arrays
+
+    def delete(self, ticker):
+        if self.exists(ticker):
+            os.remove(self.path(ticker))
+            return True
+        return False
+
+
+def _complete_lines_end(f, block=4096):
+    """Offset just past the last newline of the binary file `f` (0 if it has none)."""
+    pos = f.seek(0, os.SEEK_END)
+    while pos > 0:
+        step = min(block, pos)
+        pos -= step
+        f.seek(pos)
+        i = f.read(step).rfind(b"\n")
+        if i >= 0:
+            return pos + i + 1
+    return 0
+
+
+# ----------------------
+# NPY (COLUMNAR) BACKEND
+# ----------------------
+class NpyBackend:
+    """
+    Cleaned data as one typed .npy file per column:
+    columnar/<TICKER>/Date.npy, Close.npy, High.npy, ...
+    Reads are memory-mapped, so nothing is parsed or copied until a value is used.
+    """
+
+    name = "npy"
+
+    def __init__(self, folder=COLUMNAR_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, ticker):
+        return os.path.join(self.folder, ticker)
+
+    def exists(self, ticker):
+        return os.path.exists(os.path.join(self.path(ticker), "Date.npy"))
+
+    def list_tickers(self):
+        return sorted(t for t in os.listdir(self.folder) if self.exists(t))
+
+    def write(self, ticker, df):
+        """
+        Each column file is written to a temp file and renamed into place, so
+        open memory maps keep the old data; Date.npy goes last, as the marker
+        that the ticker is complete.
+        """
+        ticker_dir = self.path(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        for col in df.columns:
+            if col == 'Date':
+                continue
+            _save_npy(os.path.join(ticker_dir, f"{split_column(col)[0]}.npy"), df[col].values)
+        _save_npy(os.path.join(ticker_dir, "Date.npy"), pd.to_datetime(df['Date']).values.astype('datetime64[ns]'))
+
+    def append(self, ticker, df):
+        """
+        Append rows to every column file in place (only the new bytes are
+        written). Date.npy grows last, like in write(): until it does, readers
+        see the old row count (read_arrays cuts the longer columns to it).
+        """
+        ticker_dir = self.path(ticker)
+        rows = len(np.load(os.path.join(ticker_dir, "Date.npy"), mmap_mode='r'))
+        for col in df.columns:
+            if col == 'Date':
+                continue
+            _append_npy(os.path.join(ticker_dir, f"{split_column(col)[0]}.npy"), df[col].values, rows)
+        _append_npy(os.path.join(ticker_dir, "Date.npy"),
+                    pd.to_datetime(df['Date']).values.astype('datetime64[ns]'))
+
+    def read_arrays(self, ticker):
+        """
+        Zero-copy: returns {field: np.memmap} straight from disk. Columns are
+        cut to the length of Date.npy, so an append in progress isn't seen.
+        """
+        if not self.exists(ticker):
+            return None
+        ticker_dir = self.path(ticker)
+        dates = np.load(os.path.join(ticker_dir, "Date.npy"), mmap_mode='r')
+        arrays = {"Date": dates}
+        for f in sorted(os.listdir(ticker_dir)):
+            field = f[:-4]
+            if f.endswith(".npy") and field != "Date":
+                arrays[field] = np.load(os.path.join(ticker_dir, f), mmap_mode='r')[:len(dates)]
+        return arrays
+
+    def read(self, ticker):
+        return _frame(ticker, self.read_arrays(ticker))
+
+    def delete(self, ticker):
+        if os.path.isdir(self.path(ticker)):
+            shutil.rmtree(self.path(ticker))
+            return True
+        return False
+
+
+def _frame(ticker, arrays):
+    """Cleaned frame from {field: array}; the frame owns its data (callers sort/add columns in place)."""
+    if arrays is None:
+        return None
+    return pd.DataFrame({
+        ('Date' if field == 'Date' else f"{field}_{ticker}"): np.asarray(values)
+        for field, values in arrays.items()
+    })
+
+
+def _append_npy(path, values, rows=None):
+    """
+    Grow a 1-D .npy file in place: write the new values after the existing
+    data, then patch the shape in the header. numpy pads headers so the shape
+    can grow without changing the header length; if it ever would, the file
+    is rewritten (atomically) instead. Readers see either the old or the new
+    shape, and existing memory maps stay valid. With `rows`, existing values
+    past that count (left by an append that stopped before Date.npy grew) are
+    overwritten.
+    """
+    fmt = np.lib.format
+    with open(path, 'r+b') as f:
+        version = fmt.read_magic(f)
+        read_header = fmt.read_array_header_1_0 if version == (1, 0) else fmt.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        header_len = f.tell()
+        keep = shape[0] if rows is None else min(shape[0], rows)
+        values = np.asarray(values).astype(dtype, copy=False)
+        new_header = {'descr': fmt.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                      'shape': (keep + len(values),)}
+        buf = io.BytesIO()
+        if version == (1, 0):
+            fmt.write_array_header_1_0(buf, new_header)
+        else:
+            fmt.write_array_header_2_0(buf, new_header)
+        if len(buf.getvalue()) != header_len:
+            f.seek(header_len)
+            existing = np.frombuffer(f.read(keep * dtype.itemsize), dtype=dtype)
+            rewrite = np.concatenate([existing, values])
+        else:
+            f.seek(header_len + keep * dtype.itemsize)
+            f.write(values.tobytes())
+            if keep < shape[0]:
+                f.truncate()
+            f.seek(0)
+            f.write(buf.getvalue())
+            return
+    _save_npy(path, rewrite)
+
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "npy": NpyBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """Return the (cached) storage backend instance for `name`."""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose from {list(BACKENDS)}.")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+# ----------------------
+# PUBLIC HELPERS
+# ----------------------
+# Callbacks run with the ticker after every save, append and delete (in this process)
+_change_listeners = []
+
+
+def on_change(callback):
+    """Register `callback(ticker)` to run whenever a ticker's stored data changes."""
+    _change_listeners.append(callback)
+    return callback
+
+
+def _changed(ticker):
+    for callback in _change_listeners:
+        callback(ticker)
+
+
+def checksum(arrays):
+    """SHA-1 (16 hex chars) of the stored arrays, field by field in name order."""
+    digest = hashlib.sha1()
+    for field in sorted(arrays):
+        digest.update(field.encode())
+        digest.update(np.ascontiguousarray(arrays[field]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _index(ticker, backend=None):
+    """Refresh the catalog entry for `ticker` from what is stored on disk."""
+    backend = get_backend(backend)
+    arrays = backend.read_arrays(ticker)
+    dates = arrays["Date"]
+    catalog.record(ticker, len(dates), dates[0] if len(dates) else None, dates[-1] if len(dates) else None,
+                   checksum(arrays), backend=backend.name)
+
+
+def _ensure_indexed(backend):
+    """Fill the catalog from one folder scan the first time a backend is listed."""
+    key = f"stocks:{backend.name}"
+    if not catalog.is_indexed(key):
+        for t in backend.list_tickers():
+            _index(t, backend.name)
+        catalog.mark_indexed(key)
+
+
+def reindex(backend=None):
+    """Rebuild the catalog entries for `backend` and the raw snapshots from disk."""
+    backend = get_backend(backend)
+    for t in catalog.tickers(backend.name):
+        catalog.remove(t, backend.name)
+    catalog.mark_indexed(f"stocks:{backend.name}", False)
+    for t in catalog.raw_tickers():
+        catalog.remove_raw(t)
+    catalog.mark_indexed("raw", False)
+    _ensure_indexed(backend)
+    list_raw()
+
+
+def save_stock(ticker, df, backend=None):
+    """Store a cleaned frame (Date, Close_<T>, High_<T>, ...) for `ticker`."""
+    get_backend(backend).write(ticker, df)
+    _index(ticker, backend)
+    _changed(ticker)
+
+
+def append_stock(ticker, df, backend=None):
+    """Append new cleaned rows for `ticker` (must already be stored)."""
+    if df.empty:
+        return
+    backend = get_backend(backend)
+    backend.append(ticker, df)
+    # Catalog from the appended rows alone: rehashing the history would make
+    # every append O(history); verify() recomputes the checksum when asked
+    dates = pd.to_datetime(df['Date'])
+    if not catalog.extend(ticker, len(df), dates.max(), dates.min(), backend.name):
+        _index(ticker, backend.name)
+    _changed(ticker)
+
+
+def _entry(ticker, backend=None):
+    backend = get_backend(backend)
+    entry = catalog.get(ticker, backend.name)
+    if entry is None and not catalog.is_indexed(f"stocks:{backend.name}") and backend.exists(ticker):
+        _index(ticker, backend.name)
+        entry = catalog.get(ticker, backend.name)
+    return entry
+
+
+def _intraday(key):
+    """scripts.utils.intraday for an interval series key ('AAPL@15m'), else None."""
+    if INTERVAL_SEPARATOR not in key:
+        return None
+    from scripts.utils import intraday
+    return intraday
+
+
+def data_version(ticker, backend=None):
+    """
+    Version string that changes whenever `ticker`'s stored data changes
+    (rows, last date and write time from the catalog). None if not stored.
+    """
+    if _intraday(ticker):
+        return _intraday(ticker).series_version(ticker)
+    entry = _entry(ticker, backend)
+    if entry is None:
+        return None
+    return f"{entry['rows']}:{entry['last_date']}:{entry['updated_at']}"
+
+
+def data_versions(tickers=None, backend=None):
+    """{ticker: data_version} for `tickers` (default: all stored), from one catalog query."""
+    backend = get_backend(backend)
+    _ensure_indexed(backend)
+    entries = catalog.entries(backend.name)
+    tickers = sorted(entries) if tickers is None else tickers
+    return {t: f"{entries[t]['rows']}:{entries[t]['last_date']}:{entries[t]['updated_at']}"
+            for t in tickers if t in entries}
+
+
+def last_date(ticker, backend=None):
+    """Last stored Date for `ticker` (from the catalog), or None if not stored."""
+    if _intraday(ticker):
+        return _intraday(ticker).series_last(ticker)
+    entry = _entry(ticker, backend)
+    if entry is None or not entry["last_date"]:
+        return None
+    return pd.Timestamp(entry["last_date"])
+
+
+# Optional reader consulted before the backend (see scripts.utils.panel.install)
+_shared_reader = None
+
+
+def set_shared_reader(reader):
+    """
+    Serve loads from `reader.read_arrays(ticker, backend)` when it returns
+    arrays (None falls through to the backend). None removes the reader.
+    """
+    global _shared_reader
+    _shared_reader = reader
+
+
+def _shared_arrays(ticker, backend):
+    reader = _shared_reader
+    return reader.read_arrays(ticker, backend) if reader is not None else None
+
+
+def load_stock(ticker, backend=None):
+    """Load the cleaned frame for `ticker`, or None if it isn't stored."""
+    if _intraday(ticker):
+        return _intraday(ticker).series_frame(ticker)
+    backend = get_backend(backend)
+    arrays = _shared_arrays(ticker, backend)
+    if arrays is not None:
+        return _frame(ticker, arrays)
+    return backend.read(ticker)
+
+
+def load_arrays(ticker, backend=None):
+    """Load {field: array} for `ticker` (memory-mapped with the npy backend)."""
+    if _intraday(ticker):
+        return _intraday(ticker).series_arrays(ticker)
+    backend = get_backend(backend)
+    arrays = _shared_arrays(ticker, backend)
+    if arrays is not None:
+        return arrays
+    return backend.read_arrays(ticker)
+
+
+def has_stock(ticker, backend=None):
+    if _intraday(ticker):
+        return data_version(ticker) is not None
+    return _entry(ticker, backend) is not None
+
+
+def verify(ticker, backend=None):
+    """
+    True if the stored arrays still match the checksum in the catalog. After
+    an append the checksum is unset: it is computed here and kept as the
+    reference for the next check.
+    """
+    backend = get_backend(backend)
+    entry = _entry(ticker, backend.name)
+    arrays = backend.read_arrays(ticker)
+    if entry is None or arrays is None:
+        return False
+    if entry["checksum"] is None:
+        catalog.set_checksum(ticker, checksum(arrays), backend.name)
+        return True
+    return checksum(arrays) == entry["checksum"]
+
+
+def delete_stock(ticker, backend=None):
+    backend = get_backend(backend)
+    catalog.remove(ticker, backend.name)
+    deleted = backend.delete(ticker)
+    _changed(ticker)
+    return deleted
+
+
+def list_stocks(backend=None):
+    """Sorted stored tickers, answered from the catalog."""
+    backend = get_backend(backend)
+    _ensure_indexed(backend)
+    return catalog.tickers(backend.name)
+
+
+def count_stocks(backend=None):
+    backend = get_backend(backend)
+    _ensure_indexed(backend)
+    return catalog.count(backend.name)
+
+
+def stale_stocks(before, backend=None):
+    """Stored tickers whose last Date is earlier than `before`."""
+    backend = get_backend(backend)
+    _ensure_indexed(backend)
+    return catalog.stale(before, backend.name)
+
+
+# ----------------------
+# RAW SNAPSHOTS
+# ----------------------
+def raw_path(ticker):
+    return os.path.join(RAW_FOLDER, f"{ticker}.csv")
+
+
+def record_raw(ticker):
+    """Index a raw download snapshot just written to data/raw."""
+    catalog.record_raw(ticker, os.path.getsize(raw_path(ticker)))
+
+
+def save_raw(ticker, df):
+    """Write a downloaded frame to data/raw (atomically) and index it."""
+    with atomic_write(raw_path(ticker)) as tmp_path:
+        df.to_csv(tmp_path)
+    record_raw(ticker)
+
+
+def delete_raw(ticker):
+    """Remove the raw snapshot for `ticker`; returns its path, or None if there was none."""
+    catalog.remove_raw(ticker)
+    path = raw_path(ticker)
+    if os.path.exists(path):
+        os.remove(path)
+        return path
+    return None
+
+
+def list_raw():
+    """Sorted tickers with a raw snapshot, answered from the catalog."""
+    if not catalog.is_indexed("raw"):
+        for f in os.listdir(RAW_FOLDER):
+            if f.endswith(".csv"):
+                catalog.record_raw(f[:-4], os.path.getsize(os.path.join(RAW_FOLDER, f)))
+        catalog.mark_indexed("raw")
+    return catalog.raw_tickers()
@@ -0,0 +1,266 @@
+# timing.py
+"""
+Per-stage timings, trace export and opt-in profiling.
+
+Code reports its stages through stage(), as a context manager or decorator:
+
+    with timing.stage(timing.FIT):
+        model.fit(X, y)
+
+timed() wraps a whole call (the predict_* and data_manager functions): the
+stages reported during it are collected and attached to the returned dict as
+result["timings"] = {"load": s, "features": s, ..., "total": s}. A stage
+entered inside another one is recorded as "outer/inner". Outside a timed()
+call a stage only costs two clock reads.
+
+- Trace: with STOCK_TRACE_FILE set (or set_trace(path)), every finished stage
+  and call is appended to that file as one JSON line, from every process.
+  `python -m scripts.utils.timing trace.jsonl` summarizes it.
+- Profiling: with STOCK_PROFILE=cprofile, tracemalloc or all (or
+  set_profile()), each outermost timed() call dumps its hot spots to
+  data/profiles (STOCK_PROFILE_DIR) as <ticker>_<call>_<time>.prof / .txt.
+  cProfile only sees the calling thread.
+"""
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+import contextvars
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from scripts.utils import storage
+
+# Stages the models report
+LOAD = "load"
+FEATURES = "features"
+FIT = "fit"
+FORECAST = "forecast"
+METRICS = "metrics"
+STAGES = (LOAD, FEATURES, FIT, FORECAST, METRICS)
+
+PROFILE_MODES = ("cprofile", "tracemalloc", "all")
+PROFILE_DIR = os.environ.get("STOCK_PROFILE_DIR", os.path.join(storage.DATA_DIR, 'profiles'))
+PROFILE_TOP = 25
+
+_trace_file = os.environ.get("STOCK_TRACE_FILE") or None
+_profile_mode = os.environ.get("STOCK_PROFILE", "").lower() or None
+_trace_lock = threading.Lock()
+
+_current = contextvars.ContextVar("timing_recorder", default=None)
+_profiling = contextvars.ContextVar("timing_profiling", default=False)
+
+
+def set_trace(path):
+    """Append stage events to `path` (None turns tracing off)."""
+    global _trace_file
+    _trace_file = path
+    if path:
+        os.environ["STOCK_TRACE_FILE"] = path  # inherited by spawned model workers
+    else:
+        os.environ.pop("STOCK_TRACE_FILE", None)
+
+
+def set_profile(mode):
+    """Profile each timed() call: "cprofile", "tracemalloc", "all" or None."""
+    global _profile_mode
+    if mode is not None and mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}'. Choose from {PROFILE_MODES}.")
+    _profile_mode = mode
+    if mode:
+        os.environ["STOCK_PROFILE"] = mode
+    else:
+        os.environ.pop("STOCK_PROFILE", None)
+
+
+def _emit(event):
+    if not _trace_file:
+        return
+    event = {"ts": round(time.time(), 6), "pid": os.getpid(), **event}
+    line = json.dumps(event, default=str) + "\n"
+    with _trace_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(_trace_file)), exist_ok=True)
+        with open(_trace_file, "a") as f:
+            f.write(line)
+
+
+class Recorder:
+    """Stage totals of one timed() call."""
+
+    def __init__(self, call, context):
+        self.call = call
+        self.context = context
+        self.stages = {}
+        self.total = None
+        self.profile = None
+        self._stack = []
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        timings = {name: round(seconds, 6) for name, seconds in self.stages.items()}
+        if self.total is not None:
+            timings["total"] = round(self.total, 6)
+        return timings
+
+
+class stage(contextlib.ContextDecorator):
+    """Time a block (or every call of a function) as stage `name`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call, so concurrent calls don't share state
+        return type(self)(self.name)
+
+    def __enter__(self):
+        self._recorder = _current.get()
+        if self._recorder is not None:
+            self._recorder._stack.append(self.name)
+            self._key = "/".join(self._recorder._stack)
+        else:
+            self._key = self.name
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        recorder = self._recorder
+        if recorder is not None:
+            recorder._stack.pop()
+            recorder.add(self._key, seconds)
+            _emit({"call": recorder.call, "stage": self._key, "seconds": round(seconds, 6), **recorder.context})
+        else:
+            _emit({"call": None, "stage": self._key, "seconds": round(seconds, 6)})
+        return False
+
+
+def _start_profile():
+    """Profilers for this call, if profiling is on and no outer call is profiled."""
+    if not _profile_mode or _profiling.get():
+        return None
+    profiler = {"token": _profiling.set(True)}
+    if _profile_mode in ("tracemalloc", "all") and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        profiler["tracemalloc"] = True
+    if _profile_mode in ("cprofile", "all"):
+        try:
+            profiler["cprofile"] = cProfile.Profile()
+            profiler["cprofile"].enable()
+        except ValueError:
+            profiler.pop("cprofile")  # another profiler is already active
+    return profiler
+
+
+def _stop_profile(profiler, recorder):
+    """Dump the hot spots; returns the path prefix of the written files."""
+    _profiling.reset(profiler["token"])
+    name = f"{recorder.context.get('ticker') or 'all'}_{recorder.call}_{datetime.now():%Y%m%d-%H%M%S}_{os.getpid()}"
+    prefix = os.path.join(PROFILE_DIR, name)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    report = io.StringIO()
+    report.write(f"{recorder.call} {recorder.context}  total {recorder.total:.3f}s\n")
+    for key, seconds in recorder.stages.items():
+        report.write(f"  {key:<30} {seconds:.3f}s\n")
+
+    if "cprofile" in profiler:
+        profiler["cprofile"].disable()
+        profiler["cprofile"].dump_stats(prefix + ".prof")
+        report.write("\n== cProfile (cumulative) ==\n")
+        pstats.Stats(profiler["cprofile"], stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    if profiler.get("tracemalloc"):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report.write(f"\n== tracemalloc (current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB) ==\n")
+        for item in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            report.write(f"{item}\n")
+
+    with open(prefix + ".txt", "w") as f:
+        f.write(report.getvalue())
+    return prefix
+
+
+@contextlib.contextmanager
+def record(call, **context):
+    """
+    Collect the stages reported inside the block:
+
+        with timing.record("backtest", ticker="AAPL") as timings:
+            ...
+        timings.as_dict()
+    """
+    recorder = Recorder(call, {k: v for k, v in context.items() if v is not None})
+    token = _current.set(recorder)
+    profiler = _start_profile()
+    start = time.perf_counter()
+    try:
+        yield recorder
+    finally:
+        recorder.total = time.perf_counter() - start
+        _current.reset(token)
+        if profiler is not None:
+            recorder.profile = _stop_profile(profiler, recorder)
+        _emit({"call": call, "stage": "total", "seconds": round(recorder.total, 6), **recorder.context})
+
+
+def _ticker(args, kwargs):
+    value = args[0] if args else kwargs.get("stock_symbol")
+    if not isinstance(value, str):
+        return None
+    # Some models take the cleaned CSV path instead of the ticker
+    return os.path.splitext(os.path.basename(value))[0]
+
+
+def timed(call=None, ticker=True):
+    """
+    Decorator: record the wrapped call's stages and attach them to its result
+    dict as "timings" (and "profile", the dump prefix, when profiling).
+    With `ticker`, the first argument (a ticker or its CSV path) is recorded
+    as the ticker.
+    """
+    def decorator(func):
+        name = call or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with record(name, ticker=_ticker(args, kwargs) if ticker else None) as recorder:
+                result = func(*args, **kwargs)
+            if isinstance(result, dict):
+                result["timings"] = recorder.as_dict()
+                if recorder.profile:
+                    result["profile"] = recorder.profile
+            return result
+        return wrapper
+    return decorator
+
+
+def summarize(path):
+    """[{call, stage, count, total_s, mean_s, max_s}] from a trace file, slowest first."""
+    groups = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                groups[(event.get("call"), event["stage"])].append(event["seconds"])
+    rows = [{"call": call, "stage": name, "count": len(values), "total_s": round(sum(values), 4),
+             "mean_s": round(sum(values) / len(values), 4), "max_s": round(max(values), 4)}
+            for (call, name), values in groups.items()]
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize a stage trace file.")
+    parser.add_argument("trace", help="JSON-lines trace written with STOCK_TRACE_FILE")
+    args = parser.parse_args()
+    for r in summarize(args.trace):
+        print(f"{str(r['call']):<32} {r['stage']:<28} n={r['count']:<5} total {r['total_s']:>9.3f}s  "
+              f"mean {r['mean_s']:>8.4f}s  max {r['max_s']:>8.4f}s")
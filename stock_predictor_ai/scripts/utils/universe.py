@@ -0,0 +1,163 @@
+# universe.py
+"""
+S&P 500 constituent list, resolved once and cached on disk.
+
+get_sp500_tickers() answers from data/universe/sp500.json while it is younger
+than the TTL (STOCK_UNIVERSE_TTL_HOURS, default 24). When it's stale the list
+is re-read from Wikipedia; if that fails the stale cache is used, then a
+local list (STOCK_UNIVERSE_FILE, or data/raw/sp500_list.xlsx written by the
+old update_sp500list script). Every change to the list is appended to
+sp500_history.jsonl, so past constituents can be looked up offline.
+"""
+import os
+import json
+import time
+from datetime import datetime
+import pandas as pd
+from scripts.utils import storage
+
+UNIVERSE_FOLDER = os.path.join(storage.DATA_DIR, 'universe')
+CACHE_PATH = os.path.join(UNIVERSE_FOLDER, 'sp500.json')
+HISTORY_PATH = os.path.join(UNIVERSE_FOLDER, 'sp500_history.jsonl')
+TTL_HOURS = float(os.environ.get("STOCK_UNIVERSE_TTL_HOURS", 24))
+WIKIPEDIA_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+LOCAL_FALLBACKS = [
+    os.environ.get("STOCK_UNIVERSE_FILE", ""),
+    os.path.join(storage.RAW_FOLDER, 'sp500_list.xlsx'),
+    os.path.join(UNIVERSE_FOLDER, 'sp500_list.csv'),
+]
+
+
+def _normalize(symbol):
+    return str(symbol).strip().upper().replace('.', '-')
+
+
+def _records(df):
+    """[{"Symbol", "Security", "GICS Sector", ...}] with yfinance-style symbols."""
+    keep = [c for c in ("Symbol", "Security", "GICS Sector", "GICS Sub-Industry") if c in df.columns]
+    df = df[keep].dropna(subset=["Symbol"]).copy()
+    df["Symbol"] = df["Symbol"].map(_normalize)
+    return df.drop_duplicates("Symbol").to_dict("records")
+
+
+def fetch_wikipedia():
+    import requests
+    headers = {"User-Agent": "Mozilla/5.0"}
+    response = requests.get(WIKIPEDIA_URL, headers=headers, timeout=15)
+    response.raise_for_status()
+    from io import StringIO
+    return _records(pd.read_html(StringIO(response.text))[0])
+
+
+def load_local(path):
+    """Constituents from a local .csv/.xlsx (with a Symbol column), .json or .txt list."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        return _records(pd.read_excel(path))
+    if ext == ".csv":
+        return _records(pd.read_csv(path))
+    if ext == ".json":
+        with open(path) as f:
+            data = json.load(f)
+        data = data.get("constituents", data) if isinstance(data, dict) else data
+        return [d if isinstance(d, dict) else {"Symbol": _normalize(d)} for d in data]
+    with open(path) as f:
+        symbols = f.read().replace(",", "\n").split()
+    return [{"Symbol": _normalize(s)} for s in dict.fromkeys(symbols)]
+
+
+def _read_cache():
+    if not os.path.exists(CACHE_PATH):
+        return None
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(constituents, source):
+    os.makedirs(UNIVERSE_FOLDER, exist_ok=True)
+    previous = _read_cache()
+    cache = {"fetched_at": time.time(), "source": source, "constituents": constituents}
+    tmp_path = f"{CACHE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, CACHE_PATH)
+    _record_history(previous["constituents"] if previous else [], constituents)
+    return cache
+
+
+def _record_history(old, new):
+    old_symbols = {c["Symbol"] for c in old}
+    new_symbols = {c["Symbol"] for c in new}
+    added, removed = sorted(new_symbols - old_symbols), sorted(old_symbols - new_symbols)
+    if not added and not removed:
+        return
+    with open(HISTORY_PATH, "a") as f:
+        f.write(json.dumps({"date": datetime.now().strftime("%Y-%m-%d"), "added": added, "removed": removed}) + "\n")
+
+
+def get_constituents(refresh=False, local_file=None, logger=None):
+    """Constituent records, from `local_file`, the fresh cache, Wikipedia or a fallback."""
+    if logger is None:
+        logger = print
+    if local_file:
+        cache = _write_cache(load_local(local_file), local_file)
+        logger(f"✅ Loaded {len(cache['constituents'])} tickers from {local_file}.")
+        return cache["constituents"]
+
+    cache = _read_cache()
+    if cache and not refresh and time.time() - cache["fetched_at"] < TTL_HOURS * 3600:
+        return cache["constituents"]
+
+    try:
+        cache = _write_cache(fetch_wikipedia(), WIKIPEDIA_URL)
+        logger(f"✅ Fetched {len(cache['constituents'])} tickers from Wikipedia.")
+        return cache["constituents"]
+    except Exception as e:
+        logger(f"⚠️ Failed to fetch S&P 500 tickers from Wikipedia: {e}")
+
+    if cache:
+        logger(f"Using cached S&P 500 list from {datetime.fromtimestamp(cache['fetched_at']):%Y-%m-%d %H:%M}.")
+        return cache["constituents"]
+    for path in LOCAL_FALLBACKS:
+        if path and os.path.exists(path):
+            try:
+                cache = _write_cache(load_local(path), path)
+            except Exception as e:
+                # Unreadable file, or an .xlsx without openpyxl: try the next one
+                logger(f"⚠️ Failed to read local S&P 500 list {path}: {e}")
+                continue
+            logger(f"Using local S&P 500 list {path}.")
+            return cache["constituents"]
+    return []
+
+
+def get_sp500_tickers(refresh=False, local_file=None, logger=None):
+    return [c["Symbol"] for c in get_constituents(refresh, local_file, logger)]
+
+
+def get_sectors():
+    """{ticker: GICS sector} from the cached list (no network)."""
+    cache = _read_cache() or {"constituents": []}
+    return {c["Symbol"]: c.get("GICS Sector") for c in cache["constituents"]}
+
+
+def history():
+    """List of {"date", "added", "removed"} changes to the constituent list."""
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    with open(HISTORY_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def constituents_on(date):
+    """Symbols in the index on `date` ('YYYY-MM-DD'), rolled back from the current list."""
+    symbols = {c["Symbol"] for c in (_read_cache() or {"constituents": []})["constituents"]}
+    for change in reversed(history()):
+        if change["date"] <= date:
+            break
+        symbols -= set(change["added"])
+        symbols |= set(change["removed"])
+    return sorted(symbols)